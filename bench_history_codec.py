@@ -0,0 +1,85 @@
+"""
+Encode / decode throughput of the binary EditHistory format vs JSON.
+
+Builds a batch of random histories (fixed seed) over the edit types the app
+produces and times, per format: full encode, full decode, and the delta
+produced by one add_edit.
+
+  python bench_history_codec.py --n 20000
+"""
+import argparse
+import json
+import random
+import time
+from typing import List
+
+from src.edits import (
+    Edit, BRIGHTNESS, CONTRAST, SATURATION, TEMPERATURE, FILTER, GRAIN, VIGNETTE,
+)
+from src.history import EditHistory, MAX_EDITS
+from src.history_codec import apply_delta, decode_history, encode_delta, encode_history
+
+
+def _random_edit(rng: random.Random) -> Edit:
+    kind = rng.choice([BRIGHTNESS, CONTRAST, SATURATION, TEMPERATURE, FILTER, GRAIN, VIGNETTE])
+    if kind == FILTER:
+        params = {"id": rng.choice(["WarmFilm03", "arabica_12", "azrael_93"]),
+                  "strength": round(rng.random(), 2)}
+    elif kind == GRAIN:
+        params = {"amount": rng.random(), "size": 1.0, "seed": rng.randrange(1000)}
+    elif kind == VIGNETTE:
+        params = {"amount": rng.uniform(-1, 1), "radius": 0.5, "softness": 0.5}
+    else:
+        params = {"value": rng.uniform(-1, 1)}
+    return Edit(kind, params, ai_improvable=rng.random() < 0.8)
+
+
+def build_histories(n: int, seed: int = 0) -> List[EditHistory]:
+    rng = random.Random(seed)
+    return [
+        EditHistory(f"photos/IMG_{i:05d}.jpg",
+                    [_random_edit(rng) for _ in range(rng.randint(1, MAX_EDITS))])
+        for i in range(n)
+    ]
+
+
+def _rate(fn, items) -> float:
+    t0 = time.perf_counter()
+    for it in items:
+        fn(it)
+    return len(items) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    hists = build_histories(args.n, args.seed)
+    # Benchmark paths don't exist, so no image hash is read from disk.
+    blobs = [encode_history(h) for h in hists]
+    docs = [json.dumps(h.to_dict()) for h in hists]
+
+    rng = random.Random(args.seed + 1)
+    pairs = []
+    for h in hists:
+        nxt = EditHistory(h.base_image_path, list(h.edits))
+        nxt.add_edit(_random_edit(rng))
+        pairs.append((h, nxt))
+    deltas = [encode_delta(a, b) for a, b in pairs]
+
+    print(f"{args.n} histories")
+    print(f"  bytes/history   binary {sum(map(len, blobs)) / args.n:8.1f}"
+          f"   json {sum(map(len, docs)) / args.n:8.1f}"
+          f"   delta {sum(map(len, deltas)) / args.n:6.1f}")
+    print(f"  encode /s       binary {_rate(encode_history, hists):10.0f}"
+          f"   json {_rate(lambda h: json.dumps(h.to_dict()), hists):10.0f}")
+    print(f"  decode /s       binary {_rate(decode_history, blobs):10.0f}"
+          f"   json {_rate(lambda d: EditHistory.from_dict(json.loads(d)), docs):10.0f}")
+    print(f"  delta /s        encode {_rate(lambda p: encode_delta(*p), pairs):10.0f}"
+          f"   apply {_rate(lambda x: apply_delta(x[0][0], x[1]), list(zip(pairs, deltas))):10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Distil the server's candidate scorer into src/surrogate.py's numpy model.
+
+Builds proxies from the sample images (random crops, flips, exposure /
+gamma / white-balance jitter), labels random candidates with
+server_dummy._score_candidates (the exact server scores), fits the
+surrogate, and writes it plus a JSON fidelity report:
+
+  python distill_surrogate.py --proxies 240 --out surrogate.npz
+
+The local / fallback search only uses it when SURROGATE_PATH points at
+the file.
+
+Teacher weights come from HDRNET_WEIGHTS / AESTHETIC_WEIGHTS, as for the
+server. Without them the teacher's nets are randomly initialised (seeded
+by --seed here), so the surrogate matches only that init; the report
+records which weights were used.
+
+Fidelity is measured on proxies from held-out source images (--holdout):
+score error, per-proxy rank correlation, and on _generate_candidates sets
+how often the surrogate picks the server's winner and the score lost when
+it does not (regret), next to the old local heuristic.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+REPORT_VERSION = 1
+
+
+def _augment(img: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    h, w, _ = img.shape
+    scale = rng.uniform(0.5, 1.0)
+    ch, cw = int(h * scale), int(w * scale)
+    y0, x0 = rng.integers(0, h - ch + 1), rng.integers(0, w - cw + 1)
+    out = img[y0:y0 + ch, x0:x0 + cw]
+    if rng.random() < 0.5:
+        out = out[:, ::-1]
+    out = np.clip(out * rng.uniform(0.4, 1.6), 0.0, 1.0) ** rng.uniform(0.5, 2.0)
+    out = out * rng.uniform(0.85, 1.15, size=3)
+    return np.ascontiguousarray(np.clip(out, 0.0, 1.0), dtype=np.float32)
+
+
+def _candidates(rng: np.random.Generator, n_prefix: int = 6, per_prefix: int = 3) -> List[Dict[str, float]]:
+    cands = []
+    for b, c in rng.uniform(-0.5, 0.5, size=(n_prefix, 2)):
+        for s in rng.uniform(0.0, 1.0, size=per_prefix):
+            cands.append({"brightness": float(b), "contrast": float(c), "lut_strength": float(s)})
+    return cands
+
+
+def build_dataset(paths: List[str], n_proxies: int, rng: np.random.Generator):
+    from server_dummy import _score_candidates
+    from src.intent import load_lowres
+    from src.surrogate import build_features
+
+    sources = [load_lowres(p) for p in paths]
+    xs, ys, groups = [], [], []
+    for i in range(n_proxies):
+        lowres = _augment(sources[i % len(sources)], rng)
+        cands = _candidates(rng)
+        xs.append(build_features(lowres, cands))
+        ys.append(np.array(_score_candidates(lowres, cands), dtype=np.float32))
+        groups.append(np.full(len(cands), i))
+    return np.concatenate(xs), np.concatenate(ys), np.concatenate(groups)
+
+
+def _spearman(a: np.ndarray, b: np.ndarray) -> float:
+    ra, rb = np.argsort(np.argsort(a)), np.argsort(np.argsort(b))
+    if ra.std() == 0 or rb.std() == 0:
+        return 1.0
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def selection_fidelity(model, paths: List[str], n: int, rng: np.random.Generator) -> Dict[str, Dict[str, float]]:
+    """
+    On _generate_candidates sets for random intents: agreement with the
+    server's pick and regret, for the surrogate and the old heuristic.
+    """
+    from server_dummy import _score_candidates
+    from src.ai_client import _generate_candidates, _score_candidate
+    from src.intent import load_lowres
+
+    sources = [load_lowres(p) for p in paths]
+    stats = {"surrogate": [], "heuristic": []}
+    for i in range(n):
+        lowres = _augment(sources[i % len(sources)], rng)
+        cands = _generate_candidates(rng.uniform(-0.4, 0.4, size=3))
+        cands += [dict(c, lut_strength=s) for c in cands[:2] for s in (0.5, 1.0)]
+        truth = np.array(_score_candidates(lowres, cands))
+        picks = {
+            "surrogate": int(np.argmax(model.score(lowres, cands))),
+            "heuristic": int(np.argmax([_score_candidate(lowres, c) for c in cands])),
+        }
+        for name, k in picks.items():
+            stats[name].append((truth[k] >= truth.max() - 1e-6, truth.max() - truth[k]))
+    return {
+        name: {"top1_agreement": float(np.mean([s[0] for s in v])),
+               "mean_regret": float(np.mean([s[1] for s in v])),
+               "max_regret": float(np.max([s[1] for s in v]))}
+        for name, v in stats.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distil the server scorer into a numpy surrogate.")
+    parser.add_argument("--images", nargs="*", default=None,
+                        help="source images (default: *.jpg in the project root)")
+    parser.add_argument("--holdout", nargs="*", default=["my_test.jpg"],
+                        help="source images kept out of training for the report")
+    parser.add_argument("--proxies", type=int, default=240, help="training proxies")
+    parser.add_argument("--test-proxies", type=int, default=60)
+    parser.add_argument("--epochs", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=os.path.join(PROJECT_ROOT, "surrogate.npz"))
+    parser.add_argument("--report", default=None, help="default: <out>.report.json")
+    args = parser.parse_args()
+
+    # seeds the teacher's random init when no weights are configured
+    torch.manual_seed(args.seed)
+    from src.surrogate import fit_surrogate
+
+    paths = args.images or sorted(glob.glob(os.path.join(PROJECT_ROOT, "*.jpg")))
+    holdout = {os.path.basename(p) for p in args.holdout}
+    train_paths = [p for p in paths if os.path.basename(p) not in holdout]
+    test_paths = [p for p in paths if os.path.basename(p) in holdout] or train_paths
+    rng = np.random.default_rng(args.seed)
+
+    t0 = time.perf_counter()
+    x, y, _ = build_dataset(train_paths, args.proxies, rng)
+    xt, yt, gt = build_dataset(test_paths, args.test_proxies, rng)
+    label_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    model = fit_surrogate(x, y, epochs=args.epochs, seed=args.seed)
+    fit_s = time.perf_counter() - t0
+    model.save(args.out)
+
+    pred = model.predict_features(xt)
+    err = pred - yt
+    rank = [_spearman(pred[gt == g], yt[gt == g]) for g in np.unique(gt)]
+
+    from src.ai_client import _generate_candidates
+    from src.intent import load_lowres
+    probe = load_lowres(test_paths[0])
+    probe_cands = _generate_candidates(np.array([0.1, 0.1, 0.0])) * 4
+    model.score(probe, probe_cands)
+    t0 = time.perf_counter()
+    for _ in range(50):
+        model.score(probe, probe_cands)
+    us_per_cand = (time.perf_counter() - t0) / (50 * len(probe_cands)) * 1e6
+
+    report = {
+        "version": REPORT_VERSION,
+        "teacher": {
+            "hdrnet_weights": os.environ.get("HDRNET_WEIGHTS"),
+            "aesthetic_weights": os.environ.get("AESTHETIC_WEIGHTS"),
+            "torch_seed": args.seed,
+        },
+        "train": {"images": [os.path.basename(p) for p in train_paths],
+                  "proxies": args.proxies, "samples": int(len(y)),
+                  "label_s": round(label_s, 2), "fit_s": round(fit_s, 2)},
+        "test": {"images": [os.path.basename(p) for p in test_paths],
+                 "proxies": args.test_proxies, "samples": int(len(yt))},
+        "score": {
+            "mae": float(np.abs(err).mean()),
+            "rmse": float(np.sqrt((err ** 2).mean())),
+            "r2": float(1.0 - (err ** 2).mean() / yt.var()),
+            "target_std": float(yt.std()),
+            "mean_spearman_per_proxy": float(np.mean(rank)),
+        },
+        "selection": selection_fidelity(model, test_paths, args.test_proxies, rng),
+        "us_per_candidate": round(us_per_cand, 1),
+    }
+    report_path = args.report or args.out + ".report.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
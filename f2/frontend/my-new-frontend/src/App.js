@@ -1,6 +1,11 @@
 import React, { useEffect } from "react";
 import PredictiveDemo from "./PredictiveDemo"; // Keep PredictiveDemo component
-import { checkModelInputs } from './modelInspector';  // Import the function to inspect the model
+import { checkModelInputs, exportNeuropReference } from './modelInspector';  // Import the function to inspect the model
+
+// Dev builds: devtools can write the parity references (see neurop_reference/README.md)
+if (process.env.NODE_ENV === "development") {
+  window.exportNeuropReference = exportNeuropReference;
+}
 
 function App() {
   // Call checkModelInputs to log the input names of the ONNX model
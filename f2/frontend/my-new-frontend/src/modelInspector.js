@@ -11,3 +11,58 @@ export const checkModelInputs = async () => {
     console.error("Error loading the ONNX model:", error);
   }
 };
+
+const MODEL_SIZE = 256;
+
+const toBase64 = (bytes) => {
+  let binary = "";
+  for (let i = 0; i < bytes.length; i += 0x8000) {
+    binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+  }
+  return btoa(binary);
+};
+
+// Run neurop_lite on an image exactly as the browser does (drawn to a
+// 256x256 canvas, RGB / 255) and download the input and outputs as JSON.
+// neurop_parity.py compares the Python runtime against these files.
+export const exportNeuropReference = async (imageUrl, name) => {
+  const img = new Image();
+  img.src = imageUrl;
+  await img.decode();
+
+  const canvas = document.createElement("canvas");
+  canvas.width = MODEL_SIZE;
+  canvas.height = MODEL_SIZE;
+  const ctx = canvas.getContext("2d");
+  ctx.drawImage(img, 0, 0, MODEL_SIZE, MODEL_SIZE);
+  const rgba = ctx.getImageData(0, 0, MODEL_SIZE, MODEL_SIZE).data;
+
+  const n = MODEL_SIZE * MODEL_SIZE;
+  const rgb = new Uint8Array(n * 3);
+  const chw = new Float32Array(n * 3);
+  for (let i = 0; i < n; i++) {
+    for (let c = 0; c < 3; c++) {
+      rgb[i * 3 + c] = rgba[i * 4 + c];
+      chw[c * n + i] = rgba[i * 4 + c] / 255;
+    }
+  }
+
+  const session = await ort.InferenceSession.create('/models/neurop_lite.onnx');
+  const feeds = { [session.inputNames[0]]: new ort.Tensor('float32', chw, [1, 3, MODEL_SIZE, MODEL_SIZE]) };
+  const results = await session.run(feeds);
+  const [imageOut, ...ops] = session.outputNames.map((k) => results[k]);
+
+  const reference = {
+    name,
+    size: MODEL_SIZE,
+    input_rgb_u8: toBase64(rgb),
+    output_chw_f32: toBase64(new Uint8Array(imageOut.data.buffer)),
+    strengths: ops.map((t) => t.data[0]),
+  };
+  const blob = new Blob([JSON.stringify(reference)], { type: "application/json" });
+  const link = document.createElement("a");
+  link.href = URL.createObjectURL(blob);
+  link.download = `${name}.neurop.json`;
+  link.click();
+  return reference;
+};
@@ -0,0 +1,95 @@
+"""
+Start N local optimise workers (server_dummy.py) on separate ports.
+
+  python launch_workers.py 4
+  # prints: export AI_API_URLS=http://127.0.0.1:<p1>/optimise,...
+
+The client (src/ai_client.py) shards across AI_API_URLS with consistent
+hashing. Ctrl-C stops all workers.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_local_server(port: int, timeout: float = 60.0,
+                       env: Optional[dict] = None) -> subprocess.Popen:
+    """
+    Start server_dummy.py on 127.0.0.1:port and wait until it accepts connections.
+    """
+    env = dict(os.environ if env is None else env, PORT=str(port), HOST="127.0.0.1")
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(PROJECT_ROOT, "server_dummy.py")],
+        cwd=PROJECT_ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("server did not start in time")
+
+
+def start_workers(n: int, base_port: Optional[int] = None) -> List[Tuple[subprocess.Popen, str]]:
+    """
+    Start n workers (on base_port, base_port+1, ... or free ports).
+    Returns [(process, optimise_url)].
+    """
+    workers = []
+    try:
+        for i in range(n):
+            port = base_port + i if base_port else free_port()
+            proc = start_local_server(port)
+            workers.append((proc, f"http://127.0.0.1:{port}/optimise"))
+    except BaseException:
+        stop_workers(workers)
+        raise
+    return workers
+
+
+def stop_workers(workers) -> None:
+    for proc, _ in workers:
+        proc.terminate()
+    for proc, _ in workers:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    n = int(argv[0]) if argv else 2
+    base_port = int(argv[1]) if len(argv) > 1 else None
+
+    workers = start_workers(n, base_port)
+    print("export AI_API_URLS=" + ",".join(url for _, url in workers), flush=True)
+    try:
+        while all(proc.poll() is None for proc, _ in workers):
+            time.sleep(1.0)
+        print("a worker exited; stopping the rest")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_workers(workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Offline load test for server_dummy.py.
+
+Starts the optimise server locally (or targets --url), replays realistic
+/optimise payloads built from the sample images the way optimise_tone_colour
+builds them (candidates, intent, tone_grid, mode, deadline_ms), and writes
+a JSON report with throughput, latency percentiles, error rate and server
+CPU / RSS.
+
+  python load_test.py --concurrency 4 --duration 30 --out report.json
+  python load_test.py --rate 5 --duration 30 --out report.json
+
+Payloads are generated from a fixed seed so reports from different runs
+(and commits) are comparable.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+from src import config
+from src.ai_client import _encode_image_to_base64, _generate_candidates, _optimise_payload
+from src.intent import load_lowres
+from launch_workers import free_port, start_local_server
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+REPORT_VERSION = 2
+
+
+# --- Payloads -----------------------------------------------------------
+
+def build_payloads(image_paths: List[str], n: int, seed: int = 0,
+                   latency_budget: Optional[float] = None,
+                   mode: Optional[str] = None) -> List[str]:
+    """
+    n serialized /optimise bodies: sample images x random intent vectors,
+    with the same fields optimise_tone_colour sends (tone_grid, mode and,
+    for a positive latency_budget in seconds, deadline_ms).
+    """
+    if latency_budget is None:
+        latency_budget = config.AI_LATENCY_BUDGET_S
+    rng = np.random.default_rng(seed)
+    proxies = [_encode_image_to_base64(load_lowres(p)) for p in image_paths]
+
+    bodies = []
+    for i in range(n):
+        intent = rng.uniform([-0.3, -0.3, 0.0], [0.3, 0.3, 0.5]).astype(np.float32)
+        payload = _optimise_payload(_generate_candidates(intent), intent, latency_budget, mode)
+        payload["image_base64"] = proxies[i % len(proxies)]
+        bodies.append(json.dumps(payload))
+    return bodies
+
+
+# --- Server metrics -----------------------------------------------------
+
+class ProcSampler(threading.Thread):
+    """
+    Samples CPU% and RSS of a pid from /proc (Linux only, no psutil).
+    """
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.cpu_pct: List[float] = []
+        self.rss_mb: List[float] = []
+        self._halt = threading.Event()
+        self._tick = os.sysconf("SC_CLK_TCK")
+        self._page = os.sysconf("SC_PAGE_SIZE")
+
+    def _read(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_s = (int(fields[11]) + int(fields[12])) / self._tick  # utime + stime
+        with open(f"/proc/{self.pid}/statm") as f:
+            rss = int(f.read().split()[1]) * self._page
+        return cpu_s, rss / (1024 * 1024)
+
+    def run(self):
+        try:
+            last_cpu, _ = self._read()
+            last_t = time.monotonic()
+            while not self._halt.wait(self.interval):
+                cpu, rss = self._read()
+                now = time.monotonic()
+                self.cpu_pct.append(100.0 * (cpu - last_cpu) / (now - last_t))
+                self.rss_mb.append(rss)
+                last_cpu, last_t = cpu, now
+        except (FileNotFoundError, ProcessLookupError):
+            pass  # process gone
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+    def summary(self) -> Optional[Dict[str, float]]:
+        if not self.rss_mb:
+            return None
+        return {
+            "cpu_pct_mean": float(np.mean(self.cpu_pct)),
+            "cpu_pct_max": float(np.max(self.cpu_pct)),
+            "rss_mb_mean": float(np.mean(self.rss_mb)),
+            "rss_mb_max": float(np.max(self.rss_mb)),
+        }
+
+
+# --- Load generation ----------------------------------------------------
+
+def run_load(url: str, bodies: List[str], duration: float,
+             concurrency: int = 1, rate: Optional[float] = None,
+             timeout: float = 30.0) -> List[dict]:
+    """
+    Closed loop (rate=None): `concurrency` workers send back-to-back.
+    Open loop (rate=r): requests are scheduled at r/s regardless of
+    latency, spread over `concurrency` workers; latency is measured from
+    the scheduled send time so queueing delay is not hidden.
+    """
+    records: List[dict] = []
+    lock = threading.Lock()
+    start = time.monotonic()
+    end = start + duration
+    counter = iter(range(1 << 62))
+    headers = {"Content-Type": "application/json"}
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                i = next(counter)
+            if rate is None:
+                scheduled = time.monotonic()
+            else:
+                scheduled = start + i / rate
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            if scheduled >= end:
+                return
+
+            rec = {"t": scheduled - start}
+            try:
+                resp = session.post(url, data=bodies[i % len(bodies)],
+                                    headers=headers, timeout=timeout)
+                rec["status"] = resp.status_code
+                rec["ok"] = resp.ok
+            except requests.RequestException as e:
+                rec["status"] = None
+                rec["ok"] = False
+                rec["error"] = type(e).__name__
+            rec["latency_s"] = time.monotonic() - scheduled
+            with lock:
+                records.append(rec)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return records
+
+
+def summarise(records: List[dict], duration: float) -> dict:
+    ok = [r for r in records if r["ok"]]
+    lat = np.array([r["latency_s"] for r in ok]) * 1000.0
+    errors: Dict[str, int] = {}
+    for r in records:
+        if not r["ok"]:
+            kind = r.get("error") or f"http_{r['status']}"
+            errors[kind] = errors.get(kind, 0) + 1
+
+    out = {
+        "requests": len(records),
+        "ok": len(ok),
+        "error_rate": (len(records) - len(ok)) / len(records) if records else 0.0,
+        "errors": errors,
+        "throughput_rps": len(ok) / duration,
+    }
+    if len(lat):
+        out["latency_ms"] = {
+            "mean": float(lat.mean()),
+            "p50": float(np.percentile(lat, 50)),
+            "p90": float(np.percentile(lat, 90)),
+            "p95": float(np.percentile(lat, 95)),
+            "p99": float(np.percentile(lat, 99)),
+            "max": float(lat.max()),
+        }
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--url", help="existing server; default starts server_dummy.py locally")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--rate", type=float, help="open-loop requests/s (default: closed loop)")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    ap.add_argument("--warmup", type=float, default=2.0, help="seconds, not recorded")
+    ap.add_argument("--images", nargs="*",
+                    default=sorted(glob.glob(os.path.join(PROJECT_ROOT, "*.jpg"))))
+    ap.add_argument("--payloads", type=int, default=64)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--budget-ms", type=float, default=config.AI_LATENCY_BUDGET_S * 1000.0,
+                    help="latency budget per request; <= 0 sends no deadline")
+    ap.add_argument("--optimise-mode", choices=["search", "gradient"],
+                    default=config.AI_OPTIMISE_MODE)
+    ap.add_argument("--out", default="load_report.json")
+    args = ap.parse_args(argv)
+
+    bodies = build_payloads(args.images, args.payloads, args.seed,
+                            args.budget_ms / 1000.0, args.optimise_mode)
+
+    proc = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        proc = start_local_server(port)
+        url = f"http://127.0.0.1:{port}/optimise"
+
+    sampler = None
+    try:
+        if args.warmup > 0:
+            run_load(url, bodies, args.warmup, args.concurrency, args.rate)
+        if proc is not None:
+            sampler = ProcSampler(proc.pid)
+            sampler.start()
+        records = run_load(url, bodies, args.duration, args.concurrency, args.rate)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    report = {
+        "version": REPORT_VERSION,
+        "config": {
+            "url": args.url or "local",
+            "mode": "open" if args.rate else "closed",
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "duration_s": args.duration,
+            "payloads": args.payloads,
+            "seed": args.seed,
+            "budget_ms": args.budget_ms,
+            "optimise_mode": args.optimise_mode,
+            "images": [os.path.basename(p) for p in args.images],
+        },
+        "env": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": summarise(records, args.duration),
+        "server": sampler.summary() if sampler is not None else None,
+    }
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(json.dumps(report["results"], indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Parity check: src/neurop_runtime.py vs the browser's neurop_lite output.
+
+Browser references are the <name>.neurop.json files written by
+exportNeuropReference() in the frontend (modelInspector.js) and committed
+under neurop_reference/; they hold the exact 8-bit 256x256 input the
+browser fed (canvas drawImage resampling) and the model's outputs. For
+each sample image:
+
+  runtime  the Python runtime on the browser's input vs the browser's
+           output (onnxruntime vs onnxruntime-web kernels)
+  input    the Python-side 256x256 input (load_lowres + PIL bilinear) vs
+           the browser's canvas input, i.e. what resampling costs us
+  onnx     the Python runtime vs the onnx package's reference evaluator,
+           if installed (an extra kernel check, not a browser reference)
+
+A sample image without a browser export fails the check: re-export it
+from the frontend (exportNeuropReference(url, name)) and commit the file.
+
+  python neurop_parity.py --out parity.json
+
+Exits non-zero if an export is missing or any check exceeds its tolerance.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src import config
+from src.intent import load_lowres
+from src.neurop_runtime import _to_model_input, load_neurop_model, run_neurop_batch
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load_browser_reference(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (input HxWx3 float, output HxWx3 float, strengths) from an exported JSON.
+    """
+    with open(path) as f:
+        ref = json.load(f)
+    size = int(ref["size"])
+    rgb = np.frombuffer(base64.b64decode(ref["input_rgb_u8"]), dtype=np.uint8).reshape(size, size, 3)
+    out = np.frombuffer(base64.b64decode(ref["output_chw_f32"]), dtype=np.float32).reshape(3, size, size)
+    return rgb.astype(np.float32) / 255.0, out.transpose(1, 2, 0), np.asarray(ref["strengths"], np.float32)
+
+
+def _onnx_reference(inp: np.ndarray):
+    """
+    Run the model with onnx.reference (independent of onnxruntime's kernels).
+    """
+    try:
+        from onnx.reference import ReferenceEvaluator
+    except ImportError:
+        return None
+    if not hasattr(_onnx_reference, "sess"):
+        _onnx_reference.sess = ReferenceEvaluator(config.NEUROP_MODEL_PATH)
+    sess = _onnx_reference.sess
+    out, *ops = sess.run(None, {sess.input_names[0]: inp[None]})
+    return out[0].transpose(1, 2, 0), np.concatenate(ops, axis=1)[0]
+
+
+def _compare(ours: np.ndarray, ref: np.ndarray, s_ours: np.ndarray, s_ref: np.ndarray) -> Dict[str, float]:
+    diff = np.abs(ours.astype(np.float64) - ref)
+    q = np.abs(np.round(ours * 255.0) - np.round(ref * 255.0))
+    return {
+        "max_abs": float(diff.max()),
+        "mean_abs": float(diff.mean()),
+        "u8_mismatch_frac": float((q > 0).mean()),
+        "strength_max_abs": float(np.abs(s_ours - s_ref).max()),
+    }
+
+
+SAMPLE_IMAGES = ("example.jpg", "my_test.jpg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity of the Python NeurOP runtime with the browser.")
+    parser.add_argument("--images", nargs="*", default=None,
+                        help="sample images (default: " + ", ".join(SAMPLE_IMAGES) + ")")
+    parser.add_argument("--reference-dir", default=os.path.join(PROJECT_ROOT, "neurop_reference"),
+                        help="directory of <name>.neurop.json browser exports")
+    parser.add_argument("--tol", type=float, default=1e-3,
+                        help="max abs output difference (runtime and onnx checks)")
+    parser.add_argument("--input-tol", type=float, default=1.0 / 255.0,
+                        help="mean abs difference of the 256x256 inputs")
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    if not load_neurop_model():
+        print("onnxruntime or the model is unavailable; nothing to check.")
+        return 2
+
+    paths = args.images or [os.path.join(PROJECT_ROOT, p) for p in SAMPLE_IMAGES]
+    rows: List[Dict[str, object]] = []
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        ref_path = os.path.join(args.reference_dir, f"{name}.neurop.json")
+        row: Dict[str, object] = {"image": name}
+
+        ours_inp = _to_model_input(load_lowres(path), 256, 256).transpose(1, 2, 0)
+        ref = _onnx_reference(np.ascontiguousarray(ours_inp.transpose(2, 0, 1)))
+        if ref is not None:
+            (ours,), s_ours = run_neurop_batch([ours_inp])
+            onnx = _compare(ours, ref[0], s_ours[0], ref[1])
+            row["onnx"] = onnx
+            row["ok"] = bool(onnx["max_abs"] <= args.tol and onnx["strength_max_abs"] <= args.tol)
+
+        if not os.path.exists(ref_path):
+            row["browser"] = None
+            row["ok"] = False
+            row["error"] = f"missing browser export {ref_path}"
+            rows.append(row)
+            continue
+
+        inp, ref_out, ref_s = _load_browser_reference(ref_path)
+        (ours,), s_ours = run_neurop_batch([inp])
+        runtime = _compare(ours, ref_out, s_ours[0], ref_s)
+        gap = np.abs(ours_inp.astype(np.float64) - inp)
+        row["browser"] = {
+            "runtime": runtime,
+            "input": {"max_abs": float(gap.max()), "mean_abs": float(gap.mean())},
+        }
+        row["ok"] = bool(row.get("ok", True)
+                         and runtime["max_abs"] <= args.tol
+                         and runtime["strength_max_abs"] <= args.tol
+                         and gap.mean() <= args.input_tol)
+        rows.append(row)
+
+    report = {"model": config.NEUROP_MODEL_PATH, "tol": args.tol,
+              "input_tol": args.input_tol, "images": rows}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 0 if rows and all(r["ok"] for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,49 @@
 import os
 from src.hdrnet_wrapper import load_hdrnet_model, apply_hdrnet
+from src.neurop_runtime import load_neurop_model, apply_neurop
 
-from src.lut_utils import apply_cinematic_lut
-from src.aesthetic_net import load_aesthetic_model, score_aesthetic
+from src.lut_utils import apply_cinematic_lut, apply_3d_lut, blend_lut, CINEMATIC_WARM_LUT
+from src.aesthetic_net import load_aesthetic_model, score_aesthetic, score_aesthetic_batch
 
 import base64
 import io
-from typing import List, Dict
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Dict, Optional, Tuple
 
 import numpy as np
 from PIL import Image
 from flask import Flask, request, jsonify
 
 from src.apply_edits import apply_brightness, apply_contrast
+from src.bilateral_grid import fit_bilateral_grid, encode_grid
+from src.differentiable import optimise_params_gradient
+from src.session_store import SessionStore, Session
 
 app = Flask(__name__)
 
 HDRNET_WEIGHTS = os.environ.get("HDRNET_WEIGHTS", None)
 load_hdrnet_model(HDRNET_WEIGHTS)
 
+# Tone stage: HDRNet-lite, or the browser's NeurOP model (same grading the
+# user sees). The gradient mode differentiates through HDRNet-lite, so it
+# is refused (400) with the neurop backend, whose renders it never sees.
+TONE_BACKEND = os.environ.get("TONE_BACKEND", "hdrnet")
+if TONE_BACKEND == "neurop":
+    load_neurop_model()
+_apply_tone = apply_neurop if TONE_BACKEND == "neurop" else apply_hdrnet
+
 
 # Aesthetic model
 AESTHETIC_WEIGHTS = os.environ.get("AESTHETIC_WEIGHTS", None)
 load_aesthetic_model(AESTHETIC_WEIGHTS)
 
+# Uploaded proxies + cached per-session features
+sessions = SessionStore(
+    max_bytes=int(float(os.environ.get("SESSION_STORE_MB", "512")) * 1024 * 1024),
+    ttl_s=float(os.environ.get("SESSION_TTL_S", "600")),
+)
+
 def _apply_lut_style(img: np.ndarray, strength: float) -> np.ndarray:
     """
     Wrapper to apply our cinematic 3D LUT with given strength.
@@ -39,67 +59,312 @@ def _decode_image_from_base64(b64_str: str) -> np.ndarray:
     return arr
 
 
-def _score_candidate(lowres_image: np.ndarray, cand: Dict[str, float]) -> float:
-    img = lowres_image.copy()
+def _open_shared_image(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to a client-owned shared-memory segment.
+    The client creates and unlinks the segment; we only attach and close.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    # Python < 3.13 registers attached segments with the resource tracker,
+    # which would unlink the client's segment when this process exits.
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
 
-    # 1) apply candidate brightness + contrast
-    img = apply_brightness(img, cand["brightness"])
-    img = apply_contrast(img,  cand["contrast"])
 
-    # 2) HDRNet tone mapping
-    img_tone = apply_hdrnet(img)
+def _tone_prefix(lowres_image: np.ndarray, brightness: float, contrast: float) -> np.ndarray:
+    """
+    The part of the pipeline that does not depend on lut_strength:
+    brightness + contrast, then the tone stage (HDRNet or NeurOP).
+    """
+    img = apply_brightness(lowres_image, brightness)
+    img = apply_contrast(img, contrast)
+    return _apply_tone(img)
 
-    # 3) LUT style
-    lut_strength = float(cand.get("lut_strength", 0.0))
-    img_styled = _apply_lut_style(img_tone, lut_strength)
 
-    # 4) brightness/contrast heuristics (to avoid crazy outputs)
+def _heuristic_score(img_styled: np.ndarray) -> float:
+    # brightness/contrast heuristics (to avoid crazy outputs)
     y = 0.299 * img_styled[..., 0] + 0.587 * img_styled[..., 1] + 0.114 * img_styled[..., 2]
     mean = float(y.mean())
     std  = float(y.std())
 
     score_brightness = 1.0 - abs(mean - 0.5)
     score_contrast   = 1.0 - abs(std  - 0.25)
+    return 0.5 * score_brightness + 0.5 * score_contrast
+
+
+def _render_candidate(lowres_image: np.ndarray, cand: Dict[str, float]) -> np.ndarray:
+    # 1) apply candidate brightness + contrast, 2) HDRNet tone mapping
+    img_tone = _tone_prefix(lowres_image, cand["brightness"], cand["contrast"])
+
+    # 3) LUT style
+    lut_strength = float(cand.get("lut_strength", 0.0))
+    return _apply_lut_style(img_tone, lut_strength)
+
+
+def _score_candidate(lowres_image: np.ndarray, cand: Dict[str, float]) -> float:
+    img_styled = _render_candidate(lowres_image, cand)
 
-    # 5) NIMA-lite aesthetic score
+    # 4) heuristics + 5) NIMA-lite aesthetic score
     aest = score_aesthetic(img_styled)
+    return float(aest + _heuristic_score(img_styled))
+
+
+def _score_candidates(lowres_image: np.ndarray,
+                      candidates: List[Dict[str, float]],
+                      deadline: Optional[float] = None,
+                      session: Optional[Session] = None) -> List[Optional[float]]:
+    """
+    Same scores as _score_candidate for each candidate, but shared work is
+    done once: candidates are grouped by (brightness, contrast), each group
+    runs HDRNet and the full-strength LUT once, and its lut_strength
+    variants are just blends, scored together in one aesthetic batch.
+
+    Groups are evaluated in the order candidates are listed (the client
+    sends them by priority). With a time.monotonic() deadline, we stop
+    after the first group that finishes past it; unevaluated candidates
+    get None.
+
+    With a session, the HDRNet and full-strength LUT outputs per prefix
+    are cached on it and reused by later requests on the same image.
+    """
+    groups: Dict[Tuple[float, float], List[int]] = {}
+    for i, cand in enumerate(candidates):
+        key = (float(cand["brightness"]), float(cand["contrast"]))
+        groups.setdefault(key, []).append(i)
+
+    scores: List[Optional[float]] = [None] * len(candidates)
+    for (b, c), idxs in groups.items():
+        if deadline is not None and time.monotonic() >= deadline and any(
+            v is not None for v in scores
+        ):
+            break
+
+        img_tone = session.get_feature(("tone", b, c)) if session is not None else None
+        if img_tone is None:
+            img_tone = _tone_prefix(lowres_image, b, c)
+            if session is not None:
+                session.put_feature(("tone", b, c), img_tone)
+
+        strengths = [float(candidates[i].get("lut_strength", 0.0)) for i in idxs]
+        lut_img = None
+        if any(s > 0.0 for s in strengths):
+            lut_img = session.get_feature(("lut", b, c)) if session is not None else None
+            if lut_img is None:
+                lut_img = apply_3d_lut(img_tone, CINEMATIC_WARM_LUT)
+                if session is not None:
+                    session.put_feature(("lut", b, c), lut_img)
+
+        # duplicate strengths within a group are scored once
+        styled: Dict[float, np.ndarray] = {}
+        for s in strengths:
+            if s not in styled:
+                styled[s] = img_tone if lut_img is None else blend_lut(img_tone, lut_img, s)
+
+        aest = score_aesthetic_batch(list(styled.values()))
+        by_strength = {
+            s: float(a + _heuristic_score(img))
+            for (s, img), a in zip(styled.items(), aest)
+        }
+        for i, s in zip(idxs, strengths):
+            scores[i] = by_strength[s]
+
+    return scores
+
+
+def _select_best(lowres: np.ndarray, candidates: List[Dict[str, float]],
+                 deadline: Optional[float] = None,
+                 session: Optional[Session] = None) -> Tuple[int, int]:
+    """
+    Returns (best_index, number of candidates evaluated).
+    """
+    best_idx = 0
+    best_score = -1e9
+    evaluated = 0
+
+    for i, score in enumerate(_score_candidates(lowres, candidates, deadline, session)):
+        if score is None:
+            continue
+        evaluated += 1
+        if score > best_score:
+            best_score = score
+            best_idx = i
+
+    return best_idx, evaluated
+
+
+def _optimise_image(lowres: np.ndarray, payload: dict,
+                    deadline: Optional[float] = None,
+                    session: Optional[Session] = None) -> dict:
+    """
+    Run one /optimise request on a decoded proxy and build the response.
+
+    mode "search" (default): pick the best of the given candidates.
+    mode "gradient": projected gradient ascent on the continuous
+      parameters through the differentiable pipeline, starting from the
+      intent vector (see src/differentiable.py).
+
+    If asked, also fit a bilateral grid mapping the proxy to the winner's
+    render so the client can reproduce it at full res. The grid is skipped
+    once the deadline has passed; the client then falls back to plain
+    brightness/contrast.
+    """
+    candidates: List[Dict[str, float]] = payload["candidates"]
+
+    if payload.get("mode", "search") == "gradient":
+        steps = int(payload.get("steps", 8))
+        found = optimise_params_gradient(
+            lowres, np.asarray(payload["intent_vector"], dtype=np.float32),
+            steps=steps, deadline=deadline,
+        )
+        best = {k: found[k] for k in ("brightness", "contrast", "lut_strength")}
+        result = {
+            "best_index": None,
+            "steps": found["steps"],
+            "score": found["score"],
+            "partial": found["steps"] < steps,
+        }
+    else:
+        best_idx, evaluated = _select_best(lowres, candidates, deadline, session)
+        best = candidates[best_idx]
+        result = {
+            "best_index": best_idx,
+            "evaluated": evaluated,
+            "partial": evaluated < len(candidates),
+        }
+
+    result.update({
+        "brightness": float(best["brightness"]),
+        "contrast":   float(best["contrast"]),
+        "lut_strength": float(best.get("lut_strength", 0.0)),
+    })
+
+    want_grid = bool(payload.get("tone_grid", False))
+    if want_grid and (deadline is None or time.monotonic() < deadline):
+        scored = _render_candidate(lowres, best)
+        result["tone_grid"] = encode_grid(fit_bilateral_grid(lowres, scored))
+
+    if session is not None:
+        sessions.enforce_bounds()  # new features count towards the budget
+    return result
 
-    total = aest + 0.5 * score_brightness + 0.5 * score_contrast
-    return float(total)
 
+class ShmUnavailable(Exception):
+    """
+    The request's shared-memory segment could not be attached or viewed.
+    """
+
+
+def _with_shared_image(name: str, shape, dtype: str, fn):
+    """
+    Call fn(image) on a view straight into shared memory (no copy).
+    fn must not keep references to the view. Raises ShmUnavailable if the
+    segment can't be mapped; errors from fn propagate unchanged.
+    """
+    try:
+        shm = _open_shared_image(name)
+    except (FileNotFoundError, ValueError, TypeError) as e:
+        raise ShmUnavailable(e) from e
+    try:
+        try:
+            lowres = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=shm.buf)
+        except (ValueError, TypeError) as e:
+            raise ShmUnavailable(e) from e
+        try:
+            return fn(lowres)
+        finally:
+            del lowres
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # a propagating traceback still references the view;
+            # the mapping is released together with it
+            pass
+
+
+def _payload_image(payload: dict, fn):
+    """
+    Call fn(image) on the request's image: a shared-memory view if the
+    payload names a segment (fn must not keep it), else the decoded PNG.
+    Raises ShmUnavailable for a bad segment.
+    """
+    if "shm_name" in payload:
+        return _with_shared_image(
+            payload["shm_name"], payload["shape"],
+            payload.get("dtype", "float32"), fn,
+        )
+    return fn(_decode_image_from_base64(payload["image_base64"]))
 
 
+def _shm_unavailable(e: ShmUnavailable):
+    # not co-located (or bad segment): client retries over HTTP
+    return jsonify({"error": "shm_unavailable", "detail": str(e)}), 422
 
 
+@app.route("/health", methods=["GET"])
+def health():
+    return jsonify({"ok": True, "sessions": len(sessions)})
+
+
+@app.route("/session", methods=["POST"])
+def open_session():
+    """
+    Upload a proxy once (image_base64 or shm); returns {"session_id"}.
+    """
+    payload = request.get_json(force=True)
+    try:
+        sid = _payload_image(payload, sessions.create)
+    except ShmUnavailable as e:
+        return _shm_unavailable(e)
+    return jsonify({"session_id": sid})
+
+
+@app.route("/session/<sid>", methods=["DELETE"])
+def close_session(sid):
+    return jsonify({"released": sessions.release(sid)})
 
 
 @app.route("/optimise", methods=["POST"])
 def optimise():
+    start = time.monotonic()
     payload = request.get_json(force=True)
 
-    lowres = _decode_image_from_base64(payload["image_base64"])
-    candidates: List[Dict[str, float]] = payload["candidates"]
+    # anytime mode: return the best-so-far once deadline_ms has elapsed
+    deadline = None
+    if payload.get("deadline_ms") is not None:
+        deadline = start + float(payload["deadline_ms"]) / 1000.0
 
-    best_idx = 0
-    best_score = -1e9
+    if payload.get("mode") == "gradient" and TONE_BACKEND != "hdrnet":
+        return jsonify({"error": "gradient_unsupported",
+                        "detail": f"gradient mode needs TONE_BACKEND=hdrnet, not {TONE_BACKEND}"}), 400
 
-    for i, cand in enumerate(candidates):
-        score = _score_candidate(lowres, cand)
-        if score > best_score:
-            best_score = score
-            best_idx = i
+    if "session_id" in payload:
+        # image was uploaded earlier: no transfer, no decode
+        session = sessions.get(payload["session_id"])
+        if session is None:
+            return jsonify({"error": "session_unknown"}), 404
+        return jsonify(_optimise_image(session.image, payload, deadline, session))
 
-    best = candidates[best_idx]
+    def run(lowres):
+        if not payload.get("open_session"):
+            return _optimise_image(lowres, payload, deadline)
+        # keep the image for follow-up requests on the same proxy
+        sid = sessions.create(lowres)
+        session = sessions.get(sid)
+        result = _optimise_image(session.image, payload, deadline, session)
+        result["session_id"] = sid
+        return result
 
-    return jsonify({
-    "best_index": best_idx,
-    "brightness": float(best["brightness"]),
-    "contrast":   float(best["contrast"]),
-    "lut_strength": float(best.get("lut_strength", 0.0)),  # ADD THIS
-    })
+    try:
+        result = _payload_image(payload, run)
+    except ShmUnavailable as e:
+        return _shm_unavailable(e)
+
+    return jsonify(result)
 
 
 
 if __name__ == "__main__":
-    print("Dummy server running at http://127.0.0.1:8000/optimise")
-    app.run(host="0.0.0.0", port=8000)
+    port = int(os.environ.get("PORT", "8000"))
+    print(f"Dummy server running at http://127.0.0.1:{port}/optimise")
+    app.run(host=os.environ.get("HOST", "0.0.0.0"), port=port, threaded=True)
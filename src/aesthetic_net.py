@@ -1,5 +1,5 @@
 import os
-from typing import Optional
+from typing import List, Optional
 
 import numpy as np
 import torch
@@ -80,3 +80,23 @@ def score_aesthetic(img: np.ndarray) -> float:
     with torch.no_grad():
         s = _aesthetic_model(x_t)  # (1,)
     return float(s.item())
+
+
+def score_aesthetic_batch(imgs: List[np.ndarray]) -> List[float]:
+    """
+    imgs: list of (H, W, 3) float32 [0,1], all the same shape
+    Scores them in one forward pass. Same values as score_aesthetic per image.
+    """
+    global _aesthetic_model, _aesthetic_device
+
+    if _aesthetic_model is None:
+        return [0.0] * len(imgs)
+    if not imgs:
+        return []
+
+    x = np.clip(np.stack(imgs), 0.0, 1.0).astype(np.float32)
+    x_t = torch.from_numpy(x).permute(0, 3, 1, 2).to(_aesthetic_device)
+
+    with torch.no_grad():
+        s = _aesthetic_model(x_t)  # (B,)
+    return [float(v) for v in s.cpu().tolist()]
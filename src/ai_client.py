@@ -1,7 +1,14 @@
 import os
 import base64
+import bisect
+import hashlib
 import json
-from typing import Dict, List
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlparse
 
 import numpy as np
 import requests
@@ -9,6 +16,10 @@ from PIL import Image
 import io
 
 from .apply_edits import apply_brightness, apply_contrast
+from .bilateral_grid import decode_grid
+from .phash_index import dct_hash, get_phash_index
+from .surrogate import get_surrogate
+from . import config
 
 """
 Modal / server API contract (planned):
@@ -21,7 +32,15 @@ Request JSON:
   "candidates": [
     { "brightness": float, "contrast": float, "lut_strength": float }
   ],
-  "intent_vector": [Δbrightness, Δcontrast, Δlut_strength]
+  "intent_vector": [Δbrightness, Δcontrast, Δlut_strength],
+  "tone_grid": bool            (optional) also return a fitted bilateral grid
+  "deadline_ms": float         (optional) anytime mode: stop scoring and
+                               return the best-so-far after this long
+  "mode": "search" | "gradient"  (optional, default "search")
+                               gradient: ignore the candidate grid and run
+                               projected gradient steps from intent_vector
+                               (HDRNet tone backend only, else 400)
+  "steps": int                 (optional) gradient steps, default 8
 }
 
 Response JSON:
@@ -29,8 +48,29 @@ Response JSON:
   "best_index": int,
   "brightness": float,
   "contrast": float,
-  "lut_strength": float
+  "lut_strength": float,
+  "tone_grid": {"shape", "dtype", "data"}   (only if requested)
+  "evaluated": int,            candidates actually scored ("search")
+  "steps": int, "score": float gradient steps taken / best score ("gradient")
+  "partial": bool              true if the deadline cut the search short
 }
+
+tone_grid maps the low-res proxy to the server's scored render
+(brightness/contrast + HDRNet + LUT); see bilateral_grid.py.
+
+Local transport (client and server on the same host):
+instead of "image_base64" the request carries
+  "shm_name": "<shared-memory segment>", "shape": [H, W, 3], "dtype": "float32"
+The client owns the segment (create + unlink); the server only maps it.
+If the server cannot open the segment it answers 422 {"error": "shm_unavailable"}
+and the client falls back to "image_base64".
+
+Sessions (repeated calls on the same proxy):
+  "open_session": true on an /optimise request with an image makes the
+  server keep the decoded proxy and return "session_id". Later requests
+  send "session_id" instead of any image; 404 {"error": "session_unknown"}
+  means it expired and the image must be sent again.
+  POST /session {image} -> {"session_id"};  DELETE /session/<id>
 """
 
 
@@ -47,10 +87,347 @@ def _encode_image_to_base64(img: np.ndarray) -> str:
     return base64.b64encode(buf.read()).decode("utf-8")
 
 
+_LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+# endpoints that rejected a shared-memory request -> time.monotonic() until
+# which we send them base64 instead (a restarted or moved server gets
+# another try once the window has passed)
+SHM_RETRY_S = 60.0
+_shm_unavailable: Dict[str, float] = {}
+
+
+def _use_shm_transport(api_url: str) -> bool:
+    """
+    AI_TRANSPORT=http  -> always base64 over HTTP
+    AI_TRANSPORT=shm   -> shared memory, fall back to HTTP if the server can't map it
+    AI_TRANSPORT=auto  -> shared memory only when the server URL is on this host
+    """
+    mode = os.environ.get("AI_TRANSPORT", "auto")
+    if mode == "http" or _shm_unavailable.get(api_url, 0.0) > time.monotonic():
+        return False
+    if mode == "shm":
+        return True
+    return urlparse(api_url).hostname in _LOCAL_HOSTS
+
+
+def _write_shared_image(img: np.ndarray) -> shared_memory.SharedMemory:
+    """
+    Copy img into a new shared-memory segment as float32 (H, W, 3).
+    Caller must close() and unlink() the returned segment.
+    """
+    x = np.clip(img, 0.0, 1.0).astype(np.float32)
+    shm = shared_memory.SharedMemory(create=True, size=max(x.nbytes, 1))
+    try:
+        np.ndarray(x.shape, dtype=np.float32, buffer=shm.buf)[...] = x
+    except Exception:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm
+
+
+REQUEST_TIMEOUT_S = 10.0
+
+
+def _remaining(deadline: Optional[float]) -> float:
+    """
+    Seconds left until a time.monotonic() deadline (REQUEST_TIMEOUT_S if none).
+    Raises requests.Timeout once it has passed.
+    """
+    if deadline is None:
+        return REQUEST_TIMEOUT_S
+    left = deadline - time.monotonic()
+    if left <= 0.0:
+        raise requests.Timeout("latency budget exhausted")
+    return left
+
+
+def _post_with_image(api_url: str, payload: dict, lowres_image: np.ndarray,
+                     deadline: Optional[float] = None) -> dict:
+    """
+    POST an /optimise request, shipping the image over shared memory when
+    the server is local, else as base64 PNG.
+    """
+    headers = {"Content-Type": "application/json"}
+
+    if _use_shm_transport(api_url):
+        shm = _write_shared_image(lowres_image)
+        try:
+            shm_payload = dict(payload)
+            shm_payload.update({
+                "shm_name": shm.name,
+                "shape": list(lowres_image.shape),
+                "dtype": "float32",
+            })
+            resp = requests.post(
+                api_url, headers=headers, data=json.dumps(shm_payload),
+                timeout=_remaining(deadline),
+            )
+        finally:
+            # the server has finished with the segment once it has answered
+            shm.close()
+            shm.unlink()
+
+        if resp.status_code != 422:
+            resp.raise_for_status()
+            return resp.json()
+        _shm_unavailable[api_url] = time.monotonic() + SHM_RETRY_S
+
+    payload = dict(payload)
+    payload["image_base64"] = _encode_image_to_base64(lowres_image)
+    resp = requests.post(
+        api_url, headers=headers, data=json.dumps(payload),
+        timeout=_remaining(deadline),
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+SESSION_CACHE_SIZE = 64
+
+# (api_url, image digest) -> server session id for an uploaded proxy
+_sessions: "OrderedDict[tuple, str]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+SESSION_RELEASE_TIMEOUT_S = 2.0
+
+
+def _image_digest(img: np.ndarray) -> str:
+    x = np.ascontiguousarray(img, dtype=np.float32)
+    h = hashlib.blake2b(x.tobytes(), digest_size=16)
+    h.update(str(x.shape).encode())
+    return h.hexdigest()
+
+
+def _post_optimise(api_url: str, payload: dict, lowres_image: np.ndarray,
+                   deadline: Optional[float] = None,
+                   digest: Optional[str] = None,
+                   keep_session: bool = False) -> dict:
+    """
+    POST an /optimise request. With keep_session, the first request for an
+    image uploads it and opens a server session; follow-ups on the same
+    proxy (e.g. a changed intent) send only the session id and candidates.
+    One-shot requests upload the image without opening one. An expired
+    session (404) is transparently re-uploaded.
+    """
+    key = (api_url, digest or _image_digest(lowres_image))
+    with _sessions_lock:
+        sid = _sessions.get(key)
+        if sid is not None:
+            _sessions.move_to_end(key)
+
+    if sid is not None:
+        resp = requests.post(
+            api_url, headers={"Content-Type": "application/json"},
+            data=json.dumps(dict(payload, session_id=sid)),
+            timeout=_remaining(deadline),
+        )
+        if resp.status_code != 404:
+            resp.raise_for_status()
+            return resp.json()
+        with _sessions_lock:
+            _sessions.pop(key, None)
+
+    if keep_session:
+        payload = dict(payload, open_session=True)
+    data = _post_with_image(api_url, payload, lowres_image, deadline)
+    if "session_id" in data:
+        with _sessions_lock:
+            _sessions[key] = data["session_id"]
+            while len(_sessions) > SESSION_CACHE_SIZE:
+                _sessions.popitem(last=False)
+    return data
+
+
+def _delete_sessions(sessions: List[tuple]) -> None:
+    for api_url, sid in sessions:
+        try:
+            requests.delete(urljoin(api_url, f"/session/{sid}"),
+                            timeout=SESSION_RELEASE_TIMEOUT_S)
+        except requests.RequestException:
+            pass  # the server's session TTL reclaims it
+
+
+def release_session(lowres_image: np.ndarray) -> None:
+    """
+    Close the server sessions opened for this proxy (keep_session), e.g.
+    when its branch is dropped. The DELETEs go out on a background thread.
+    """
+    digest = _image_digest(lowres_image)
+    with _sessions_lock:
+        keys = [k for k in _sessions if k[1] == digest]
+        dropped = [(k[0], _sessions.pop(k)) for k in keys]
+    if dropped:
+        threading.Thread(target=_delete_sessions, args=(dropped,), daemon=True,
+                         name="session-release").start()
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class EndpointRouter:
+    """
+    Client-side sharding over several optimise servers.
+
+    Requests are routed by consistent hashing on the image digest, so the
+    same proxy keeps landing on the same worker (and its session / caches);
+    adding or removing a worker only remaps ~1/N of the keys.
+
+    A node that fails `max_failures` times in a row is ejected for
+    `eject_s` seconds; after that it must pass GET /health before it
+    receives traffic again. The probe runs on a background thread, one per
+    node at a time, so no request waits on it; a failed probe ejects the
+    node for another window. Callers retry on the next node of the ring.
+    """
+
+    def __init__(self, endpoints: List[str], vnodes: int = 64,
+                 max_failures: int = 2, eject_s: float = 10.0,
+                 health_timeout: float = 0.5):
+        self.endpoints = list(dict.fromkeys(endpoints))
+        self.max_failures = max_failures
+        self.eject_s = eject_s
+        self.health_timeout = health_timeout
+
+        ring = sorted(
+            (_ring_hash(f"{ep}#{i}"), ep)
+            for ep in self.endpoints for i in range(vnodes)
+        )
+        self._ring_keys = [h for h, _ in ring]
+        self._ring_nodes = [ep for _, ep in ring]
+
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {ep: 0 for ep in self.endpoints}
+        self._ejected_until: Dict[str, float] = {ep: 0.0 for ep in self.endpoints}
+        self._probing: set = set()
+
+    def _ring_order(self, key: str) -> List[str]:
+        start = bisect.bisect(self._ring_keys, _ring_hash(key))
+        order: List[str] = []
+        for i in range(len(self._ring_nodes)):
+            ep = self._ring_nodes[(start + i) % len(self._ring_nodes)]
+            if ep not in order:
+                order.append(ep)
+                if len(order) == len(self.endpoints):
+                    break
+        return order
+
+    def route(self, key: str) -> List[str]:
+        """
+        Endpoints to try for this key, owner first. Ejected nodes are left
+        out (a node whose ejection has expired is probed in the background
+        and returns on a later call); if every node is ejected we try them
+        all anyway rather than fail outright.
+        """
+        order = self._ring_order(key)
+        live = []
+        for ep in order:
+            with self._lock:
+                until = self._ejected_until[ep]
+                # one caller probes an expired node; others skip it meanwhile
+                probe = until != 0.0 and time.monotonic() >= until and ep not in self._probing
+                if probe:
+                    self._probing.add(ep)
+            if until == 0.0:
+                live.append(ep)
+            elif probe:
+                threading.Thread(target=self._probe, args=(ep,), daemon=True,
+                                 name="router-probe").start()
+        return live or order
+
+    def _probe(self, endpoint: str) -> None:
+        healthy = self.check_health(endpoint)
+        with self._lock:
+            self._probing.discard(endpoint)
+            if healthy:
+                self._failures[endpoint] = 0
+                self._ejected_until[endpoint] = 0.0
+            else:
+                # still down: stay ejected for another window
+                self._ejected_until[endpoint] = time.monotonic() + self.eject_s
+
+    def health_url(self, endpoint: str) -> str:
+        return urljoin(endpoint, "/health")
+
+    def check_health(self, endpoint: str) -> bool:
+        try:
+            return requests.get(self.health_url(endpoint), timeout=self.health_timeout).ok
+        except requests.RequestException:
+            return False
+
+    def mark_ok(self, endpoint: str) -> None:
+        with self._lock:
+            self._failures[endpoint] = 0
+            self._ejected_until[endpoint] = 0.0
+
+    def mark_failure(self, endpoint: str) -> None:
+        with self._lock:
+            self._failures[endpoint] += 1
+            if self._failures[endpoint] >= self.max_failures:
+                self._ejected_until[endpoint] = time.monotonic() + self.eject_s
+
+    def is_ejected(self, endpoint: str) -> bool:
+        with self._lock:
+            return self._ejected_until[endpoint] > 0.0
+
+
+_router: Optional[EndpointRouter] = None
+
+
+def _get_router(urls: List[str]) -> EndpointRouter:
+    global _router
+
+    if _router is None or _router.endpoints != list(dict.fromkeys(urls)):
+        _router = EndpointRouter(urls)
+    return _router
+
+
+def _retryable(e: requests.RequestException) -> bool:
+    # connection problems, timeouts and 5xx move on to the next node
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return e.response.status_code >= 500
+    return True
+
+
+def _post_routed(payload: dict, lowres_image: np.ndarray,
+                 deadline: Optional[float] = None, keep_session: bool = False) -> dict:
+    """
+    AI_API_URLS (comma-separated) shards requests over several servers with
+    EndpointRouter; otherwise everything goes to AI_API_URL.
+    """
+    urls = [u.strip() for u in os.environ.get("AI_API_URLS", "").split(",") if u.strip()]
+    if len(urls) <= 1:
+        api_url = urls[0] if urls else os.environ.get("AI_API_URL", "http://localhost:8000/optimise")
+        return _post_optimise(api_url, payload, lowres_image, deadline,
+                              keep_session=keep_session)
+
+    router = _get_router(urls)
+    digest = _image_digest(lowres_image)
+    last_error: Optional[Exception] = None
+
+    for endpoint in router.route(digest):
+        try:
+            data = _post_optimise(endpoint, payload, lowres_image, deadline, digest,
+                                  keep_session)
+        except requests.RequestException as e:
+            if not _retryable(e):
+                raise
+            router.mark_failure(endpoint)
+            last_error = e
+            _remaining(deadline)  # out of budget: stop retrying
+            continue
+        router.mark_ok(endpoint)
+        return data
+
+    raise last_error
+
+
 def _generate_candidates(intent_vector: np.ndarray) -> list[dict]:
     d_b, d_c = float(intent_vector[0]), float(intent_vector[1])
 
-    scales = [0.5, 0.75, 1.0, 1.25, 1.5]
+    # priority order: the server may stop early under a deadline,
+    # so the user's own intent (scale 1.0) is scored first
+    scales = [1.0, 0.75, 1.25, 0.5, 1.5]
 
     candidates = []
     for s in scales:
@@ -96,47 +473,25 @@ def _score_candidate(lowres_image: np.ndarray, cand: Dict[str, float]) -> float:
 USE_SERVER = True  # set True when using HTTP server / Modal
 
 
-def optimise_tone_colour(lowres_image: np.ndarray,
-                         intent_vector: np.ndarray) -> Dict[str, float]:
-    """
-    If USE_SERVER = True:
-      - send low-res image + candidates + intent_vector to HTTP server (future Modal)
-    Else:
-      - use local heuristic candidate search (current logic).
-    """
-    candidates = _generate_candidates(intent_vector)
-
-    if USE_SERVER:
-        # --- future server path ---
-        payload = {
-            "image_base64": _encode_image_to_base64(lowres_image),
-            "candidates": [
-                {
-                    "brightness": float(c["brightness"]),
-                    "contrast": float(c["contrast"]),
-                    "lut_strength": float(c.get("lut_strength", 0.0)),
-                }
-                for c in candidates
-            ],
-            "intent_vector": intent_vector.tolist(),
-        }
-
-        api_url = os.environ.get("AI_API_URL", "http://localhost:8000/optimise")
-        headers = {"Content-Type": "application/json"}
+# part of the budget kept back for the network hop and the response
+DEADLINE_MARGIN_S = 0.15
 
-        resp = requests.post(
-            api_url, headers=headers, data=json.dumps(payload), timeout=10
-        )
-        resp.raise_for_status()
-        data = resp.json()
 
+def _local_search(lowres_image: np.ndarray, candidates: List[dict]) -> Dict[str, float]:
+    """
+    Pick a candidate without the server: with the distilled surrogate of the
+    server's scorer when one is available (see surrogate.py), otherwise the
+    mean/std heuristic above.
+    """
+    surrogate = get_surrogate()
+    if surrogate is not None:
+        best_cand = candidates[int(np.argmax(surrogate.score(lowres_image, candidates)))]
         return {
-            "brightness": float(data["brightness"]),
-            "contrast": float(data["contrast"]),
-            # "lut_strength": float(data["lut_strength"]),  # later, when we use LUT
+            "brightness": float(best_cand["brightness"]),
+            "contrast": float(best_cand["contrast"]),
+            "lut_strength": float(best_cand.get("lut_strength", 0.0)),
         }
 
-    # --- local heuristic fallback (what you already had) ---
     best_score = -1e9
     best_cand = candidates[0]
 
@@ -149,4 +504,119 @@ def optimise_tone_colour(lowres_image: np.ndarray,
     return {
         "brightness": float(best_cand["brightness"]),
         "contrast": float(best_cand["contrast"]),
+        "lut_strength": float(best_cand.get("lut_strength", 0.0)),
+    }
+
+
+def _optimise_payload(candidates: List[dict], intent_vector: np.ndarray,
+                      latency_budget: float, mode: Optional[str] = None) -> dict:
+    """
+    /optimise body without the image (also used by load_test.py).
+    A latency_budget <= 0 sends no deadline.
+    """
+    payload = {
+        "candidates": [
+            {
+                "brightness": float(c["brightness"]),
+                "contrast": float(c["contrast"]),
+                "lut_strength": float(c.get("lut_strength", 0.0)),
+            }
+            for c in candidates
+        ],
+        "intent_vector": np.asarray(intent_vector).tolist(),
+        "tone_grid": True,
+        "mode": mode or config.AI_OPTIMISE_MODE,
+    }
+    if latency_budget > 0:
+        payload["deadline_ms"] = max(0.0, latency_budget - DEADLINE_MARGIN_S) * 1000.0
+    return payload
+
+
+def optimise_tone_colour(lowres_image: np.ndarray,
+                         intent_vector: np.ndarray,
+                         latency_budget: Optional[float] = None,
+                         mode: Optional[str] = None,
+                         keep_session: bool = False) -> Dict[str, float]:
+    """
+    If USE_SERVER = True:
+      - send low-res image + candidates + intent_vector to HTTP server (future Modal)
+    Else:
+      - use local candidate search (distilled surrogate if available,
+        otherwise the heuristic).
+
+    latency_budget (seconds, default config.AI_LATENCY_BUDGET_S, which is
+      0 unless AI_LATENCY_BUDGET_MS is set): the server is asked to return
+      its best-so-far in time, and if the call still misses the budget (or
+      fails) we fall back to the local search instead of raising. A budget
+      <= 0 disables this: the call blocks up to REQUEST_TIMEOUT_S and
+      errors propagate. Interactive callers (UI branch previews, prefetch)
+      pass a budget, e.g. 2.0.
+
+    The result's "source" is "server", "server_partial" (deadline cut the
+    server's search short), "fallback" or "local" (USE_SERVER off).
+
+    mode (default config.AI_OPTIMISE_MODE): "search" over the candidates,
+    or "gradient" descent on continuous parameters, server-side only.
+
+    keep_session: the caller expects follow-ups on this proxy, so the
+    server keeps it in a session (see _post_optimise); release it with
+    release_session when done.
+
+    With a perceptual-hash index (PHASH_INDEX_PATH), a near-duplicate of a
+    previously optimised proxy with the same intent reuses its params
+    (source "reused"): the server only scores that one candidate, so the
+    tone_grid is still fitted on this proxy. With a different intent its
+    params are tried first as a warm-start candidate.
+    """
+    candidates = _generate_candidates(intent_vector)
+
+    index = get_phash_index()
+    phash = None
+    reused = False
+    if index is not None:
+        phash = dct_hash(lowres_image)
+        kind, params = index.lookup(phash, intent_vector)
+        if kind == "reuse":
+            if not USE_SERVER:
+                return dict(params, source="reused")
+            candidates, mode, reused = [params], "search", True
+        elif kind == "warm_start":
+            candidates.insert(0, params)
+
+    if not USE_SERVER:
+        result = _local_search(lowres_image, candidates)
+        result["source"] = "local"
+        return result
+
+    if latency_budget is None:
+        latency_budget = config.AI_LATENCY_BUDGET_S
+    deadline = None
+    if latency_budget > 0:
+        deadline = time.monotonic() + latency_budget
+
+    # --- future server path ---
+    payload = _optimise_payload(candidates, intent_vector, latency_budget, mode)
+
+    try:
+        data = _post_routed(payload, lowres_image, deadline, keep_session)
+    except requests.RequestException:
+        if deadline is None:
+            raise
+        # server slow or down: stay interactive with the local heuristic
+        result = _local_search(lowres_image, candidates)
+        result["source"] = "fallback"
+        return result
+
+    result = {
+        "brightness": float(data["brightness"]),
+        "contrast": float(data["contrast"]),
+        "lut_strength": float(data.get("lut_strength", 0.0)),
+        "source": "server_partial" if data.get("partial") else "server",
     }
+    if reused:
+        result["source"] = "reused"
+    elif index is not None and not data.get("partial"):
+        index.add(phash, intent_vector, result)
+    if "tone_grid" in data:
+        result["tone_grid"] = decode_grid(data["tone_grid"])
+    return result
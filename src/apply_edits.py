@@ -1,6 +1,12 @@
 import numpy as np
 from PIL import Image
-from .edits import BRIGHTNESS, CONTRAST, SATURATION, TEMPERATURE, FILTER
+from .edits import BRIGHTNESS, CONTRAST, SATURATION, TEMPERATURE, FILTER, GRAIN, VIGNETTE, TONE_GRID
+from .bilateral_grid import apply_bilateral_grid, grid_from_edit_params
+from .spatial_kernels import vignette_mask, grain_noise
+from .lut_utils import apply_3d_lut, blend_lut
+from .lut_library import get_lut_library
+
+GRAIN_MAX_STD = 0.1  # noise std at amount = 1.0
 
 def load_image(path):
     img = Image.open(path).convert("RGB")
@@ -33,9 +39,29 @@ def apply_filter(img, filter_id, strength):
         warm = apply_temperature(img, 0.5)
         faded = np.clip(warm + 0.05, 0.0, 1.0)
         return img * (1 - strength) + faded * strength
-    return img
 
-def apply_edits_sequence(img, edits):
+    # any other id is a look from the LUT library
+    library = get_lut_library()
+    lut = library.get(filter_id) if library is not None else None
+    if lut is None or strength <= 0.0:
+        return img
+    return blend_lut(img, apply_3d_lut(img, lut), strength)
+
+def apply_vignette(img, amount, radius=0.5, softness=0.5, frame=None):
+    h, w, _ = img.shape
+    mask = vignette_mask(h, w, amount, radius, softness, frame)
+    return np.clip(img * mask, 0.0, 1.0)
+
+def apply_grain(img, amount, size=1.0, seed=0, frame=None):
+    h, w, _ = img.shape
+    noise = grain_noise(h, w, seed, size, frame)
+    return np.clip(img + noise * (amount * GRAIN_MAX_STD), 0.0, 1.0)
+
+def apply_edits_sequence(img, edits, frame=None):
+    """
+    frame = (full_h, full_w, y0, x0) when img is a tile of a larger frame;
+    only the spatial edits (grain, vignette, tone grid) need to know.
+    """
     out = img.copy()
     for e in edits:
         if e.type == BRIGHTNESS:
@@ -48,4 +74,14 @@ def apply_edits_sequence(img, edits):
             out = apply_temperature(out, e.params["value"])
         elif e.type == FILTER:
             out = apply_filter(out, e.params["id"], e.params.get("strength", 1.0))
+        elif e.type == VIGNETTE:
+            out = apply_vignette(out, e.params["amount"],
+                                 e.params.get("radius", 0.5),
+                                 e.params.get("softness", 0.5), frame)
+        elif e.type == GRAIN:
+            out = apply_grain(out, e.params["amount"],
+                              e.params.get("size", 1.0),
+                              e.params.get("seed", 0), frame)
+        elif e.type == TONE_GRID:
+            out = apply_bilateral_grid(out, grid_from_edit_params(e.params), frame)
     return out
@@ -0,0 +1,220 @@
+"""
+Bilateral grid of local affine colour transforms (HDRNet-style).
+
+The server fits it on the low-res proxy: for each (y, x, luminance) cell a
+3x4 affine map from input RGB to the scored output RGB. The client slices
+the grid at full resolution in one pass, so the shipped image matches what
+was scored without running the CNN at full size.
+"""
+
+import base64
+from typing import Tuple
+
+import numpy as np
+
+GRID_SHAPE = (16, 16, 8)  # (rows, cols, luminance bins)
+GRID_REG = 0.1            # pull towards the global affine fit in sparse cells
+APPLY_CHUNK_ROWS = 128
+
+
+def _luminance(img: np.ndarray) -> np.ndarray:
+    return np.clip(0.299 * img[..., 0] + 0.587 * img[..., 1] + 0.114 * img[..., 2], 0.0, 1.0)
+
+
+def _corners(gy: np.ndarray, gx: np.ndarray, gz: np.ndarray, shape: Tuple[int, int, int]):
+    """
+    Trilinear corners for flattened coordinates.
+    Yields (flat cell index, weight) for each of the 8 corners.
+    """
+    gh, gw, gd = shape
+    y0 = np.floor(gy).astype(np.intp)
+    x0 = np.floor(gx).astype(np.intp)
+    z0 = np.floor(gz).astype(np.intp)
+    fy, fx, fz = gy - y0, gx - x0, gz - z0
+    y1 = np.minimum(y0 + 1, gh - 1)
+    x1 = np.minimum(x0 + 1, gw - 1)
+    z1 = np.minimum(z0 + 1, gd - 1)
+
+    for yi, wy in ((y0, 1.0 - fy), (y1, fy)):
+        for xi, wx in ((x0, 1.0 - fx), (x1, fx)):
+            for zi, wz in ((z0, 1.0 - fz), (z1, fz)):
+                yield (yi * gw + xi) * gd + zi, wy * wx * wz
+
+
+def _pixel_coords(h: int, w: int, shape, rows: slice = None, frame=None):
+    """
+    Grid (y, x) coordinates of pixel centres, flattened; optionally only `rows`.
+    Coordinates are relative to the frame, so any resolution maps the same.
+    frame = (full_h, full_w, y0, x0) when the (h, w) image is a tile.
+    """
+    gh, gw, _ = shape
+    full_h, full_w, y0, x0 = frame or (h, w, 0, 0)
+    rows = rows or slice(0, h)
+    r = np.arange(rows.start, rows.stop, dtype=np.float32) + y0
+    c = np.arange(w, dtype=np.float32) + x0
+    gy = np.clip((r + 0.5) / full_h * gh - 0.5, 0.0, gh - 1)
+    gx = np.clip((c + 0.5) / full_w * gw - 0.5, 0.0, gw - 1)
+    gy, gx = np.meshgrid(gy, gx, indexing="ij")
+    return gy.ravel(), gx.ravel()
+
+
+def fit_bilateral_grid(src: np.ndarray, dst: np.ndarray,
+                       shape: Tuple[int, int, int] = GRID_SHAPE,
+                       reg: float = GRID_REG) -> np.ndarray:
+    """
+    Least-squares fit of per-cell affine colour maps with src -> dst.
+    src, dst: (h, w, 3) float32 [0,1], same shape (the proxy before/after).
+    returns: (gh, gw, gd, 3, 4) float32
+    """
+    h, w, _ = src.shape
+    gh, gw, gd = shape
+    n_cells = gh * gw * gd
+
+    x = src.reshape(-1, 3).astype(np.float64)
+    y = dst.reshape(-1, 3).astype(np.float64)
+    a = np.concatenate([x, np.ones((x.shape[0], 1))], axis=1)  # (N, 4)
+
+    ata = (a[:, :, None] * a[:, None, :]).reshape(-1, 16)  # (N, 16)
+    atb = (a[:, :, None] * y[:, None, :]).reshape(-1, 12)  # (N, 4*3)
+
+    # global affine, used where a cell has little data
+    g_ata = ata.sum(0).reshape(4, 4) + 1e-6 * np.eye(4)
+    g_atb = atb.sum(0).reshape(4, 3)
+    global_x = np.linalg.solve(g_ata, g_atb)  # (4, 3)
+
+    gy, gx = _pixel_coords(h, w, shape)
+    gz = _luminance(src).ravel() * (gd - 1)
+
+    cell_ata = np.zeros((n_cells, 16))
+    cell_atb = np.zeros((n_cells, 12))
+    for idx, wgt in _corners(gy, gx, gz, shape):
+        for k in range(16):
+            cell_ata[:, k] += np.bincount(idx, weights=wgt * ata[:, k], minlength=n_cells)
+        for k in range(12):
+            cell_atb[:, k] += np.bincount(idx, weights=wgt * atb[:, k], minlength=n_cells)
+
+    lam = reg * x.shape[0] / n_cells
+    m = cell_ata.reshape(-1, 4, 4) + lam * np.eye(4)
+    rhs = cell_atb.reshape(-1, 4, 3) + lam * global_x
+    coeffs = np.linalg.solve(m, rhs)  # (cells, 4, 3)
+
+    # store as 3x4: out_c = sum_j A[c, j] * [r, g, b, 1]_j
+    grid = coeffs.transpose(0, 2, 1).reshape(gh, gw, gd, 3, 4)
+    return grid.astype(np.float32)
+
+
+def _init_torch():
+    """
+    Lazily import torch for the fast slicing path; None if unavailable.
+    """
+    try:
+        import torch  # type: ignore
+        return torch
+    except Exception:
+        return None
+
+
+def _apply_torch(torch, img: np.ndarray, grid: np.ndarray, frame=None) -> np.ndarray:
+    """
+    Same as the numpy path, with the trilinear slice done by grid_sample.
+    align_corners=False + border padding reproduce our cell-centre,
+    clamped coordinates exactly.
+    """
+    import torch.nn.functional as F  # type: ignore
+
+    h, w, _ = img.shape
+    full_h, full_w, y0, x0 = frame or (h, w, 0, 0)
+    gh, gw, gd = grid.shape[:3]
+    vol = torch.from_numpy(np.ascontiguousarray(
+        grid.reshape(gh, gw, gd, 12).transpose(3, 2, 0, 1)))[None]  # (1, 12, gd, gh, gw)
+    xs = (torch.arange(w, dtype=torch.float32) + x0 + 0.5) / full_w * 2.0 - 1.0
+    out = np.empty((h, w, 3), dtype=np.float32)
+
+    with torch.no_grad():
+        for r0 in range(0, h, APPLY_CHUNK_ROWS * 4):
+            r1 = min(h, r0 + APPLY_CHUNK_ROWS * 4)
+            px = torch.from_numpy(np.ascontiguousarray(img[r0:r1], dtype=np.float32))
+            ys = (torch.arange(r0, r1, dtype=torch.float32) + y0 + 0.5) / full_h * 2.0 - 1.0
+            lum = torch.from_numpy(_luminance(img[r0:r1]).astype(np.float32))
+            zs = (lum * (gd - 1) + 0.5) / gd * 2.0 - 1.0
+
+            coords = torch.stack([
+                xs[None, :].expand(r1 - r0, w),
+                ys[:, None].expand(r1 - r0, w),
+                zs,
+            ], dim=-1)[None, None]  # (1, 1, rows, w, 3)
+
+            coef = F.grid_sample(vol, coords, mode="bilinear",
+                                 padding_mode="border", align_corners=False)
+            coef = coef[0, :, 0].permute(1, 2, 0).reshape(r1 - r0, w, 3, 4)
+            res = (coef[..., :3] * px[..., None, :]).sum(-1) + coef[..., 3]
+            out[r0:r1] = res.numpy()
+
+    return np.clip(out, 0.0, 1.0)
+
+
+def apply_bilateral_grid(img: np.ndarray, grid: np.ndarray, frame=None) -> np.ndarray:
+    """
+    Slice the grid at every pixel of img (any resolution) and apply the
+    interpolated affine map. Processed in row chunks to bound memory.
+    Uses torch's grid_sample when torch is installed, numpy otherwise.
+    img: (H, W, 3) float32 [0,1]
+    frame = (full_h, full_w, y0, x0) when img is a tile of a larger frame.
+    """
+    torch = _init_torch()
+    if torch is not None:
+        return _apply_torch(torch, img, grid, frame)
+
+    h, w, _ = img.shape
+    shape = grid.shape[:3]
+    gd = shape[2]
+    flat = grid.reshape(-1, 12)
+    out = np.empty_like(img, dtype=np.float32)
+
+    for r0 in range(0, h, APPLY_CHUNK_ROWS):
+        rows = slice(r0, min(h, r0 + APPLY_CHUNK_ROWS))
+        px = img[rows].reshape(-1, 3).astype(np.float32)
+
+        gy, gx = _pixel_coords(h, w, shape, rows, frame)
+        gz = _luminance(px) * (gd - 1)
+
+        coef = np.zeros((px.shape[0], 12), dtype=np.float32)
+        for idx, wgt in _corners(gy, gx, gz, shape):
+            coef += flat[idx] * wgt[:, None]
+        coef = coef.reshape(-1, 3, 4)
+
+        res = np.einsum("nij,nj->ni", coef[:, :, :3], px) + coef[:, :, 3]
+        out[rows] = res.reshape(rows.stop - rows.start, w, 3)
+
+    return np.clip(out, 0.0, 1.0)
+
+
+def encode_grid(grid: np.ndarray) -> dict:
+    """
+    JSON-friendly form: float16 bytes, base64.
+    """
+    return {
+        "shape": list(grid.shape),
+        "dtype": "float16",
+        "data": base64.b64encode(grid.astype(np.float16).tobytes()).decode("utf-8"),
+    }
+
+
+def decode_grid(obj: dict) -> np.ndarray:
+    raw = base64.b64decode(obj["data"])
+    grid = np.frombuffer(raw, dtype=np.dtype(obj.get("dtype", "float16")))
+    return grid.reshape(obj["shape"]).astype(np.float32)
+
+
+def grid_edit_params(grid: np.ndarray) -> dict:
+    """
+    Params of a TONE_GRID edit: ints and a string only, so the edit goes
+    through history_codec and serialize_edits like any other.
+    """
+    gh, gw, gd = grid.shape[:3]
+    return {"rows": int(gh), "cols": int(gw), "bins": int(gd), "data": encode_grid(grid)["data"]}
+
+
+def grid_from_edit_params(params: dict) -> np.ndarray:
+    shape = [params["rows"], params["cols"], params["bins"], 3, 4]
+    return decode_grid({"shape": shape, "data": params["data"]})
@@ -2,6 +2,7 @@ import numpy as np
 
 from .history import EditHistory
 from .apply_edits import load_image, apply_edits_sequence
+from .render_cache import get_render_cache
 
 
 def render_slide_image(history: EditHistory, slide_index: int) -> np.ndarray:
@@ -11,12 +12,21 @@ def render_slide_image(history: EditHistory, slide_index: int) -> np.ndarray:
     slide_index = 0  -> after first edit
     slide_index = 1  -> after second edit, etc.
     """
+    edits_up_to = history.get_edits_up_to_index(slide_index)
+
+    cache = get_render_cache()
+    if cache is not None:
+        key = cache.key(history.base_image_path, edits_up_to)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+
     base = load_image(history.base_image_path)
-    if slide_index < 0:
-        return base
+    out = apply_edits_sequence(base, edits_up_to) if edits_up_to else base
 
-    edits_up_to = history.get_edits_up_to_index(slide_index)
-    return apply_edits_sequence(base, edits_up_to)
+    if cache is not None:
+        cache.put(key, out)
+    return out
 
 
 def render_original_future_branch(history: EditHistory, slide_index: int) -> tuple[np.ndarray, list]:
@@ -29,16 +39,27 @@ def render_original_future_branch(history: EditHistory, slide_index: int) -> tup
     future_image is what you get if you take the image at slide_index
     and apply all edits after that index.
     """
+    # edits after this slide
+    future_edits = history.get_edits_from_index_exclusive(slide_index)
+
+    cache = get_render_cache()
+    if cache is not None and future_edits:
+        all_edits = history.get_edits_up_to_index(slide_index) + future_edits
+        key = cache.key(history.base_image_path, all_edits)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit, future_edits
+
     # 1. image at the selected slide
     current_img = render_slide_image(history, slide_index)
 
-    # 2. edits after this slide
-    future_edits = history.get_edits_from_index_exclusive(slide_index)
-
     if not future_edits:
         # no future edits; the 'future' is just the current image
         return current_img, future_edits
 
     # 3. apply future edits
     future_img = apply_edits_sequence(current_img, future_edits)
+
+    if cache is not None:
+        cache.put(key, future_img)
     return future_img, future_edits
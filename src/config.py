@@ -2,3 +2,47 @@ import os
 
 AI_URL = os.environ.get("AI_API_URL", "http://localhost:8000/api/optimise")
 AI_KEY = os.environ.get("AI_API_KEY", "")
+
+# Persistent render cache (disabled when RENDER_CACHE_DIR is unset)
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR", "")
+RENDER_CACHE_MAX_MB = float(os.environ.get("RENDER_CACHE_MAX_MB", "2048"))
+RENDER_CACHE_DTYPE = os.environ.get("RENDER_CACHE_DTYPE", "uint16")  # uint8 | uint16 | float32
+
+# Generated artifacts that live outside the checkout
+CACHE_DIR = os.environ.get(
+    "F2_CACHE_DIR",
+    os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "f2"),
+)
+
+# LUT library: .cube looks packed into one binary store (see lut_library.py),
+# built by `python -m src.lut_library` or prepare_lut_library() at startup
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LUT_CUBE_DIR = os.environ.get("LUT_CUBE_DIR", os.path.join(_PROJECT_ROOT, "f2", "public", "luts"))
+LUT_LIBRARY_PATH = os.environ.get("LUT_LIBRARY_PATH", os.path.join(CACHE_DIR, "luts.lutlib"))
+
+# Default latency budget for optimise_tone_colour when the caller passes
+# none; 0 blocks and raises on errors. Interactive callers pass their own.
+AI_LATENCY_BUDGET_S = float(os.environ.get("AI_LATENCY_BUDGET_MS", "0")) / 1000.0
+
+# Server-side parameter search: "search" (candidate grid) or "gradient"
+AI_OPTIMISE_MODE = os.environ.get("AI_OPTIMISE_MODE", "search")
+
+# Perceptual-hash reuse of ai_params across near-duplicate photos
+# (disabled when PHASH_INDEX_PATH is unset)
+PHASH_INDEX_PATH = os.environ.get("PHASH_INDEX_PATH", "")
+PHASH_MAX_DISTANCE = int(os.environ.get("PHASH_MAX_DISTANCE", "6"))
+PHASH_INTENT_TOL = float(os.environ.get("PHASH_INTENT_TOL", "0.05"))
+
+# Distilled numpy surrogate of the server's scorer, used by the local /
+# fallback search when set (see surrogate.py); disabled when empty
+SURROGATE_PATH = os.environ.get("SURROGATE_PATH", "")
+
+# The frontend's neurop_lite.onnx, run headless by neurop_runtime.py
+NEUROP_MODEL_PATH = os.environ.get(
+    "NEUROP_MODEL_PATH",
+    os.path.join(_PROJECT_ROOT, "f2", "frontend", "my-new-frontend", "public", "models", "neurop_lite.onnx"),
+)
+
+# Render-graph plans (one JSON per pipeline run) for profiling
+# (disabled when RENDER_PLAN_DIR is unset)
+RENDER_PLAN_DIR = os.environ.get("RENDER_PLAN_DIR", "")
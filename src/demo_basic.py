@@ -1,8 +1,10 @@
 from src.edits import Edit, BRIGHTNESS, CONTRAST, SATURATION, FILTER
 from src.history import EditHistory
 from src.apply_edits import load_image, save_image, apply_edits_sequence
+from src.lut_library import prepare_lut_library
 
 def main():
+    prepare_lut_library()
     base_path = "example.jpg"
 
     hist = EditHistory(base_image_path=base_path)
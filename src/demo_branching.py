@@ -6,6 +6,7 @@ from .branching import (
     render_original_future_branch,
 )
 from .apply_edits import save_image
+from .lut_library import prepare_lut_library
 
 
 def build_dummy_history() -> EditHistory:
@@ -23,6 +24,7 @@ def build_dummy_history() -> EditHistory:
 
 
 def main():
+    prepare_lut_library()
     history = build_dummy_history()
 
     # Let's pretend the user clicks on slide index 1
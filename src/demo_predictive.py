@@ -3,6 +3,7 @@ from src.history import EditHistory
 from src.predictive_branch import run_predictive_branch
 from src.branching import render_original_future_branch
 from src.apply_edits import save_image
+from src.lut_library import prepare_lut_library
 
 
 def build_history() -> EditHistory:
@@ -22,6 +23,7 @@ def build_history() -> EditHistory:
 
 
 def main():
+    prepare_lut_library()
     history = build_history()
 
     # User-selected branch: after the 2nd edit (index 1)
@@ -0,0 +1,146 @@
+"""
+Differentiable (torch) version of the server's scoring pipeline:
+
+  brightness -> contrast -> HDRNetLite -> cinematic LUT blend
+             -> luminance heuristics + AestheticNet
+
+It matches server_dummy._score_candidate, but is batched over parameter
+sets and lets us run projected gradient ascent on
+(brightness, contrast, lut_strength) instead of scoring a fixed grid.
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import torch
+
+from . import hdrnet_wrapper, aesthetic_net
+from .lut_utils import CINEMATIC_WARM_LUT
+
+# (min, max) for brightness, contrast, lut_strength
+PARAM_BOUNDS = ((-0.5, 0.5), (-0.5, 0.5), (0.0, 1.0))
+# multi-start: the intent vector scaled like _generate_candidates
+START_SCALES = (0.5, 1.0, 1.5)
+
+
+def _bounds(device) -> Tuple[torch.Tensor, torch.Tensor]:
+    lo = torch.tensor([b[0] for b in PARAM_BOUNDS], device=device)
+    hi = torch.tensor([b[1] for b in PARAM_BOUNDS], device=device)
+    return lo, hi
+
+
+def apply_3d_lut_torch(x: torch.Tensor, lut: torch.Tensor) -> torch.Tensor:
+    """
+    Trilinear 3D LUT, same maths as lut_utils.apply_3d_lut.
+    x: (B, H, W, 3) in [0,1]; lut: (N, N, N, 3)
+    """
+    n = lut.shape[0]
+    pos = torch.clamp(x, 0.0, 1.0) * (n - 1)
+    i0 = torch.floor(pos).long()
+    i1 = torch.clamp(i0 + 1, max=n - 1)
+    d = pos - i0.to(pos.dtype)
+
+    flat = lut.reshape(-1, 3)
+
+    def at(r, g, b):
+        return flat[(r * n + g) * n + b]
+
+    r0, g0, b0 = i0.unbind(-1)
+    r1, g1, b1 = i1.unbind(-1)
+    dr, dg, db = (t.unsqueeze(-1) for t in d.unbind(-1))
+
+    c00 = at(r0, g0, b0) * (1 - db) + at(r0, g0, b1) * db
+    c01 = at(r0, g1, b0) * (1 - db) + at(r0, g1, b1) * db
+    c10 = at(r1, g0, b0) * (1 - db) + at(r1, g0, b1) * db
+    c11 = at(r1, g1, b0) * (1 - db) + at(r1, g1, b1) * db
+
+    c0 = c00 * (1 - dg) + c01 * dg
+    c1 = c10 * (1 - dg) + c11 * dg
+    return torch.clamp(c0 * (1 - dr) + c1 * dr, 0.0, 1.0)
+
+
+def score_params_torch(img: torch.Tensor, params: torch.Tensor) -> torch.Tensor:
+    """
+    img: (H, W, 3) proxy in [0,1]
+    params: (B, 3) rows of (brightness, contrast, lut_strength)
+    returns: (B,) scores, differentiable w.r.t. params
+    """
+    b = params[:, 0].view(-1, 1, 1, 1)
+    c = params[:, 1].view(-1, 1, 1, 1)
+    s = params[:, 2].view(-1, 1, 1, 1)
+
+    x = img.unsqueeze(0).expand(params.shape[0], -1, -1, -1)  # (B, H, W, 3)
+    x = torch.clamp(x + b, 0.0, 1.0)
+    x = torch.clamp((x - 0.5) * (1.0 + c) + 0.5, 0.0, 1.0)
+
+    # HDRNet works on (B, 3, H, W)
+    if hdrnet_wrapper._hdr_model is not None:
+        x = hdrnet_wrapper._hdr_model(x.permute(0, 3, 1, 2)).permute(0, 2, 3, 1)
+    x = torch.clamp(x, 0.0, 1.0)
+
+    lut = torch.as_tensor(CINEMATIC_WARM_LUT, device=x.device)
+    styled = torch.clamp(x * (1.0 - s) + apply_3d_lut_torch(x, lut) * s, 0.0, 1.0)
+
+    y = 0.299 * styled[..., 0] + 0.587 * styled[..., 1] + 0.114 * styled[..., 2]
+    mean = y.mean(dim=(1, 2))
+    std = y.std(dim=(1, 2), unbiased=False)
+    heuristic = 0.5 * (1.0 - (mean - 0.5).abs()) + 0.5 * (1.0 - (std - 0.25).abs())
+
+    aest = torch.zeros_like(heuristic)
+    if aesthetic_net._aesthetic_model is not None:
+        aest = aesthetic_net._aesthetic_model(styled.permute(0, 3, 1, 2))
+
+    return aest + heuristic
+
+
+def optimise_params_gradient(lowres: np.ndarray, intent_vector: np.ndarray,
+                             steps: int = 8, lr: float = 0.05,
+                             deadline: Optional[float] = None) -> Dict[str, float]:
+    """
+    Projected gradient ascent on (brightness, contrast, lut_strength).
+    Starts from the intent vector at START_SCALES, all in one batch, so each
+    step is one batched forward + backward pass. Steps are normalised per
+    parameter (sign-like) and projected back into PARAM_BOUNDS.
+    Stops early at a time.monotonic() deadline; returns the best point seen.
+    """
+    device = hdrnet_wrapper._hdr_device
+    img = torch.from_numpy(np.clip(lowres, 0.0, 1.0).astype(np.float32)).to(device)
+    lo, hi = _bounds(device)
+
+    iv = torch.as_tensor(np.asarray(intent_vector, dtype=np.float32)[:3], device=device)
+    scales = torch.tensor(START_SCALES, device=device).unsqueeze(1)
+    params = torch.max(torch.min(iv.unsqueeze(0) * scales, hi), lo).clone().requires_grad_(True)
+
+    best_score = -1e9
+    best = params.detach()[0].clone()
+    taken = 0
+
+    # gradients are taken w.r.t. params only: the shared modules are never
+    # touched, so concurrent requests can't disturb each other's grad state
+    for step in range(steps + 1):
+        scores = score_params_torch(img, params)
+
+        detached = scores.detach()
+        i = int(torch.argmax(detached))
+        if float(detached[i]) > best_score:
+            best_score = float(detached[i])
+            best = params.detach()[i].clone()
+
+        if step == steps or (deadline is not None and time.monotonic() >= deadline):
+            break
+
+        (grad,) = torch.autograd.grad(scores.sum(), params)
+        with torch.no_grad():
+            step_dir = grad / (grad.abs() + 1e-8)
+            params += lr * step_dir
+            params.copy_(torch.max(torch.min(params, hi), lo))
+        taken += 1
+
+    return {
+        "brightness": float(best[0]),
+        "contrast": float(best[1]),
+        "lut_strength": float(best[2]),
+        "score": best_score,
+        "steps": taken,
+    }
@@ -8,6 +8,7 @@ TEMPERATURE = "temperature"
 FILTER = "filter"
 GRAIN = "grain"
 VIGNETTE = "vignette"
+TONE_GRID = "tone_grid"  # accepted AI suggestion: server-fitted bilateral grid
 
 @dataclass
 class Edit:
@@ -19,23 +19,14 @@ def _init_torch():
         return None
 
 
-def load_hdrnet_model(weights_path: Optional[str] = None) -> None:
+def build_hdrnet_model():
     """
-    Initialise a small 'HDRNet-lite' model.
-
-    - If torch is available: build a tiny CNN tone network and optionally
-      load weights from HDRNET_WEIGHTS.
-    - If torch is NOT available: we keep _hdr_model = None and use identity,
-      so the rest of the pipeline still works.
+    A fresh, randomly initialised HDRNet-lite module (None without torch).
+    Used by load_hdrnet_model and by the trainer (src/training.py).
     """
-    global _hdr_model, _hdr_device
-
     torch = _init_torch()
     if torch is None:
-        print("[HDRNET] torch not available, using identity tone (no-op).")
-        _hdr_model = None
-        _hdr_device = "cpu"
-        return
+        return None
 
     class HDRNetLite(torch.nn.Module):
         """
@@ -56,8 +47,29 @@ def load_hdrnet_model(weights_path: Optional[str] = None) -> None:
             out = torch.clamp(x + residual, 0.0, 1.0)
             return out
 
+    return HDRNetLite()
+
+
+def load_hdrnet_model(weights_path: Optional[str] = None) -> None:
+    """
+    Initialise a small 'HDRNet-lite' model.
+
+    - If torch is available: build a tiny CNN tone network and optionally
+      load weights from HDRNET_WEIGHTS.
+    - If torch is NOT available: we keep _hdr_model = None and use identity,
+      so the rest of the pipeline still works.
+    """
+    global _hdr_model, _hdr_device
+
+    torch = _init_torch()
+    if torch is None:
+        print("[HDRNET] torch not available, using identity tone (no-op).")
+        _hdr_model = None
+        _hdr_device = "cpu"
+        return
+
     _hdr_device = "cuda" if torch.cuda.is_available() else "cpu"
-    model = HDRNetLite().to(_hdr_device)
+    model = build_hdrnet_model().to(_hdr_device)
 
     if weights_path is not None and os.path.exists(weights_path):
         try:
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import List
+from typing import Callable, List
 from .edits import Edit
 MAX_EDITS = 10 
 
@@ -7,11 +7,17 @@ MAX_EDITS = 10
 class EditHistory:
     base_image_path: str
     edits: List[Edit] = field(default_factory=list)
+    # called with the history after every change (e.g. prefetcher invalidation)
+    on_change: List[Callable[["EditHistory"], None]] = field(
+        default_factory=list, repr=False, compare=False
+    )
 
     def add_edit(self, edit: Edit):
         self.edits.append(edit)
         if len(self.edits) > MAX_EDITS:
             self.edits.pop(0)  # drop oldest
+        for fn in self.on_change:
+            fn(self)
 
     def get_edits_after_index(self, idx: int):
         return self.edits[idx + 1 :]
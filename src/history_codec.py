@@ -0,0 +1,286 @@
+"""
+Compact binary encoding of EditHistory, plus append/truncate deltas.
+
+Full history:
+  b"EH" version:u8 flags:u8
+  base_image_path:str  [sha256(base image):32 bytes if flags & HAS_HASH]
+  n_edits:varint  edit*
+
+Edit:
+  type:ref  ai_improvable:u8  n_params:varint  (key:ref value)*
+
+ref:   varint; even -> index into the built-in table (known edit types and
+       param keys), odd -> inline utf-8 string follows (length-prefixed)
+value: tag:u8 + payload; floats go as float32 when that is exact,
+       float64 otherwise, so decode(encode(h)).to_dict() == h.to_dict()
+
+Delta (old -> new, where new == old[drop:keep] + appended):
+  b"ED" version:u8  fingerprint(old):8 bytes  drop:varint keep:varint
+  n_appended:varint edit*
+
+add_edit is an append (plus a drop once MAX_EDITS is hit); accepting an AI
+branch is a truncate + append. The receiver checks the fingerprint and
+refuses a delta built against a different history.
+"""
+
+import hashlib
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+from .edits import (
+    Edit, BRIGHTNESS, CONTRAST, SATURATION, TEMPERATURE, FILTER, GRAIN, VIGNETTE,
+)
+from .history import EditHistory
+from .render_cache import hash_image_file
+
+_MAGIC = b"EH"
+_DELTA_MAGIC = b"ED"
+_VERSION = 1
+_HAS_HASH = 0x01
+
+# Interned strings. Append only: indices are part of the wire format.
+_INTERNED = [
+    BRIGHTNESS, CONTRAST, SATURATION, TEMPERATURE, FILTER, GRAIN, VIGNETTE,
+    "value", "id", "strength", "amount", "radius", "softness", "size", "seed",
+]
+_INTERN_INDEX = {s: i for i, s in enumerate(_INTERNED)}
+
+_T_F32, _T_F64, _T_INT, _T_STR, _T_TRUE, _T_FALSE, _T_NONE = range(7)
+
+_F32 = struct.Struct("<f")
+_F64 = struct.Struct("<d")
+
+
+# --- primitives ---------------------------------------------------------
+
+def _put_varint(out: bytearray, n: int) -> None:
+    if n < 0x80:
+        out.append(n)
+        return
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    b = buf[pos]
+    if b < 0x80:
+        return b, pos + 1
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _put_str(out: bytearray, s: str) -> None:
+    raw = s.encode("utf-8")
+    _put_varint(out, len(raw))
+    out += raw
+
+
+def _get_str(buf: bytes, pos: int) -> Tuple[str, int]:
+    n, pos = _get_varint(buf, pos)
+    return buf[pos:pos + n].decode("utf-8"), pos + n
+
+
+def _put_ref(out: bytearray, s: str) -> None:
+    idx = _INTERN_INDEX.get(s)
+    if idx is not None:
+        _put_varint(out, idx << 1)
+    else:
+        out.append(1)
+        _put_str(out, s)
+
+
+def _get_ref(buf: bytes, pos: int) -> Tuple[str, int]:
+    r, pos = _get_varint(buf, pos)
+    if r & 1:
+        return _get_str(buf, pos)
+    return _INTERNED[r >> 1], pos
+
+
+def _put_value(out: bytearray, v: Any) -> None:
+    if v is True:
+        out.append(_T_TRUE)
+    elif v is False:
+        out.append(_T_FALSE)
+    elif v is None:
+        out.append(_T_NONE)
+    elif isinstance(v, int):
+        out.append(_T_INT)
+        _put_varint(out, (v << 1) if v >= 0 else ((-v << 1) - 1))  # zigzag
+    elif isinstance(v, float):
+        try:
+            packed = _F32.pack(v)
+        except OverflowError:
+            packed = None
+        if packed is not None and _F32.unpack(packed)[0] == v:
+            out.append(_T_F32)
+            out += packed
+        else:
+            out.append(_T_F64)
+            out += _F64.pack(v)
+    elif isinstance(v, str):
+        out.append(_T_STR)
+        _put_ref(out, v)
+    else:
+        raise TypeError(f"unsupported edit param type: {type(v).__name__}")
+
+
+def _get_value(buf: bytes, pos: int) -> Tuple[Any, int]:
+    tag = buf[pos]
+    pos += 1
+    if tag == _T_F32:
+        return _F32.unpack_from(buf, pos)[0], pos + 4
+    if tag == _T_F64:
+        return _F64.unpack_from(buf, pos)[0], pos + 8
+    if tag == _T_INT:
+        z, pos = _get_varint(buf, pos)
+        return (z >> 1) if not (z & 1) else -((z + 1) >> 1), pos
+    if tag == _T_STR:
+        return _get_ref(buf, pos)
+    if tag == _T_TRUE:
+        return True, pos
+    if tag == _T_FALSE:
+        return False, pos
+    if tag == _T_NONE:
+        return None, pos
+    raise ValueError(f"bad value tag {tag}")
+
+
+def _put_edits(out: bytearray, edits: List[Edit]) -> None:
+    _put_varint(out, len(edits))
+    for e in edits:
+        _put_ref(out, e.type)
+        out.append(1 if e.ai_improvable else 0)
+        _put_varint(out, len(e.params))
+        for k, v in e.params.items():
+            _put_ref(out, k)
+            _put_value(out, v)
+
+
+def _get_edits(buf: bytes, pos: int) -> Tuple[List[Edit], int]:
+    n, pos = _get_varint(buf, pos)
+    edits = []
+    for _ in range(n):
+        etype, pos = _get_ref(buf, pos)
+        ai_improvable = bool(buf[pos])
+        pos += 1
+        n_params, pos = _get_varint(buf, pos)
+        params: Dict[str, Any] = {}
+        for _ in range(n_params):
+            k, pos = _get_ref(buf, pos)
+            params[k], pos = _get_value(buf, pos)
+        edits.append(Edit(etype, params, ai_improvable))
+    return edits, pos
+
+
+# --- full histories -----------------------------------------------------
+
+def encode_history(history: EditHistory, base_hash: Optional[bytes] = None,
+                   include_hash: bool = True) -> bytes:
+    """
+    Binary form of history. The sha256 of the base image is embedded when
+    given, or computed from base_image_path if that file exists locally.
+    """
+    if base_hash is None and include_hash and os.path.exists(history.base_image_path):
+        base_hash = bytes.fromhex(hash_image_file(history.base_image_path))
+
+    out = bytearray(_MAGIC)
+    out.append(_VERSION)
+    out.append(_HAS_HASH if base_hash else 0)
+    _put_str(out, history.base_image_path)
+    if base_hash:
+        if len(base_hash) != 32:
+            raise ValueError("base_hash must be a 32-byte sha256 digest")
+        out += base_hash
+    _put_edits(out, history.edits)
+    return bytes(out)
+
+
+def decode_history_with_hash(data: bytes) -> Tuple[EditHistory, Optional[bytes]]:
+    if data[:2] != _MAGIC:
+        raise ValueError("not an encoded EditHistory")
+    if data[2] != _VERSION:
+        raise ValueError(f"unsupported EditHistory encoding version {data[2]}")
+    flags = data[3]
+    path, pos = _get_str(data, 4)
+    base_hash = None
+    if flags & _HAS_HASH:
+        base_hash = bytes(data[pos:pos + 32])
+        pos += 32
+    edits, pos = _get_edits(data, pos)
+    return EditHistory(base_image_path=path, edits=edits), base_hash
+
+
+def decode_history(data: bytes) -> EditHistory:
+    return decode_history_with_hash(data)[0]
+
+
+def history_fingerprint(history: EditHistory) -> bytes:
+    """
+    8-byte digest of the history's content (path + edits, not the image hash).
+    """
+    return hashlib.blake2b(encode_history(history, include_hash=False), digest_size=8).digest()
+
+
+# --- deltas -------------------------------------------------------------
+
+def _best_overlap(old: List[Edit], new: List[Edit]) -> Tuple[int, int]:
+    """
+    (drop, keep) maximising the reused run old[drop:keep] == new[:keep - drop].
+    """
+    best = (len(old), len(old))
+    best_len = 0
+    for drop in range(len(old) + 1):
+        k = 0
+        while drop + k < len(old) and k < len(new) and old[drop + k] == new[k]:
+            k += 1
+        if k > best_len:
+            best, best_len = (drop, drop + k), k
+    return best
+
+
+def encode_delta(old: EditHistory, new: EditHistory) -> bytes:
+    """
+    Delta turning old into new. Falls back to a full (0-overlap) delta if the
+    histories share nothing; base_image_path must be the same.
+    """
+    if old.base_image_path != new.base_image_path:
+        raise ValueError("delta between histories of different base images")
+    drop, keep = _best_overlap(old.edits, new.edits)
+
+    out = bytearray(_DELTA_MAGIC)
+    out.append(_VERSION)
+    out += history_fingerprint(old)
+    _put_varint(out, drop)
+    _put_varint(out, keep)
+    _put_edits(out, new.edits[keep - drop:])
+    return bytes(out)
+
+
+def apply_delta(old: EditHistory, delta: bytes) -> EditHistory:
+    """
+    Apply encode_delta(old, new) to old, returning new.
+    Raises ValueError if the delta was made against a different history.
+    """
+    if delta[:2] != _DELTA_MAGIC:
+        raise ValueError("not an EditHistory delta")
+    if delta[2] != _VERSION:
+        raise ValueError(f"unsupported delta version {delta[2]}")
+    if delta[3:11] != history_fingerprint(old):
+        raise ValueError("delta does not apply to this history (fingerprint mismatch)")
+
+    drop, pos = _get_varint(delta, 11)
+    keep, pos = _get_varint(delta, pos)
+    appended, _ = _get_edits(delta, pos)
+    return EditHistory(
+        base_image_path=old.base_image_path,
+        edits=list(old.edits[drop:keep]) + appended,
+    )
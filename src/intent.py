@@ -1,3 +1,7 @@
+import os
+import threading
+from collections import OrderedDict
+
 import numpy as np
 from dataclasses import dataclass
 from typing import List, Tuple
@@ -6,6 +10,8 @@ from PIL import Image
 from .edits import Edit, BRIGHTNESS, CONTRAST
 from .history import EditHistory
 from .branching import render_slide_image
+from .apply_edits import apply_edits_sequence
+from .render_cache import get_render_cache
 
 
 # --- Tone state ---------------------------------------------------------
@@ -70,6 +76,90 @@ def make_lowres(img: np.ndarray, target_long_side: int = TARGET_LONG_SIDE) -> np
     return low_arr
 
 
+# --- Reduced-resolution decode -------------------------------------------
+
+LOWRES_CACHE_SIZE = 32
+
+# (path, target_long_side) -> (mtime_ns, float32 proxy)
+_lowres_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_lowres_lock = threading.Lock()
+
+
+def _decode_lowres(path: str, target_long_side: int) -> np.ndarray:
+    """
+    Decode straight to proxy size. For JPEGs, draft() makes the decoder
+    use DCT scaling (1/2, 1/4, 1/8) so we never materialise the full-res
+    pixels; the final resize then lands on the same geometry as make_lowres.
+    """
+    with Image.open(path) as pil_img:
+        w, h = pil_img.size
+        long_side = max(h, w)
+        if long_side <= target_long_side:
+            new_w, new_h = w, h
+        else:
+            scale = target_long_side / long_side
+            new_w = int(round(w * scale))
+            new_h = int(round(h * scale))
+
+        # draft only ever picks a scale whose output is >= the requested size
+        pil_img.draft("RGB", (new_w, new_h))
+        pil_low = pil_img.convert("RGB")
+
+    if pil_low.size != (new_w, new_h):
+        pil_low = pil_low.resize((new_w, new_h), Image.BILINEAR)
+    return np.asarray(pil_low).astype(np.float32) / 255.0
+
+
+def load_lowres(path: str, target_long_side: int = TARGET_LONG_SIDE) -> np.ndarray:
+    """
+    Low-res proxy of the base image, decoded at reduced scale.
+    Cached per (path, target_long_side) and invalidated when the file changes.
+    returns: float32 [0,1], shape (h_low, w_low, 3), read-only
+    """
+    key = (path, target_long_side)
+    mtime = os.stat(path).st_mtime_ns
+
+    with _lowres_lock:
+        hit = _lowres_cache.get(key)
+        if hit is not None and hit[0] == mtime:
+            _lowres_cache.move_to_end(key)
+            return hit[1]
+
+    # decode outside the lock; a concurrent miss on the same key just
+    # decodes twice
+    low = _decode_lowres(path, target_long_side)
+    low.setflags(write=False)
+    with _lowres_lock:
+        _lowres_cache[key] = (mtime, low)
+        _lowres_cache.move_to_end(key)
+        while len(_lowres_cache) > LOWRES_CACHE_SIZE:
+            _lowres_cache.popitem(last=False)
+    return low
+
+
+def render_slide_lowres(history: EditHistory, slide_index: int) -> np.ndarray:
+    """
+    Same as render_slide_image, but on the reduced-scale proxy.
+    All tone edits are per-pixel, so rendering on the proxy matches
+    downsampling the full-res render.
+    """
+    edits_up_to = history.get_edits_up_to_index(slide_index)
+
+    cache = get_render_cache()
+    if cache is not None:
+        key = cache.key(history.base_image_path, edits_up_to,
+                        kind=f"lowres{TARGET_LONG_SIDE}")
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+
+    out = apply_edits_sequence(load_lowres(history.base_image_path), edits_up_to)
+
+    if cache is not None:
+        cache.put(key, out)
+    return out
+
+
 # --- Intent vector ------------------------------------------------------
 
 def compute_intent_vector(state_S: ToneState, state_F: ToneState) -> np.ndarray:
@@ -86,7 +176,8 @@ def compute_intent_vector(state_S: ToneState, state_F: ToneState) -> np.ndarray:
 def prepare_ai_inputs(
     history: EditHistory,
     slide_index: int,
-) -> Tuple[np.ndarray, np.ndarray, np.ndarray, list[Edit], ToneState, ToneState]:
+    fullres: bool = True,
+) -> Tuple[Optional[np.ndarray], np.ndarray, np.ndarray, list[Edit], ToneState, ToneState]:
     """
     High-level helper:
       - renders branch image at slide_index (full-res)
@@ -94,6 +185,9 @@ def prepare_ai_inputs(
       - downsamples to low-res
       - builds intent vector
 
+    With fullres=False only the low-res proxy is needed: the base image is
+    decoded at reduced scale (load_lowres) and branch_image_full is None.
+
     Returns:
       branch_image_full
       branch_image_low
@@ -103,20 +197,32 @@ def prepare_ai_inputs(
       state_F
     """
     # 1) full-res branch image
-    branch_image_full = render_slide_image(history, slide_index)
+    branch_image_full = render_slide_image(history, slide_index) if fullres else None
+
+    # 2) edits split, tone states, intent vector
+    intent_vector, future_edits, state_S, state_F = branch_intent(history, slide_index)
+
+    # 3) low-res proxy
+    if fullres:
+        branch_image_low = make_lowres(branch_image_full)
+    else:
+        branch_image_low = render_slide_lowres(history, slide_index)
+
+    return branch_image_full, branch_image_low, intent_vector, future_edits, state_S, state_F
+
 
-    # 2) split edits
+def branch_intent(
+    history: EditHistory,
+    slide_index: int,
+) -> Tuple[np.ndarray, list[Edit], ToneState, ToneState]:
+    """
+    The image-free part of prepare_ai_inputs:
+    (intent_vector, future_edits, state_S, state_F).
+    """
     branch_edits = history.get_edits_up_to_index(slide_index)
     future_edits = history.get_edits_from_index_exclusive(slide_index)
 
-    # 3) tone states
     state_S = compute_tone_state(branch_edits)
     state_F = compute_tone_state(history.edits)
 
-    # 4) low-res proxy
-    branch_image_low = make_lowres(branch_image_full)
-
-    # 5) intent vector
-    intent_vector = compute_intent_vector(state_S, state_F)
-
-    return branch_image_full, branch_image_low, intent_vector, future_edits, state_S, state_F
+    return compute_intent_vector(state_S, state_F), future_edits, state_S, state_F
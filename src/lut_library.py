@@ -0,0 +1,280 @@
+"""
+LUT library: .cube looks packed into one memory-mappable binary store.
+
+Store layout (little-endian):
+  b"LUTLIB01"                 8-byte magic
+  uint64 index_len            length of the JSON index
+  index JSON (utf-8)          {"dtype", "data_offset", "luts": {id: {...}}}
+  zero padding to 64 bytes
+  lattice blob                each LUT as (N, N, N, 3) indexed [r, g, b]
+
+.cube files are parsed once (build_lut_library); at render time LUTs are
+read lazily from the memory map on first use and kept in a small LRU.
+"""
+
+import glob
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import config
+
+_MAGIC = b"LUTLIB01"
+_ALIGN = 64
+LUT_CACHE_SIZE = 16
+
+
+def lut_id_from_name(name: str) -> str:
+    """
+    "Arabica 12.CUBE" / "Arabica_12" / "arabica 12" -> "arabica_12"
+    """
+    stem = os.path.splitext(os.path.basename(name))[0] if name.lower().endswith(".cube") else name
+    return "_".join(stem.strip().lower().split())
+
+
+def parse_cube(path: str) -> np.ndarray:
+    """
+    Parse a 3D .cube LUT.
+    Returns float32 (N, N, N, 3) indexed [r, g, b], as apply_3d_lut expects
+    (.cube data runs with red fastest, so the file order is [b, g, r]).
+    DOMAIN_MIN/MAX are folded into the lattice values.
+    """
+    size = 0
+    domain_min = np.zeros(3, dtype=np.float32)
+    domain_max = np.ones(3, dtype=np.float32)
+    values: List[str] = []
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for raw in f:
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            head = line.split(None, 1)[0].upper()
+            if head == "LUT_3D_SIZE":
+                size = int(line.split()[1])
+            elif head == "DOMAIN_MIN":
+                domain_min = np.array(line.split()[1:4], dtype=np.float32)
+            elif head == "DOMAIN_MAX":
+                domain_max = np.array(line.split()[1:4], dtype=np.float32)
+            elif head == "LUT_1D_SIZE":
+                raise ValueError(f"{path}: 1D LUTs are not supported")
+            elif head in ("TITLE", "LUT_3D_INPUT_RANGE"):
+                continue
+            else:
+                values.append(line)
+
+    if not size:
+        raise ValueError(f"{path}: LUT_3D_SIZE not found")
+
+    data = np.array(" ".join(values).split(), dtype=np.float32)
+    expected = size * size * size * 3
+    if data.size != expected:
+        raise ValueError(f"{path}: expected {expected // 3} entries for size={size}, got {data.size // 3}")
+
+    lut = data.reshape(size, size, size, 3).transpose(2, 1, 0, 3)
+    lut = (lut - domain_min) / np.maximum(domain_max - domain_min, 1e-12)
+    return np.ascontiguousarray(lut, dtype=np.float32)
+
+
+def build_lut_library(cube_paths, out_path: str, dtype: str = "float16") -> Dict[str, dict]:
+    """
+    Parse .cube files (a directory or a list of paths) into one packed store.
+    Written to a temp file and renamed, so readers never see a partial store.
+    Returns the index.
+    """
+    if isinstance(cube_paths, str):
+        cube_paths = sorted(
+            p for p in glob.glob(os.path.join(cube_paths, "*"))
+            if p.lower().endswith(".cube")
+        )
+
+    np_dtype = np.dtype(dtype)
+    luts: Dict[str, dict] = {}
+    blobs: List[bytes] = []
+    offset = 0
+    for path in cube_paths:
+        lut = parse_cube(path)
+        blob = np.ascontiguousarray(lut, dtype=np_dtype).tobytes()
+        luts[lut_id_from_name(path)] = {
+            "offset": offset,
+            "size": int(lut.shape[0]),
+            "source": os.path.basename(path),
+        }
+        blobs.append(blob)
+        offset += len(blob)
+
+    # data_offset depends on the index length, which contains data_offset
+    index = {"dtype": np_dtype.name, "data_offset": 0, "luts": luts}
+    while True:
+        index_bytes = json.dumps(index, sort_keys=True).encode("utf-8")
+        header_len = len(_MAGIC) + 8 + len(index_bytes)
+        data_offset = -(-header_len // _ALIGN) * _ALIGN
+        if data_offset == index["data_offset"]:
+            break
+        index["data_offset"] = data_offset
+
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<Q", len(index_bytes)))
+            f.write(index_bytes)
+            f.write(b"\0" * (data_offset - header_len))
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp, out_path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return luts
+
+
+class LutLibrary:
+    """
+    Read-only view of a packed LUT store.
+    LUTs are decoded from the memory map on first use; the hottest
+    `cache_size` are kept as float32 lattices.
+    """
+
+    def __init__(self, path: str, cache_size: int = LUT_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self._mm[:len(_MAGIC)]) != _MAGIC:
+            raise ValueError(f"{path}: not a LUT library")
+        (index_len,) = struct.unpack("<Q", bytes(self._mm[8:16]))
+        index = json.loads(bytes(self._mm[16:16 + index_len]).decode("utf-8"))
+
+        self._dtype = np.dtype(index["dtype"])
+        self._data_offset = int(index["data_offset"])
+        self._index: Dict[str, dict] = index["luts"]
+
+    def ids(self) -> List[str]:
+        return sorted(self._index)
+
+    def __contains__(self, lut_id: str) -> bool:
+        return lut_id_from_name(lut_id) in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, lut_id: str) -> Optional[np.ndarray]:
+        """
+        float32 (N, N, N, 3) lattice, or None if the id is unknown.
+        """
+        key = lut_id_from_name(lut_id)
+        with self._lock:
+            lut = self._cache.get(key)
+            if lut is not None:
+                self._cache.move_to_end(key)
+                return lut
+
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+
+        n = entry["size"]
+        count = n * n * n * 3
+        start = self._data_offset + entry["offset"]
+        raw = np.frombuffer(self._mm, dtype=self._dtype, count=count, offset=start)
+        lut = raw.reshape(n, n, n, 3).astype(np.float32)
+        lut.setflags(write=False)
+
+        with self._lock:
+            self._cache[key] = lut
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return lut
+
+
+def _store_is_stale(store_path: str, cube_dir: str) -> bool:
+    if not os.path.exists(store_path):
+        return True
+    store_mtime = os.path.getmtime(store_path)
+    for p in glob.glob(os.path.join(cube_dir, "*")):
+        if p.lower().endswith(".cube") and os.path.getmtime(p) > store_mtime:
+            return True
+    return False
+
+
+def prepare_lut_library(cube_dir: Optional[str] = None, store: Optional[str] = None,
+                        dtype: str = "float16") -> bool:
+    """
+    (Re)build the store (default LUT_LIBRARY_PATH) from cube_dir (default
+    LUT_CUBE_DIR) if it is missing or older than the .cube files. Meant for
+    startup or the CLI; renders never build. Returns True if it built.
+    """
+    cube_dir = cube_dir or config.LUT_CUBE_DIR
+    store = store or config.LUT_LIBRARY_PATH
+    if not os.path.isdir(cube_dir) or not _store_is_stale(store, cube_dir):
+        return False
+
+    print(f"[LUT] building {store} from {cube_dir}")
+    t0 = time.perf_counter()
+    index = build_lut_library(cube_dir, store, dtype)
+    print(f"[LUT] packed {len(index)} LUTs in {time.perf_counter() - t0:.1f}s")
+    return True
+
+
+_lut_library: Optional[LutLibrary] = None
+_warned_store: Optional[str] = None
+
+
+def _warn_unprepared(store: str) -> None:
+    global _warned_store
+    if _warned_store != store:
+        _warned_store = store
+        print(f"[LUT] {store} is missing or older than {config.LUT_CUBE_DIR}; "
+              f"run `python -m src.lut_library` to rebuild it")
+
+
+def get_lut_library() -> Optional[LutLibrary]:
+    """
+    Process-wide library opened from LUT_LIBRARY_PATH, or None if there is
+    no store yet. Never builds one (see prepare_lut_library); a missing or
+    stale store is reported once.
+    """
+    global _lut_library
+
+    if _lut_library is not None and _lut_library.path == config.LUT_LIBRARY_PATH:
+        return _lut_library
+
+    store, cube_dir = config.LUT_LIBRARY_PATH, config.LUT_CUBE_DIR
+    if not os.path.exists(store):
+        if os.path.isdir(cube_dir):
+            _warn_unprepared(store)
+        return None
+    if os.path.isdir(cube_dir) and _store_is_stale(store, cube_dir):
+        _warn_unprepared(store)
+
+    _lut_library = LutLibrary(store)
+    return _lut_library
+
+
+if __name__ == "__main__":
+    # python -m src.lut_library [<cube_dir> <out.lutlib> [float16|float32]]
+    # without arguments: LUT_CUBE_DIR -> LUT_LIBRARY_PATH, if out of date
+    if len(sys.argv) > 1:
+        idx = build_lut_library(sys.argv[1], sys.argv[2], *(sys.argv[3:4] or ["float16"]))
+        print(f"Packed {len(idx)} LUTs into {sys.argv[2]}")
+    elif not os.path.isdir(config.LUT_CUBE_DIR):
+        sys.exit(f"[LUT] no cube directory at {config.LUT_CUBE_DIR} (set LUT_CUBE_DIR)")
+    elif not prepare_lut_library():
+        print(f"[LUT] {config.LUT_LIBRARY_PATH} is up to date")
@@ -92,15 +92,27 @@ def apply_3d_lut(img: np.ndarray, lut: np.ndarray) -> np.ndarray:
     return np.clip(out, 0.0, 1.0)
 
 
-def apply_cinematic_lut(img: np.ndarray, strength: float) -> np.ndarray:
+def blend_lut(img: np.ndarray, lut_img: np.ndarray, strength: float) -> np.ndarray:
     """
-    Blend between original and cinematic-warm LUT output.
-    strength in [0,1].
+    Blend between original and a precomputed full-strength LUT output.
+    Only this step depends on strength, so callers trying several strengths
+    can run apply_3d_lut once and blend many times.
     """
     strength = float(strength)
     if strength <= 0.0:
         return img
 
-    lut_img = apply_3d_lut(img, CINEMATIC_WARM_LUT)
     out = img * (1.0 - strength) + lut_img * strength
     return np.clip(out, 0.0, 1.0)
+
+
+def apply_cinematic_lut(img: np.ndarray, strength: float) -> np.ndarray:
+    """
+    Blend between original and cinematic-warm LUT output.
+    strength in [0,1].
+    """
+    if float(strength) <= 0.0:
+        return img
+
+    lut_img = apply_3d_lut(img, CINEMATIC_WARM_LUT)
+    return blend_lut(img, lut_img, strength)
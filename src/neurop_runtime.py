@@ -0,0 +1,153 @@
+"""
+Headless runtime for the frontend's neurop_lite.onnx (what the browser runs
+through onnxruntime-web), so batch and server jobs can reproduce it.
+
+The exported graph takes (1, 3, 256, 256) float RGB in [0, 1] and returns:
+  - the graded image, same shape, clipped to [0, 1];
+  - three operator strengths in [-1, 1] (brightness/contrast, exposure,
+    vibrance), predicted from the image.
+
+Inputs of any size are fed the way the browser does it: quantised to 8 bit
+and resized to the model's input size; the output is resized back. The
+session is created once per process on the CPU provider. The model's batch
+dimension is fixed at 1, so batches are run in chunks of the declared batch
+size on the same session (one call per chunk if it is ever exported with a
+dynamic batch).
+
+onnxruntime is optional: without it apply_neurop is the identity, like
+apply_hdrnet without torch.
+"""
+
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from . import config
+
+_session = None
+_session_lock = threading.Lock()
+_load_attempted = False
+
+
+def _init_ort():
+    """
+    Helper to lazily import onnxruntime.
+    If import fails (not installed), we return None and fall back to identity.
+    """
+    try:
+        import onnxruntime  # type: ignore
+        return onnxruntime
+    except Exception:
+        return None
+
+
+def load_neurop_model(model_path: Optional[str] = None) -> bool:
+    """
+    Create the process-wide inference session (default
+    config.NEUROP_MODEL_PATH). Returns False, leaving the runtime disabled,
+    if onnxruntime or the model file is unavailable.
+    """
+    global _session, _load_attempted
+
+    with _session_lock:
+        _load_attempted = True
+        ort = _init_ort()
+        if ort is None:
+            print("[NEUROP] onnxruntime not available, using identity tone (no-op).")
+            _session = None
+            return False
+
+        path = model_path or config.NEUROP_MODEL_PATH
+        try:
+            opts = ort.SessionOptions()
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            _session = ort.InferenceSession(path, sess_options=opts,
+                                            providers=["CPUExecutionProvider"])
+        except Exception as e:
+            print(f"[NEUROP] Failed to load {path}: {e}. Using identity tone (no-op).")
+            _session = None
+            return False
+
+        print(f"[NEUROP] Loaded {path} on CPU.")
+        return True
+
+
+def _get_session():
+    if not _load_attempted:
+        load_neurop_model()
+    return _session
+
+
+def neurop_available() -> bool:
+    return _get_session() is not None
+
+
+def _input_spec(session) -> Tuple[str, Optional[int], int, int]:
+    """
+    (input name, fixed batch size or None if dynamic, height, width)
+    """
+    inp = session.get_inputs()[0]
+    batch, _, h, w = inp.shape
+    return inp.name, (batch if isinstance(batch, int) else None), int(h), int(w)
+
+
+def _to_model_input(img: np.ndarray, h: int, w: int) -> np.ndarray:
+    """
+    HxWx3 float -> 3xhxw float32, via 8-bit like the browser's canvas.
+    """
+    u8 = (np.clip(img, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+    if u8.shape[:2] != (h, w):
+        u8 = np.asarray(Image.fromarray(u8).resize((w, h), Image.BILINEAR))
+    return (u8.astype(np.float32) / 255.0).transpose(2, 0, 1)
+
+
+def _resize_float(img: np.ndarray, h: int, w: int) -> np.ndarray:
+    if img.shape[:2] == (h, w):
+        return img
+    chans = [np.asarray(Image.fromarray(img[..., c]).resize((w, h), Image.BILINEAR))
+             for c in range(img.shape[2])]
+    return np.stack(chans, axis=-1)
+
+
+def run_neurop_batch(imgs: Sequence[np.ndarray]) -> Tuple[List[np.ndarray], np.ndarray]:
+    """
+    Run the model over proxies or tiles.
+
+    imgs: HxWx3 float arrays in [0, 1] (sizes may differ).
+    Returns (graded images at each input's size, (N, 3) strengths).
+    Without a session: the inputs unchanged and zero strengths.
+    """
+    session = _get_session()
+    if session is None:
+        return [np.clip(im, 0.0, 1.0).astype(np.float32) for im in imgs], np.zeros((len(imgs), 3), np.float32)
+
+    name, fixed_batch, h, w = _input_spec(session)
+    x = np.stack([_to_model_input(im, h, w) for im in imgs])
+    step = fixed_batch or len(imgs)
+
+    outs, strengths = [], []
+    for i in range(0, len(imgs), step):
+        img_out, *ops = session.run(None, {name: x[i:i + step]})
+        outs.append(img_out)
+        strengths.append(np.concatenate(ops, axis=1))
+    out = np.concatenate(outs).transpose(0, 2, 3, 1)
+
+    graded = [np.clip(_resize_float(np.ascontiguousarray(o), *im.shape[:2]), 0.0, 1.0)
+              for o, im in zip(out, imgs)]
+    return graded, np.concatenate(strengths).astype(np.float32)
+
+
+def apply_neurop(img: np.ndarray) -> np.ndarray:
+    """
+    Drop-in for apply_hdrnet: (H, W, 3) float32 in [0,1] -> graded image.
+    """
+    return run_neurop_batch([img])[0][0]
+
+
+def neurop_strengths(img: np.ndarray) -> np.ndarray:
+    """
+    The model's (3,) operator strengths for img; usable as a scoring signal.
+    """
+    return run_neurop_batch([img])[1][0]
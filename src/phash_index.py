@@ -0,0 +1,294 @@
+"""
+Perceptual-hash index of previously optimised proxies.
+
+Burst shots and bracketed frames are nearly identical, so their optimise
+results are too. Each optimised proxy is stored as a 64-bit DCT hash plus
+its intent vector and the resulting ai_params. For a new branch:
+
+  - a near-duplicate image (Hamming distance <= max_distance) with a
+    close intent vector: reuse its ai_params, no server call;
+  - a near-duplicate with a different intent: its params are offered to
+    the search as a warm-start candidate.
+
+Lookups are a vectorised XOR + popcount over a packed uint64 array, which
+stays in the low milliseconds at hundreds of thousands of entries. The
+index persists as a single .npz, written atomically: every
+AUTOSAVE_EVERY adds, on the first add AUTOSAVE_INTERVAL_S after the last
+save, and (for the process-wide index) at interpreter exit, so
+short-lived workers keep what they learned. Processes sharing one file
+merge on save instead of overwriting each other.
+"""
+
+import atexit
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves from several processes are not merged safely
+    fcntl = None
+
+from . import config
+
+HASH_SIZE = 8        # 8x8 low-frequency DCT block -> 64 bits
+HASH_SAMPLE = 32     # image is reduced to 32x32 grey before the DCT
+AUTOSAVE_EVERY = 64  # adds between automatic saves
+AUTOSAVE_INTERVAL_S = 30.0  # ... or this long since the last save
+
+PARAM_KEYS = ("brightness", "contrast", "lut_strength")
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+
+_DCT = _dct_matrix(HASH_SAMPLE)
+_BIT_WEIGHTS = (np.uint64(1) << np.arange(HASH_SIZE * HASH_SIZE, dtype=np.uint64))
+
+
+def dct_hash(img: np.ndarray) -> int:
+    """
+    64-bit perceptual hash of an (H, W, 3) float32 [0,1] image
+    (typically the make_lowres / load_lowres proxy).
+    """
+    grey = 0.299 * img[..., 0] + 0.587 * img[..., 1] + 0.114 * img[..., 2]
+    small = Image.fromarray(np.clip(grey, 0.0, 1.0).astype(np.float32)).resize(
+        (HASH_SAMPLE, HASH_SAMPLE), Image.BILINEAR
+    )
+    coeffs = _DCT @ np.asarray(small, dtype=np.float32) @ _DCT.T
+    low = coeffs[:HASH_SIZE, :HASH_SIZE].ravel()
+    # median over the AC terms; DC only says how bright the frame is
+    bits = low > np.median(low[1:])
+    return int(np.sum(_BIT_WEIGHTS[bits], dtype=np.uint64))
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    # numpy < 2.0
+    b = x.view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(b, axis=1).sum(axis=1)
+
+
+class PHashIndex:
+    def __init__(self, path: Optional[str] = None,
+                 max_distance: int = 6, intent_tol: float = 0.05):
+        self.path = path
+        self.max_distance = max_distance
+        self.intent_tol = intent_tol
+
+        self._lock = threading.Lock()
+        self._n = 0
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._intents = np.zeros((1024, 3), dtype=np.float32)
+        self._params = np.zeros((1024, 3), dtype=np.float32)
+        self._unsaved = 0
+        self._persisted = 0  # entries [0, _persisted) are in the file
+        self._saved_at = time.monotonic()
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _grow(self, need: int) -> None:
+        cap = len(self._hashes)
+        if need <= cap:
+            return
+        new_cap = max(need, cap * 2)
+        self._hashes = np.resize(self._hashes, new_cap)
+        self._intents = np.resize(self._intents, (new_cap, 3))
+        self._params = np.resize(self._params, (new_cap, 3))
+
+    def add(self, phash: int, intent_vector: np.ndarray, ai_params: Dict[str, float]) -> None:
+        with self._lock:
+            self._grow(self._n + 1)
+            self._hashes[self._n] = np.uint64(phash)
+            self._intents[self._n] = np.asarray(intent_vector, dtype=np.float32)[:3]
+            self._params[self._n] = [float(ai_params.get(k, 0.0)) for k in PARAM_KEYS]
+            self._n += 1
+            self._unsaved += 1
+            autosave = self.path and (
+                self._unsaved >= AUTOSAVE_EVERY
+                or time.monotonic() - self._saved_at >= AUTOSAVE_INTERVAL_S
+            )
+        if autosave:
+            self.save()
+
+    def flush(self) -> None:
+        """
+        Save if there are adds since the last save.
+        """
+        with self._lock:
+            pending = self.path and self._unsaved > 0
+        if pending:
+            self.save()
+
+    def nearest(self, phash: int, intent_vector: Optional[np.ndarray] = None,
+                max_distance: Optional[int] = None) -> Optional[Tuple[int, float, Dict[str, float]]]:
+        """
+        Closest stored entry within max_distance bits, as
+        (hamming distance, intent distance, ai_params), or None.
+        Ties on Hamming distance go to the closest intent vector.
+        """
+        max_distance = self.max_distance if max_distance is None else max_distance
+        with self._lock:
+            n = self._n
+            hashes = self._hashes[:n]
+            intents = self._intents[:n]
+            params = self._params[:n]
+
+        if n == 0:
+            return None
+        dist = _popcount(hashes ^ np.uint64(phash)).astype(np.int32)
+        near = np.flatnonzero(dist <= max_distance)
+        if len(near) == 0:
+            return None
+
+        if intent_vector is None:
+            intent_dist = np.zeros(len(near), dtype=np.float32)
+        else:
+            iv = np.asarray(intent_vector, dtype=np.float32)[:3]
+            intent_dist = np.linalg.norm(intents[near] - iv, axis=1)
+
+        best = near[np.lexsort((intent_dist, dist[near]))[0]]
+        best_intent = float(intent_dist[np.flatnonzero(near == best)[0]])
+        return int(dist[best]), best_intent, dict(zip(PARAM_KEYS, map(float, params[best])))
+
+    def lookup(self, phash: int, intent_vector: np.ndarray):
+        """
+        ("reuse", params) for a near-duplicate with a matching intent,
+        ("warm_start", params) for a near-duplicate with another intent,
+        (None, None) otherwise.
+        """
+        hit = self.nearest(phash, intent_vector)
+        if hit is None:
+            return None, None
+        _, intent_dist, params = hit
+        return ("reuse" if intent_dist <= self.intent_tol else "warm_start"), params
+
+    def _arrays(self, start: int, stop: int) -> Dict[str, np.ndarray]:
+        return dict(hashes=self._hashes[start:stop].copy(),
+                    intents=self._intents[start:stop].copy(),
+                    params=self._params[start:stop].copy())
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+        Write the index to path (default self.path). Saving to self.path
+        merges: under a lock file, entries other processes saved since we
+        last synced are read back and kept, ours are appended, and this
+        index then holds the union.
+        """
+        path = path or self.path
+        if path != self.path:
+            with self._lock:
+                data = self._arrays(0, self._n)
+            _write_npz(path, data)
+            return
+
+        with _file_lock(path):
+            with self._lock:
+                n, persisted = self._n, self._persisted
+                ours = self._arrays(persisted, n)
+                base = self._arrays(0, persisted)
+            if os.path.exists(path):
+                base = _read_npz(path)
+            merged = {k: np.concatenate([base[k], ours[k]]) for k in ours}
+            _write_npz(path, merged)
+
+            with self._lock:
+                # keep adds that raced with the write for the next save
+                extra = self._arrays(n, self._n)
+                self._set({k: np.concatenate([merged[k], extra[k]]) for k in merged})
+                self._persisted = len(merged["hashes"])
+                self._unsaved = len(extra["hashes"])
+                self._saved_at = time.monotonic()
+
+    def load(self, path: str) -> None:
+        data = _read_npz(path)
+        with self._lock:
+            self._set(data)
+            self._persisted = self._n
+            self._unsaved = 0
+
+    def _set(self, data: Dict[str, np.ndarray]) -> None:
+        n = len(data["hashes"])
+        self._n = 0
+        self._grow(n)
+        self._hashes[:n] = data["hashes"]
+        self._intents[:n] = data["intents"]
+        self._params[:n] = data["params"]
+        self._n = n
+
+
+@contextmanager
+def _file_lock(path: str):
+    """
+    Exclusive lock on path + ".lock" across processes (no-op without fcntl).
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_npz(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path) as data:
+        return dict(hashes=data["hashes"].astype(np.uint64),
+                    intents=data["intents"].astype(np.float32),
+                    params=data["params"].astype(np.float32))
+
+
+def _write_npz(path: str, data: Dict[str, np.ndarray]) -> None:
+    out_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+_phash_index: Optional[PHashIndex] = None
+
+
+def get_phash_index() -> Optional[PHashIndex]:
+    """
+    Process-wide index at PHASH_INDEX_PATH; None when reuse is disabled.
+    """
+    global _phash_index
+
+    if not config.PHASH_INDEX_PATH:
+        return None
+    if _phash_index is None or _phash_index.path != config.PHASH_INDEX_PATH:
+        _phash_index = PHashIndex(
+            config.PHASH_INDEX_PATH,
+            max_distance=config.PHASH_MAX_DISTANCE,
+            intent_tol=config.PHASH_INTENT_TOL,
+        )
+        atexit.register(_phash_index.flush)
+    return _phash_index
@@ -1,14 +1,19 @@
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
-from .intent import prepare_ai_inputs
-from .ai_client import optimise_tone_colour
+from .intent import branch_intent
 from .apply_edits import apply_brightness, apply_contrast
-from .branching import render_original_future_branch
+from .bilateral_grid import apply_bilateral_grid, grid_edit_params
 from .history import EditHistory
-from .edits import Edit, BRIGHTNESS, CONTRAST
+from .edits import Edit, BRIGHTNESS, CONTRAST, TONE_GRID
+from .render_graph import Node, RenderGraph
 
 def apply_ai_params_fullres(img, ai_params):
+    # Server-fitted bilateral grid reproduces the scored proxy render
+    # (brightness/contrast + HDRNet + LUT) at full res in one pass.
+    if ai_params.get("tone_grid") is not None:
+        return apply_bilateral_grid(img, ai_params["tone_grid"])
+
     out = img.copy()
     out = apply_brightness(out, ai_params["brightness"])
     out = apply_contrast(out, ai_params["contrast"])
@@ -25,21 +30,28 @@ def apply_ai_edit_to_history(history: EditHistory,
     """
     Creates a new history where:
       - all edits AFTER slide_index are removed
-      - AI brightness + contrast edits are appended
+      - the AI suggestion is appended, as apply_ai_params_fullres renders
+        it: one TONE_GRID edit when the server fitted a grid, else
+        brightness + contrast edits
+    so rendering the new history gives the previewed ai_image_full.
     """
 
     # 1) Keep edits up to the branch point
     kept = history.get_edits_up_to_index(slide_index)
 
     # 2) Insert AI-improved edits (deltas)
-    b = ai_params["brightness"]
-    c = ai_params["contrast"]
+    if ai_params.get("tone_grid") is not None:
+        kept.append(Edit(TONE_GRID, grid_edit_params(ai_params["tone_grid"]),
+                         ai_improvable=False))
+    else:
+        b = ai_params["brightness"]
+        c = ai_params["contrast"]
 
-    if abs(b) > 1e-6:
-        kept.append(Edit(BRIGHTNESS, {"value": b}, ai_improvable=False))
+        if abs(b) > 1e-6:
+            kept.append(Edit(BRIGHTNESS, {"value": b}, ai_improvable=False))
 
-    if abs(c) > 1e-6:
-        kept.append(Edit(CONTRAST, {"value": c}, ai_improvable=False))
+        if abs(c) > 1e-6:
+            kept.append(Edit(CONTRAST, {"value": c}, ai_improvable=False))
 
     # 3) New history object
     new_hist = EditHistory(
@@ -51,47 +63,96 @@ def apply_ai_edit_to_history(history: EditHistory,
 
 
 
-def run_predictive_branch(history, slide_index: int):
+def _ai_branch_nodes(graph: RenderGraph, history: EditHistory, slide_index: int,
+                     latency_budget=None, prefetcher=None) -> Tuple[Node, Node, list]:
+    """
+    Graph nodes for the AI branch: (ai_image_full, ai_params, future_edits).
+    """
+    branch = graph.render(history.base_image_path, history.get_edits_up_to_index(slide_index))
+
+    prefetched = prefetcher.get(history, slide_index) if prefetcher is not None else None
+    if prefetched is not None:
+        future_edits = prefetched.future_edits
+        params = graph.constant("prefetched", [branch.key], prefetched.ai_params)
+    else:
+        intent_vec, future_edits, _, _ = branch_intent(history, slide_index)
+        params = graph.optimise(graph.proxy(branch), intent_vec, latency_budget)
+
+    ai_image = graph.node("ai_apply", [branch.key, params.key],
+                          apply_ai_params_fullres, (branch, params))
+    return ai_image, params, future_edits
+
+
+def run_predictive_branch(history, slide_index: int, latency_budget=None,
+                          prefetcher=None, graph: Optional[RenderGraph] = None):
     """
     Main pipeline:
        1. Build full-res + low-res + intent
-       2. Call AI
+       2. Call AI (within latency_budget seconds, see optimise_tone_colour)
        3. Apply AI params to full-res
        4. Return:
           - ai_image_full
           - ai_params
           - future_edits (original user edits after the branch)
-    """
 
-    # 1) Prepare inputs
-    branch_full, lowres, intent_vec, future_edits, state_S, state_F = prepare_ai_inputs(
-        history, slide_index
-    )
+    If a BranchPrefetcher already has (or is computing) steps 1-2 for this
+    exact history and slide, its result is used instead.
 
-    # 2) Call AI (stub or real API)
-    ai_params = optimise_tone_colour(lowres, intent_vec)
-
-    # 3) Apply AI params to FULL-RES
-    ai_image_full = apply_ai_params_fullres(branch_full, ai_params)
+    Runs on a RenderGraph (a fresh one unless given); pass the same graph
+    to later calls in the request (e.g. resolve_ai_suggestion) to reuse
+    its renders.
+    """
+    graph = graph if graph is not None else RenderGraph()
+    ai_image, params, future_edits = _ai_branch_nodes(
+        graph, history, slide_index, latency_budget, prefetcher
+    )
+    ai_image_full, ai_params = graph.evaluate(ai_image, params)
+    graph.dump_plan_if_enabled("predictive_branch")
 
     return ai_image_full, ai_params, future_edits
 
-def run_predictive_branch_with_baseline(history, slide_index: int):
+def run_predictive_branch_with_baseline(history, slide_index: int, latency_budget=None,
+                                        graph: Optional[RenderGraph] = None):
     """
     Returns BOTH:
       - ai_image_full   (AI-optimised future from the branch)
       - user_future_img (original future if user continued without AI)
       - ai_params
       - future_edits    (the original future edits list)
+
+    The branch render is shared by both futures, and the user's future is
+    rendered while the optimise call is in flight.
     """
+    graph = graph if graph is not None else RenderGraph()
+    ai_image, params, future_edits = _ai_branch_nodes(graph, history, slide_index, latency_budget)
+
     # user-only future from this slide
-    user_future_img, future_edits = render_original_future_branch(history, slide_index)
+    user_future = graph.render(history.base_image_path, history.edits)
 
-    # AI future (uses your candidate search + heuristic)
-    ai_image_full, ai_params, _ = run_predictive_branch(history, slide_index)
+    ai_image_full, user_future_img, ai_params = graph.evaluate(ai_image, user_future, params)
+    graph.dump_plan_if_enabled("predictive_branch_with_baseline")
 
     return ai_image_full, user_future_img, ai_params, future_edits
 
+def resolve_ai_suggestion(history: EditHistory, slide_index: int, ai_params: dict,
+                          accept: bool, graph: Optional[RenderGraph] = None
+                          ) -> Tuple[EditHistory, np.ndarray]:
+    """
+    Accept (apply_ai_edit_to_history) or reject (reject_ai_suggestion) the
+    AI suggestion and render the resulting history. With the graph used for
+    run_predictive_branch(_with_baseline), the branch render (accept) or the
+    user's future (reject) is not rendered again.
+    """
+    graph = graph if graph is not None else RenderGraph()
+    if accept:
+        new_hist = apply_ai_edit_to_history(history, slide_index, ai_params)
+    else:
+        new_hist = reject_ai_suggestion(history)
+
+    (img,) = graph.evaluate(graph.render(new_hist.base_image_path, new_hist.edits))
+    graph.dump_plan_if_enabled("accept_ai" if accept else "reject_ai")
+    return new_hist, img
+
 def reject_ai_suggestion(history: EditHistory) -> EditHistory:
     """
     Rejecting the AI suggestion: simply return history unchanged.
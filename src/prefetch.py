@@ -0,0 +1,155 @@
+"""
+Speculative prefetch of predictive branches.
+
+While the user sits on slide k, the next request is almost always a
+predictive branch at k or a neighbour. BranchPrefetcher computes the
+low-res proxy, intent vector and optimise result for those slides on a
+small thread pool, so run_predictive_branch can pick them up instantly.
+Their optimise calls keep a server session on the branch proxy, so a
+changed intent on the same branch skips the upload. The session is
+released once no current slide branches from that proxy.
+
+Only proxies are kept (full-res renders would cost hundreds of MB per
+slide); the foreground full-res render is served by the render cache
+when RENDER_CACHE_DIR is set.
+"""
+
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .edits import Edit
+from .history import EditHistory
+from .intent import ToneState, prepare_ai_inputs
+from .ai_client import optimise_tone_colour, release_session
+from .render_cache import serialize_edits
+
+Key = Tuple[str, str, int]
+
+
+@dataclass
+class PrefetchResult:
+    lowres: np.ndarray
+    intent_vector: np.ndarray
+    future_edits: List[Edit]
+    state_S: ToneState
+    state_F: ToneState
+    ai_params: dict
+
+
+def _history_key(history: EditHistory, slide_index: int) -> Key:
+    return (history.base_image_path, serialize_edits(history.edits), slide_index)
+
+
+def _branch_key(history: EditHistory, slide_index: int) -> Tuple[str, str]:
+    # what the branch proxy is rendered from
+    return (history.base_image_path,
+            serialize_edits(history.get_edits_up_to_index(slide_index)))
+
+
+class BranchPrefetcher:
+    def __init__(self, max_workers: int = 2, radius: int = 1,
+                 latency_budget: Optional[float] = None):
+        self.radius = radius
+        self.latency_budget = latency_budget
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix="branch-prefetch")
+        self._lock = threading.Lock()
+        # key -> (future, cancel flag for a job that is already running, branch)
+        self._jobs: Dict[Key, Tuple[Future, threading.Event, Tuple[str, str]]] = {}
+
+    def attach(self, history: EditHistory) -> None:
+        """
+        Drop stale jobs automatically whenever the history changes.
+        """
+        history.on_change.append(self.cancel_stale)
+
+    def schedule(self, history: EditHistory, slide_index: int) -> None:
+        """
+        User is on slide_index: prefetch it and its neighbours.
+        """
+        self.cancel_stale(history)
+
+        # frozen copy, so the workers never see a half-applied add_edit
+        snapshot = EditHistory(history.base_image_path, list(history.edits))
+        last = len(snapshot.edits) - 1
+        lo = max(-1, slide_index - self.radius)
+        hi = min(last, slide_index + self.radius)
+
+        # current slide first, then outwards
+        order = sorted(range(lo, hi + 1), key=lambda k: abs(k - slide_index))
+        with self._lock:
+            for k in order:
+                key = _history_key(snapshot, k)
+                if key in self._jobs:
+                    continue
+                cancelled = threading.Event()
+                fut = self._pool.submit(self._run, snapshot, k, cancelled)
+                self._jobs[key] = (fut, cancelled, _branch_key(snapshot, k))
+
+    def _run(self, history: EditHistory, slide_index: int,
+             cancelled: threading.Event) -> PrefetchResult:
+        if cancelled.is_set():
+            raise CancelledError()
+        _, lowres, intent_vec, future_edits, state_S, state_F = prepare_ai_inputs(
+            history, slide_index, fullres=False
+        )
+
+        if cancelled.is_set():
+            raise CancelledError()
+        ai_params = optimise_tone_colour(lowres, intent_vec, self.latency_budget,
+                                         keep_session=True)
+
+        return PrefetchResult(lowres, intent_vec, future_edits, state_S, state_F, ai_params)
+
+    def get(self, history: EditHistory, slide_index: int,
+            wait: bool = True) -> Optional[PrefetchResult]:
+        """
+        Prefetched result for this exact history + slide, or None.
+        wait=True blocks on a job that is already in flight (it is the same
+        work the caller would do); wait=False only returns finished results.
+        """
+        with self._lock:
+            job = self._jobs.get(_history_key(history, slide_index))
+        if job is None:
+            return None
+
+        fut, _, _ = job
+        if not wait and not fut.done():
+            return None
+        try:
+            return fut.result()
+        except Exception:
+            # cancelled or failed: the foreground path recomputes
+            return None
+
+    def cancel_stale(self, history: EditHistory) -> None:
+        """
+        Cancel every job that does not belong to the current history, and
+        release the server sessions of branches the history no longer has.
+        """
+        current = (history.base_image_path, serialize_edits(history.edits))
+        branches = {_branch_key(history, k) for k in range(-1, len(history.edits))}
+        with self._lock:
+            stale = [self._jobs.pop(k) for k in list(self._jobs) if k[:2] != current]
+            kept = {job[2] for job in self._jobs.values()}
+        self._drop(stale, branches | kept)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+        self._drop(jobs, set())
+        self._pool.shutdown(wait=False)
+
+    def _drop(self, jobs, live_branches) -> None:
+        for fut, cancelled, branch in jobs:
+            cancelled.set()
+            fut.cancel()
+            if branch in live_branches or not fut.done() or fut.cancelled():
+                continue
+            if fut.exception() is None:
+                release_session(fut.result().lowres)
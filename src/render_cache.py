@@ -0,0 +1,196 @@
+"""
+Content-addressed disk cache for rendered slides and low-res proxies.
+
+key = sha256(base image bytes) + serialized edit chain (Edit.to_dict) + kind
+
+Entries are plain .npy files, written via temp file + os.replace so several
+worker processes can share one directory. uint16 (the default) or uint8
+entries are read and rescaled; float32 entries take 2x the disk of uint16
+but come back as a read-only memory map, so pages load on first touch and
+nothing is copied. LRU is tracked with file mtimes; hits touch the file and puts evict
+the least recently used entries once the directory exceeds max_bytes.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .edits import Edit
+from . import config
+
+# rescan the directory at least this often, since other workers write too
+_RESCAN_EVERY = 64
+
+_STORE_DTYPES = {
+    "uint8": (np.uint8, 255.0),
+    "uint16": (np.uint16, 65535.0),
+    "float32": (np.float32, 1.0),
+}
+_SCALE_OF = {np.dtype(dt): scale for dt, scale in _STORE_DTYPES.values()}
+
+HASH_MEMO_SIZE = 1024
+
+# (path, mtime_ns, size) -> sha256 hex, so we don't rehash the base per render
+_image_hash_memo: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_image_hash_lock = threading.Lock()
+
+
+def hash_image_file(path: str) -> str:
+    """
+    sha256 of the file bytes, memoised on (path, mtime, size).
+    """
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _image_hash_lock:
+        digest = _image_hash_memo.get(memo_key)
+        if digest is not None:
+            _image_hash_memo.move_to_end(memo_key)
+            return digest
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _image_hash_lock:
+        _image_hash_memo[memo_key] = digest
+        while len(_image_hash_memo) > HASH_MEMO_SIZE:
+            _image_hash_memo.popitem(last=False)
+    return digest
+
+
+def serialize_edits(edits: List[Edit]) -> str:
+    """
+    Canonical JSON of the edit chain (stable key order).
+    """
+    return json.dumps([e.to_dict() for e in edits], sort_keys=True,
+                      separators=(",", ":"), default=float)
+
+
+class RenderCache:
+    def __init__(self, root: str, max_bytes: int, store_dtype: str = "uint16"):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.store_dtype, self.scale = _STORE_DTYPES[store_dtype]
+        os.makedirs(root, exist_ok=True)
+        self._approx_bytes = self.size_bytes()
+        self._puts_since_scan = 0
+
+    def key(self, image_path: str, edits: List[Edit], kind: str = "full") -> str:
+        h = hashlib.sha256()
+        h.update(hash_image_file(image_path).encode())
+        h.update(b"\0" + kind.encode() + b"\0")
+        h.update(serialize_edits(edits).encode())
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        # two-level fan-out keeps directories small
+        return os.path.join(self.root, key[:2], key + ".npy")
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Returns float32 [0,1] image, or None on miss. float32 entries are a
+        read-only memory map; copy before writing to it.
+        """
+        path = self._path(key)
+        try:
+            mmap = "r" if self.store_dtype == np.float32 else None
+            img = np.load(path, mmap_mode=mmap)
+            if img.dtype != np.float32:
+                # written by a worker with another store_dtype
+                img = img.astype(np.float32) / _SCALE_OF[img.dtype]
+            os.utime(path)  # LRU touch
+        except (FileNotFoundError, ValueError, OSError, KeyError):
+            # missing, evicted by another worker, or a torn/corrupt file
+            return None
+        return img
+
+    def put(self, key: str, img: np.ndarray) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        stored = np.clip(img, 0.0, 1.0)
+        if self.store_dtype != np.float32:
+            stored = np.round(stored * self.scale)
+        stored = stored.astype(self.store_dtype)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, stored)
+            os.replace(tmp, path)  # atomic: readers see old or new, never partial
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+        self._approx_bytes += stored.nbytes
+        self._puts_since_scan += 1
+        if self._approx_bytes > self.max_bytes or self._puts_since_scan >= _RESCAN_EVERY:
+            self._evict()
+
+    def _entries(self):
+        out = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(".npy"):
+                    continue
+                p = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(p)
+                except FileNotFoundError:
+                    continue
+                out.append((st.st_mtime_ns, st.st_size, p))
+        return out
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+
+        if total > self.max_bytes:
+            entries.sort()  # oldest mtime first
+            for _, size, p in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(p)
+                except FileNotFoundError:
+                    pass  # another worker got there first
+                total -= size
+
+        self._approx_bytes = total
+        self._puts_since_scan = 0
+
+
+_render_cache: Optional[RenderCache] = None
+
+
+def get_render_cache() -> Optional[RenderCache]:
+    """
+    Process-wide cache configured from RENDER_CACHE_DIR / RENDER_CACHE_MAX_MB.
+    Returns None when caching is disabled.
+    """
+    global _render_cache
+
+    if not config.RENDER_CACHE_DIR:
+        return None
+    if _render_cache is None or _render_cache.root != config.RENDER_CACHE_DIR:
+        _render_cache = RenderCache(
+            config.RENDER_CACHE_DIR,
+            max_bytes=int(config.RENDER_CACHE_MAX_MB * 1024 * 1024),
+            store_dtype=config.RENDER_CACHE_DTYPE,
+        )
+    return _render_cache
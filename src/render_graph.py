@@ -0,0 +1,254 @@
+"""
+Lazy render graph for one request (predictive branch, baseline, accept /
+reject).
+
+Nodes are built first and evaluated on demand. Every node has a key
+derived from its content, not from how it was built:
+
+  decode    sha256 of the base image file
+  edit      base image hash + the full edit chain (serialize_edits)
+  proxy     source node key + target long side
+  optimise  proxy key + intent vector + budget / mode
+  ...       (callers add their own ops through node())
+
+Building a node whose key already exists returns the existing node, so
+shared subgraphs (the branch render that both the AI branch and the
+user's future start from, say) are evaluated once. An edit node chains
+from the longest prefix of its edit list already in the graph and only
+applies the remaining edits. Renders found in the persistent render cache
+become leaves that load from it.
+
+evaluate() runs the needed nodes on a thread pool as soon as their
+inputs are ready, so independent work (rendering the user's future while
+the optimise call waits on the network) overlaps. Node functions must be
+thread-safe; the in-process caches they hit (proxies, spatial kernels,
+LUTs, sessions) are locked. Each executed node is recorded with its
+timings; plan() / dump_plan() expose that for profiling, and
+RENDER_PLAN_DIR dumps every pipeline run.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import config
+from .ai_client import optimise_tone_colour
+from .apply_edits import apply_edits_sequence, load_image
+from .edits import Edit
+from .intent import TARGET_LONG_SIDE, make_lowres
+from .render_cache import get_render_cache, hash_image_file, serialize_edits
+
+DEFAULT_WORKERS = 4
+
+
+def _digest(*parts: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        h.update(p.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+@dataclass(eq=False)
+class Node:
+    op: str
+    key: str
+    fn: Callable[..., Any] = field(repr=False)
+    deps: Tuple["Node", ...] = ()
+    label: str = ""
+
+
+class RenderGraph:
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self._nodes: Dict[str, Node] = {}
+        self._values: Dict[str, Any] = {}
+        self._plan: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    # --- building ---------------------------------------------------------
+
+    def node(self, op: str, key_parts: Sequence[str], fn: Callable[..., Any],
+             deps: Sequence[Node] = (), label: str = "") -> Node:
+        """
+        Get or add a node; fn is called with the values of deps, in order.
+        """
+        return self._intern(f"{op}:{_digest(*key_parts)}", op, fn, deps, label)
+
+    def _intern(self, key: str, op: str, fn: Callable[..., Any],
+                deps: Sequence[Node], label: str) -> Node:
+        with self._lock:
+            node = self._nodes.get(key)
+            if node is None:
+                node = Node(op, key, fn, tuple(deps), label)
+                self._nodes[key] = node
+            return node
+
+    def constant(self, op: str, key_parts: Sequence[str], value: Any) -> Node:
+        """
+        A node with a known value (e.g. prefetched AI params).
+        """
+        node = self.node(op, key_parts, lambda: value)
+        self._values.setdefault(node.key, value)
+        return node
+
+    def decode(self, path: str) -> Node:
+        return self.node("decode", [hash_image_file(path)], lambda: load_image(path),
+                         label=os.path.basename(path))
+
+    def _render_key(self, image_hash: str, edits: List[Edit]) -> str:
+        return f"edit:{_digest(image_hash, serialize_edits(edits))}"
+
+    def render(self, path: str, edits: Sequence[Edit]) -> Node:
+        """
+        The base image with edits applied (same result as
+        apply_edits_sequence(load_image(path), edits)).
+        """
+        edits = list(edits)
+        if not edits:
+            return self.decode(path)
+
+        image_hash = hash_image_file(path)
+        key = self._render_key(image_hash, edits)
+        existing = self._nodes.get(key)
+        if existing is not None:
+            return existing
+
+        label = f"{os.path.basename(path)} +{len(edits)} edits"
+        cache = get_render_cache()
+        cache_key = cache.key(path, edits) if cache is not None else None
+
+        if cache is not None and cache.contains(cache_key):
+            def load_cached():
+                hit = cache.get(cache_key)
+                if hit is None:  # evicted since the check
+                    hit = apply_edits_sequence(load_image(path), edits)
+                return hit
+            return self._intern(key, "edit", load_cached, (), label + " (cached)")
+
+        parent: Optional[Node] = None
+        start = 0
+        for k in range(len(edits) - 1, 0, -1):
+            parent = self._nodes.get(self._render_key(image_hash, edits[:k]))
+            if parent is not None:
+                start = k
+                break
+        if parent is None:
+            parent = self.decode(path)
+        rest = edits[start:]
+
+        def apply_rest(img: np.ndarray) -> np.ndarray:
+            out = apply_edits_sequence(img, rest)
+            if cache is not None:
+                cache.put(cache_key, out)
+            return out
+
+        return self._intern(key, "edit", apply_rest, (parent,), label)
+
+    def proxy(self, src: Node, target_long_side: int = TARGET_LONG_SIDE) -> Node:
+        return self.node("proxy", [src.key, str(target_long_side)],
+                         lambda img: make_lowres(img, target_long_side), (src,))
+
+    def optimise(self, proxy: Node, intent_vector: np.ndarray,
+                 latency_budget: Optional[float] = None, mode: Optional[str] = None) -> Node:
+        intent = np.asarray(intent_vector, dtype=np.float32)
+        return self.node(
+            "optimise", [proxy.key, intent.tobytes().hex(), repr(latency_budget), repr(mode)],
+            lambda low: optimise_tone_colour(low, intent, latency_budget, mode), (proxy,),
+        )
+
+    # --- evaluation -------------------------------------------------------
+
+    def _needed(self, targets: Sequence[Node]) -> List[Node]:
+        seen: Dict[str, Node] = {}
+        stack = list(targets)
+        while stack:
+            n = stack.pop()
+            if n.key in seen or n.key in self._values:
+                continue
+            seen[n.key] = n
+            stack.extend(n.deps)
+        return list(seen.values())
+
+    def _run(self, node: Node) -> Any:
+        start = time.perf_counter()
+        value = node.fn(*(self._values[d.key] for d in node.deps))
+        end = time.perf_counter()
+        self._plan.append({
+            "op": node.op,
+            "key": node.key,
+            "label": node.label,
+            "deps": [d.key for d in node.deps],
+            "thread": threading.current_thread().name,
+            "start_ms": round((start - self._t0) * 1000.0, 3),
+            "end_ms": round((end - self._t0) * 1000.0, 3),
+        })
+        return value
+
+    def evaluate(self, *targets: Node) -> List[Any]:
+        """
+        Values of targets, computing each needed node once. Independent
+        nodes run concurrently; the first failure is raised.
+        """
+        todo = self._needed(targets)
+        if todo:
+            waiting = {n.key: sum(1 for d in n.deps if d.key not in self._values) for n in todo}
+            dependents: Dict[str, List[Node]] = {}
+            for n in todo:
+                for d in n.deps:
+                    dependents.setdefault(d.key, []).append(n)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers,
+                                    thread_name_prefix="render-graph") as pool:
+                running = {pool.submit(self._run, n): n for n in todo if waiting[n.key] == 0}
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        node = running.pop(fut)
+                        try:
+                            self._values[node.key] = fut.result()
+                        except BaseException:
+                            for f in running:
+                                f.cancel()
+                            raise
+                        for nxt in dependents.get(node.key, []):
+                            waiting[nxt.key] -= 1
+                            if waiting[nxt.key] == 0:
+                                running[pool.submit(self._run, nxt)] = nxt
+
+        return [self._values[t.key] for t in targets]
+
+    # --- profiling --------------------------------------------------------
+
+    def plan(self) -> List[Dict[str, Any]]:
+        """
+        Executed nodes in completion order, times in ms since graph creation.
+        """
+        return list(self._plan)
+
+    def dump_plan(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"nodes": len(self._nodes), "executed": self.plan()}, f, indent=2)
+
+    def dump_plan_if_enabled(self, name: str) -> Optional[str]:
+        """
+        Write the plan to RENDER_PLAN_DIR/<name>-<time>.json when configured.
+        """
+        if not config.RENDER_PLAN_DIR:
+            return None
+        os.makedirs(config.RENDER_PLAN_DIR, exist_ok=True)
+        path = os.path.join(config.RENDER_PLAN_DIR,
+                            f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{id(self):x}.json")
+        self.dump_plan(path)
+        return path
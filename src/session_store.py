@@ -0,0 +1,121 @@
+"""
+Server-side store for session-scoped proxies.
+
+A client uploads a branch proxy once and gets a session id; later
+/optimise calls send only the id plus candidates. Each session keeps the
+decoded float32 proxy and a small cache of derived features (e.g. the
+HDRNet output per (brightness, contrast) prefix), so follow-up requests
+skip both the upload/decode and repeated model work.
+
+Bounded by total bytes (LRU eviction) and by idle time (TTL).
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+SESSION_MAX_FEATURES = 32
+
+
+@dataclass
+class Session:
+    image: np.ndarray
+    features: "OrderedDict[object, np.ndarray]" = field(default_factory=OrderedDict)
+    last_access: float = field(default_factory=time.monotonic)
+    # concurrent requests on one session share the feature cache
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def nbytes(self) -> int:
+        with self.lock:
+            return self.image.nbytes + sum(f.nbytes for f in self.features.values())
+
+    def get_feature(self, key) -> Optional[np.ndarray]:
+        with self.lock:
+            value = self.features.get(key)
+            if value is not None:
+                self.features.move_to_end(key)
+            return value
+
+    def put_feature(self, key, value: np.ndarray) -> None:
+        value.setflags(write=False)
+        with self.lock:
+            self.features[key] = value
+            self.features.move_to_end(key)
+            while len(self.features) > SESSION_MAX_FEATURES:
+                self.features.popitem(last=False)
+
+    def clear_features(self) -> None:
+        with self.lock:
+            self.features.clear()
+
+
+class SessionStore:
+    def __init__(self, max_bytes: int, ttl_s: float):
+        self.max_bytes = int(max_bytes)
+        self.ttl_s = float(ttl_s)
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def create(self, image: np.ndarray) -> str:
+        """
+        Store a private copy of image; returns the new session id.
+        """
+        img = np.array(image, dtype=np.float32, copy=True)
+        img.setflags(write=False)
+        sid = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[sid] = Session(img)
+            self._evict_locked()
+        return sid
+
+    def get(self, sid: str) -> Optional[Session]:
+        with self._lock:
+            self._expire_locked()
+            session = self._sessions.get(sid)
+            if session is not None:
+                session.last_access = time.monotonic()
+                self._sessions.move_to_end(sid)
+            return session
+
+    def release(self, sid: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(sid, None) is not None
+
+    def enforce_bounds(self) -> None:
+        """
+        Call after adding features to a session; they count towards max_bytes.
+        """
+        with self._lock:
+            self._evict_locked()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(s.nbytes() for s in self._sessions.values())
+
+    def _expire_locked(self) -> None:
+        cutoff = time.monotonic() - self.ttl_s
+        # oldest access first: stop at the first live session
+        while self._sessions:
+            sid, session = next(iter(self._sessions.items()))
+            if session.last_access >= cutoff:
+                break
+            del self._sessions[sid]
+
+    def _evict_locked(self) -> None:
+        self._expire_locked()
+        total = sum(s.nbytes() for s in self._sessions.values())
+        while total > self.max_bytes and len(self._sessions) > 1:
+            _, dropped = self._sessions.popitem(last=False)
+            total -= dropped.nbytes()
+        # a single session over budget keeps its image but loses its features
+        if total > self.max_bytes and self._sessions:
+            next(iter(self._sessions.values())).clear_features()
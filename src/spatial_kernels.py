@@ -0,0 +1,184 @@
+"""
+Spatial kernels for the GRAIN and VIGNETTE edits.
+
+Both are defined in normalised frame coordinates, not pixels, so a
+low-res proxy, a full-res render and a tile of the full-res render all
+see the same vignette and the same grain pattern.
+
+frame = (full_h, full_w, y0, x0) places an (h, w) render inside the full
+frame (tile-based rendering). frame=None means the render *is* the whole
+frame, at whatever resolution (proxy or full size).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+Frame = Tuple[int, int, int, int]
+
+# grain cells across the long side of the frame at size=1.0
+GRAIN_GRID_LONG = 1024
+
+VIGNETTE_CACHE_BYTES = 128 * 1024 * 1024
+GRAIN_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class _ArrayLRU:
+    """
+    Small LRU of numpy arrays bounded by total nbytes. Thread-safe: renders
+    run on prefetch and render-graph worker threads.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            arr = self._items.get(key)
+            if arr is not None:
+                self._items.move_to_end(key)
+            return arr
+
+    def put(self, key, arr: np.ndarray) -> np.ndarray:
+        if arr.nbytes > self.max_bytes:
+            return arr  # too big to keep; still usable by the caller
+        arr.setflags(write=False)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._items[key] = arr
+            self.nbytes += arr.nbytes
+            while self.nbytes > self.max_bytes:
+                _, dropped = self._items.popitem(last=False)
+                self.nbytes -= dropped.nbytes
+        return arr
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+
+_vignette_cache = _ArrayLRU(VIGNETTE_CACHE_BYTES)
+_grain_field_cache = _ArrayLRU(GRAIN_CACHE_BYTES)
+_grain_proxy_cache = _ArrayLRU(GRAIN_CACHE_BYTES // 4)
+
+
+def _resolve_frame(h: int, w: int, frame: Optional[Frame]) -> Frame:
+    return (h, w, 0, 0) if frame is None else tuple(int(v) for v in frame)
+
+
+def _centres(n: int, full: int, start: int) -> np.ndarray:
+    """
+    Pixel centres of n samples starting at `start`, in [0, 1] of a `full`-pixel axis.
+    """
+    return (np.arange(start, start + n, dtype=np.float32) + 0.5) / full
+
+
+# --- Vignette -----------------------------------------------------------
+
+def vignette_mask(h: int, w: int, amount: float, radius: float = 0.5,
+                  softness: float = 0.5, frame: Optional[Frame] = None) -> np.ndarray:
+    """
+    Multiplicative vignette mask, shape (h, w, 1), float32.
+    amount > 0 darkens the corners, amount < 0 brightens them.
+    radius/softness are in units of the centre-to-corner distance.
+    Cached by (shape, frame, params).
+    """
+    frame = _resolve_frame(h, w, frame)
+    key = (h, w, frame, float(amount), float(radius), float(softness))
+    mask = _vignette_cache.get(key)
+    if mask is not None:
+        return mask
+
+    full_h, full_w, y0, x0 = frame
+    dy = _centres(h, full_h, y0) * 2.0 - 1.0
+    dx = _centres(w, full_w, x0) * 2.0 - 1.0
+
+    # squared distance, normalised so the corners sit at r = 1
+    r2 = (dy[:, None] ** 2 + dx[None, :] ** 2) * 0.5
+    r = np.sqrt(r2)
+
+    t = np.clip((r - radius) / max(softness, 1e-6), 0.0, 1.0)
+    falloff = t * t * (3.0 - 2.0 * t)  # smoothstep
+    mask = (1.0 - float(amount) * falloff).astype(np.float32)[..., None]
+
+    return _vignette_cache.put(key, mask)
+
+
+# --- Grain --------------------------------------------------------------
+
+def grain_grid_shape(full_h: int, full_w: int, size: float = 1.0) -> Tuple[int, int]:
+    cells_long = max(1, int(round(GRAIN_GRID_LONG / max(size, 1e-3))))
+    long_side = max(full_h, full_w)
+    gh = max(1, int(round(cells_long * full_h / long_side)))
+    gw = max(1, int(round(cells_long * full_w / long_side)))
+    return gh, gw
+
+
+def grain_noise_field(seed: int, gh: int, gw: int) -> np.ndarray:
+    """
+    Unit-variance Gaussian noise on the frame's grain grid, cached by seed.
+    """
+    key = (int(seed), gh, gw)
+    field = _grain_field_cache.get(key)
+    if field is None:
+        rng = np.random.default_rng(int(seed))
+        field = _grain_field_cache.put(key, rng.standard_normal((gh, gw), dtype=np.float32))
+    return field
+
+
+def _sample_bilinear(field: np.ndarray, h: int, w: int, frame: Frame) -> np.ndarray:
+    """
+    Separable bilinear sample of `field` at the pixel centres of an (h, w)
+    region of the frame. Used when the render is at least as fine as the grid.
+    """
+    gh, gw = field.shape
+    full_h, full_w, y0, x0 = frame
+
+    def axis(n, full, start, g):
+        pos = np.clip(_centres(n, full, start) * g - 0.5, 0.0, g - 1)
+        i0 = np.floor(pos).astype(np.intp)
+        i1 = np.minimum(i0 + 1, g - 1)
+        return i0, i1, (pos - i0).astype(np.float32)
+
+    r0, r1, wy = axis(h, full_h, y0, gh)
+    c0, c1, wx = axis(w, full_w, x0, gw)
+    wy = wy[:, None]
+
+    top = field[r0][:, c0] * (1.0 - wx) + field[r0][:, c1] * wx
+    bot = field[r1][:, c0] * (1.0 - wx) + field[r1][:, c1] * wx
+    return top * (1.0 - wy) + bot * wy
+
+
+def grain_noise(h: int, w: int, seed: int = 0, size: float = 1.0,
+                frame: Optional[Frame] = None) -> np.ndarray:
+    """
+    Grain noise for an (h, w) render, shape (h, w, 1), float32.
+
+    Finer-than-grid renders (full size, tiles) bilinearly sample the field.
+    Coarser renders (proxies) area-average it, i.e. they show what the
+    full-size grain looks like after downsampling.
+    """
+    frame = _resolve_frame(h, w, frame)
+    full_h, full_w, y0, x0 = frame
+    gh, gw = grain_grid_shape(full_h, full_w, size)
+    field = grain_noise_field(seed, gh, gw)
+
+    if full_h >= gh and full_w >= gw:
+        return _sample_bilinear(field, h, w, frame)[..., None]
+
+    key = (int(seed), gh, gw, full_h, full_w)
+    scaled = _grain_proxy_cache.get(key)
+    if scaled is None:
+        # PIL's resize filters are antialiased when reducing
+        pil = Image.fromarray(field).resize((full_w, full_h), Image.BILINEAR)
+        scaled = _grain_proxy_cache.put(key, np.asarray(pil, dtype=np.float32))
+    return scaled[y0:y0 + h, x0:x0 + w, None]
@@ -0,0 +1,199 @@
+"""
+Tiny numpy surrogate of the server's _score_candidate
+(brightness/contrast -> HDRNet -> LUT -> AestheticNet + heuristics).
+
+Features, per proxy (computed once):
+  16-bin luminance histogram, per-channel mean/std, luma percentiles and
+  gradient energy of a THUMB x THUMB thumbnail;
+per candidate:
+  brightness, contrast, lut_strength and their products, plus luma
+  mean/std/clipping of the thumbnail after the candidate's
+  brightness + contrast (cheap: THUMB^2 pixels).
+
+Model: standardised features -> one tanh hidden layer -> score, trained by
+distill_surrogate.py against the real scorer and stored as a small .npz.
+Scoring a batch of candidates costs tens of microseconds each.
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from . import config
+
+THUMB = 32
+HIDDEN = 32
+FEATURE_VERSION = 1
+
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+# --- features -----------------------------------------------------------
+
+def _thumbnail(lowres: np.ndarray) -> np.ndarray:
+    u8 = (np.clip(lowres, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+    small = Image.fromarray(u8).resize((THUMB, THUMB), Image.BILINEAR)
+    return np.asarray(small, dtype=np.float32) / 255.0
+
+
+def image_features(lowres: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (per-image feature vector, thumbnail) for one proxy.
+    """
+    thumb = _thumbnail(lowres)
+    y = thumb @ _LUMA
+    hist = np.histogram(y, bins=16, range=(0.0, 1.0))[0] / y.size
+    gy, gx = np.gradient(y)
+    feats = np.concatenate([
+        hist,
+        thumb.mean(axis=(0, 1)),
+        thumb.std(axis=(0, 1)),
+        np.percentile(y, [5, 50, 95]),
+        [float(np.sqrt(gx * gx + gy * gy).mean())],
+    ])
+    return feats.astype(np.float32), thumb
+
+
+def candidate_features(thumb: np.ndarray, candidates: Sequence[Dict[str, float]]) -> np.ndarray:
+    """
+    (N, F) per-candidate features for one thumbnail.
+    """
+    p = np.array(
+        [[c["brightness"], c["contrast"], c.get("lut_strength", 0.0)] for c in candidates],
+        dtype=np.float32,
+    )
+    b, c, s = p[:, 0], p[:, 1], p[:, 2]
+
+    # same ops as apply_brightness + apply_contrast, on the thumbnail
+    y = thumb.reshape(1, -1, 3)
+    y = np.clip(y + b[:, None, None], 0.0, 1.0)
+    y = np.clip((y - 0.5) * (1.0 + c[:, None, None]) + 0.5, 0.0, 1.0)
+    y = y @ _LUMA
+    mean = y.mean(axis=1)
+    std = y.std(axis=1)
+
+    return np.stack([
+        b, c, s, b * c, b * s, c * s, b * b, c * c, s * s,
+        mean, std, np.abs(mean - 0.5), np.abs(std - 0.25),
+        (y <= 0.0).mean(axis=1), (y >= 1.0).mean(axis=1),
+    ], axis=1)
+
+
+def build_features(lowres: np.ndarray, candidates: Sequence[Dict[str, float]]) -> np.ndarray:
+    img_f, thumb = image_features(lowres)
+    cand_f = candidate_features(thumb, candidates)
+    return np.concatenate([np.broadcast_to(img_f, (len(cand_f), img_f.size)), cand_f], axis=1)
+
+
+# --- model --------------------------------------------------------------
+
+class SurrogateScorer:
+    """
+    One-hidden-layer MLP over build_features(). Parameters live in plain
+    numpy arrays; save()/load() use a .npz with the feature version.
+    """
+
+    def __init__(self, mu: np.ndarray, sigma: np.ndarray, w1: np.ndarray, b1: np.ndarray,
+                 w2: np.ndarray, b2: float, y_mu: float = 0.0, y_sigma: float = 1.0):
+        self.mu, self.sigma = mu, sigma
+        self.w1, self.b1, self.w2, self.b2 = w1, b1, w2, float(b2)
+        self.y_mu, self.y_sigma = float(y_mu), float(y_sigma)
+
+    def predict_features(self, x: np.ndarray) -> np.ndarray:
+        h = np.tanh(((x - self.mu) / self.sigma) @ self.w1 + self.b1)
+        return (h @ self.w2 + self.b2) * self.y_sigma + self.y_mu
+
+    def score(self, lowres: np.ndarray, candidates: Sequence[Dict[str, float]]) -> np.ndarray:
+        """
+        Predicted server scores for candidates on this proxy, shape (N,).
+        """
+        return self.predict_features(build_features(lowres, candidates))
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, version=FEATURE_VERSION, mu=self.mu, sigma=self.sigma,
+                 w1=self.w1, b1=self.b1, w2=self.w2, b2=self.b2,
+                 y_mu=self.y_mu, y_sigma=self.y_sigma)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SurrogateScorer":
+        with np.load(path) as z:
+            if int(z["version"]) != FEATURE_VERSION:
+                raise ValueError(f"{path}: surrogate feature version {int(z['version'])}, "
+                                 f"expected {FEATURE_VERSION}")
+            return cls(z["mu"], z["sigma"], z["w1"], z["b1"], z["w2"], float(z["b2"]),
+                       float(z["y_mu"]), float(z["y_sigma"]))
+
+
+def fit_surrogate(x: np.ndarray, y: np.ndarray, hidden: int = HIDDEN, epochs: int = 2000,
+                  lr: float = 0.01, weight_decay: float = 1e-4, seed: int = 0) -> SurrogateScorer:
+    """
+    Full-batch Adam on mean squared error. x: (N, F), y: (N,).
+    """
+    rng = np.random.default_rng(seed)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    mu, sigma = x.mean(axis=0), x.std(axis=0) + 1e-6
+    y_mu, y_sigma = y.mean(), y.std() + 1e-6
+    xs = (x - mu) / sigma
+    ys = (y - y_mu) / y_sigma
+
+    params = [
+        rng.normal(0.0, 1.0 / np.sqrt(x.shape[1]), (x.shape[1], hidden)),
+        np.zeros(hidden),
+        rng.normal(0.0, 1.0 / np.sqrt(hidden), hidden),
+        np.zeros(()),
+    ]
+    m = [np.zeros_like(p) for p in params]
+    v = [np.zeros_like(p) for p in params]
+    beta1, beta2 = 0.9, 0.999
+
+    for t in range(1, epochs + 1):
+        w1, b1, w2, b2 = params
+        h = np.tanh(xs @ w1 + b1)
+        err = (h @ w2 + b2 - ys) * (2.0 / len(ys))
+        dh = np.outer(err, w2) * (1.0 - h * h)
+        grads = [xs.T @ dh + weight_decay * w1, dh.sum(axis=0),
+                 h.T @ err + weight_decay * w2, err.sum()]
+        for i, g in enumerate(grads):
+            m[i] = beta1 * m[i] + (1 - beta1) * g
+            v[i] = beta2 * v[i] + (1 - beta2) * g * g
+            params[i] = params[i] - lr * (m[i] / (1 - beta1 ** t)) / (np.sqrt(v[i] / (1 - beta2 ** t)) + 1e-8)
+
+    w1, b1, w2, b2 = params
+    f32 = np.float32
+    return SurrogateScorer(mu.astype(f32), sigma.astype(f32), w1.astype(f32), b1.astype(f32),
+                           w2.astype(f32), float(b2), float(y_mu), float(y_sigma))
+
+
+_surrogate: Optional[SurrogateScorer] = None
+_surrogate_mtime: Optional[int] = None
+_surrogate_lock = threading.Lock()
+
+
+def get_surrogate() -> Optional[SurrogateScorer]:
+    """
+    Process-wide scorer from config.SURROGATE_PATH, reloaded when the file
+    changes; None when SURROGATE_PATH is unset or there is no (compatible)
+    surrogate file.
+    """
+    global _surrogate, _surrogate_mtime
+    path = config.SURROGATE_PATH
+    if not path:
+        return None
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _surrogate_lock:
+        if _surrogate is None or _surrogate_mtime != mtime:
+            try:
+                _surrogate = SurrogateScorer.load(path)
+            except (OSError, ValueError, KeyError):
+                return None
+            _surrogate_mtime = mtime
+        return _surrogate
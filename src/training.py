@@ -0,0 +1,393 @@
+"""
+Training for HDRNet-lite and AestheticNet on local image folders.
+
+1. build_shard: decode every image once, straight to proxy size (same
+   geometry as make_lowres / load_lowres), into one memory-mapped uint8
+   .npy of shape (N, S, S, 3), S = target long side. Each image sits in the
+   top-left corner; its (h, w) and name are in the <shard>.json sidecar.
+
+2. PairDataset: a random crop + flip of a shard image (the "clean" target)
+   and a degraded copy (random exposure, contrast, gamma, saturation),
+   augmented on the fly in DataLoader worker processes. Workers open the
+   memmap themselves, so nothing large is pickled.
+
+3. train: self-supervised objectives, since the folders carry no labels:
+     hdrnet     restore the clean crop from the degraded one (L1);
+     aesthetic  score the clean crop above its degraded copy (margin
+                ranking), plus MSE to per-image scores if a labels JSON
+                {name: score} is given.
+   The state_dict is checkpointed after every epoch, in the format
+   HDRNET_WEIGHTS / AESTHETIC_WEIGHTS expect, and images/s is reported
+   (overall, and with loader waits excluded) to size CPU jobs.
+
+  python -m src.training shard photos/ shard.npy --workers 4
+  python -m src.training hdrnet shard.npy hdrnet.pt --epochs 10 --workers 4
+  python -m src.training aesthetic shard.npy aesthetic.pt --labels scores.json
+"""
+
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, Dataset, get_worker_info
+
+from .aesthetic_net import AestheticNet
+from .hdrnet_wrapper import build_hdrnet_model
+from .intent import TARGET_LONG_SIDE, _decode_lowres
+
+SHARD_VERSION = 1
+CROP = 128
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp")
+RANK_MARGIN = 0.1
+
+
+# --- Shard ----------------------------------------------------------------
+
+def list_images(folder: str) -> List[str]:
+    return sorted(
+        os.path.join(folder, f) for f in os.listdir(folder)
+        if f.lower().endswith(IMAGE_EXTS)
+    )
+
+
+def _trim_npy(path: str, n: int) -> None:
+    """
+    Shrink a C-order .npy file in place to its first n rows along axis 0.
+    """
+    fmt = np.lib.format
+    with open(path, "r+b") as f:
+        version = fmt.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = fmt.read_array_header_1_0(f)
+        else:
+            shape, fortran, dtype = fmt.read_array_header_2_0(f)
+        offset = f.tell()
+        shape = (n,) + tuple(shape[1:])
+        header = {"descr": fmt.dtype_to_descr(dtype), "fortran_order": fortran, "shape": shape}
+        buf = io.BytesIO()
+        fmt.write_array_header_1_0(buf, header)
+        if len(buf.getvalue()) == offset:
+            # numpy pads the header so axis 0 can change length in place
+            f.seek(0)
+            f.write(buf.getvalue())
+            f.truncate(offset + int(np.prod(shape)) * dtype.itemsize)
+            return
+
+    # header would change size: copy the kept rows out instead
+    src = np.load(path, mmap_mode="r")
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".npy.tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, src[:n])
+    del src
+    os.replace(tmp, path)
+
+
+def build_shard(image_paths: List[str], out_path: str,
+                target_long_side: int = TARGET_LONG_SIDE, workers: int = 4) -> Dict[str, float]:
+    """
+    Decode image_paths into a uint8 shard at out_path (+ out_path.json).
+    Each image is written to the memmap as it is decoded, so only the
+    images in flight are held in memory. Unreadable images are skipped.
+    Returns decode throughput.
+    """
+    t0 = time.perf_counter()
+    s = target_long_side
+
+    def decode(path):
+        try:
+            return (_decode_lowres(path, s) * 255.0 + 0.5).astype(np.uint8)
+        except OSError as e:
+            print(f"[TRAIN] skipping {path}: {e}")
+            return None
+
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".npy.tmp")
+    os.close(fd)
+    try:
+        data = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint8,
+                                         shape=(len(image_paths), s, s, 3))
+        names, sizes = [], []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            # map yields in input order; skipped images leave no gap
+            for path, img in zip(image_paths, pool.map(decode, image_paths)):
+                if img is None:
+                    continue
+                h, w, _ = img.shape
+                data[len(names), :h, :w] = img
+                names.append(os.path.basename(path))
+                sizes.append([h, w])
+        data.flush()
+        del data
+        if len(names) < len(image_paths):
+            _trim_npy(tmp, len(names))
+        os.replace(tmp, out_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    index = {
+        "version": SHARD_VERSION,
+        "target_long_side": s,
+        "names": names,
+        "sizes": sizes,
+    }
+    with open(out_path + ".json", "w") as f:
+        json.dump(index, f)
+
+    seconds = time.perf_counter() - t0
+    return {"images": len(names), "seconds": seconds,
+            "images_per_s": len(names) / seconds if seconds > 0 else 0.0}
+
+
+class ImageShard:
+    """
+    Read-only view of a shard. The memmap is opened lazily, so an instance
+    can be handed to DataLoader workers and each opens its own.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path + ".json") as f:
+            index = json.load(f)
+        if index.get("version") != SHARD_VERSION:
+            raise ValueError(f"{path}: unsupported shard version {index.get('version')}")
+        self.names: List[str] = index["names"]
+        self.sizes: List[List[int]] = index["sizes"]
+        self._data: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_data"] = None
+        return state
+
+    def image(self, i: int) -> np.ndarray:
+        """
+        (h, w, 3) uint8 view of image i.
+        """
+        if self._data is None:
+            self._data = np.load(self.path, mmap_mode="r")
+        h, w = self.sizes[i]
+        return self._data[i, :h, :w]
+
+
+# --- Augmenting loader ----------------------------------------------------
+
+def _degrade(img: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Random exposure / contrast / gamma / saturation change (float HxWx3).
+    """
+    out = np.clip(img + rng.uniform(-0.25, 0.25), 0.0, 1.0)
+    out = np.clip((out - 0.5) * (1.0 + rng.uniform(-0.4, 0.4)) + 0.5, 0.0, 1.0)
+    out = out ** rng.uniform(0.6, 1.6)
+    grey = out.mean(axis=2, keepdims=True)
+    out = np.clip(grey + (out - grey) * (1.0 + rng.uniform(-0.5, 0.5)), 0.0, 1.0)
+    return out.astype(np.float32)
+
+
+class PairDataset(Dataset):
+    """
+    Items: (degraded CHW float32, clean CHW float32, label or NaN).
+    """
+
+    def __init__(self, shard: ImageShard, crop: int = CROP, seed: int = 0,
+                 labels: Optional[Dict[str, float]] = None):
+        self.shard = shard
+        self.crop = crop
+        self.labels = labels or {}
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return len(self.shard)
+
+    def __getitem__(self, i: int):
+        rng = self.rng
+        img = self.shard.image(i)
+        h, w, _ = img.shape
+        ch, cw = min(self.crop, h), min(self.crop, w)
+        y0 = int(rng.integers(0, h - ch + 1))
+        x0 = int(rng.integers(0, w - cw + 1))
+        clean = img[y0:y0 + ch, x0:x0 + cw].astype(np.float32) / 255.0
+        if ch < self.crop or cw < self.crop:
+            clean = np.pad(clean, ((0, self.crop - ch), (0, self.crop - cw), (0, 0)), mode="edge")
+        if rng.random() < 0.5:
+            clean = clean[:, ::-1]
+        degraded = _degrade(clean, rng)
+
+        label = self.labels.get(self.shard.names[i], float("nan"))
+        return (np.ascontiguousarray(degraded.transpose(2, 0, 1)),
+                np.ascontiguousarray(clean.transpose(2, 0, 1)),
+                np.float32(label))
+
+
+def _seed_worker(worker_id: int) -> None:
+    # torch gives every worker (and every epoch) a distinct initial seed
+    info = get_worker_info()
+    info.dataset.rng = np.random.default_rng(torch.initial_seed() % 2 ** 32)
+
+
+def make_loader(dataset: PairDataset, batch_size: int, workers: int) -> DataLoader:
+    return DataLoader(dataset, batch_size=batch_size, shuffle=True, drop_last=False,
+                      num_workers=workers, worker_init_fn=_seed_worker if workers > 0 else None,
+                      persistent_workers=False)
+
+
+# --- Training -------------------------------------------------------------
+
+def _build_model(kind: str) -> torch.nn.Module:
+    if kind == "hdrnet":
+        return build_hdrnet_model()
+    if kind == "aesthetic":
+        return AestheticNet()
+    raise ValueError(f"unknown model kind: {kind}")
+
+
+def _loss(kind: str, model: torch.nn.Module, degraded: torch.Tensor,
+          clean: torch.Tensor, label: torch.Tensor) -> torch.Tensor:
+    if kind == "hdrnet":
+        return F.l1_loss(model(degraded), clean)
+
+    scores = model(torch.cat([clean, degraded]))
+    s_clean, s_deg = scores[:len(clean)], scores[len(clean):]
+    loss = F.relu(RANK_MARGIN - (s_clean - s_deg)).mean()
+    has_label = ~torch.isnan(label)
+    if has_label.any():
+        loss = loss + F.mse_loss(s_clean[has_label], label[has_label])
+    return loss
+
+
+def _save_checkpoint(model: torch.nn.Module, path: str) -> None:
+    out_dir = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".pt.tmp")
+    os.close(fd)
+    torch.save(model.state_dict(), tmp)
+    os.replace(tmp, path)
+
+
+def train(kind: str, shard_path: str, out_path: str, epochs: int = 5, batch_size: int = 32,
+          workers: int = 2, lr: float = 1e-3, crop: int = CROP, seed: int = 0,
+          labels: Optional[Dict[str, float]] = None, init_weights: Optional[str] = None) -> Dict:
+    """
+    Train kind ("hdrnet" or "aesthetic") on a shard, checkpointing the
+    state_dict to out_path after each epoch. Returns (and writes to
+    out_path.metrics.json) per-epoch loss and throughput.
+    """
+    torch.manual_seed(seed)
+    model = _build_model(kind)
+    if init_weights:
+        model.load_state_dict(torch.load(init_weights, map_location="cpu"))
+    model.train()
+    opt = torch.optim.Adam(model.parameters(), lr=lr)
+
+    dataset = PairDataset(ImageShard(shard_path), crop=crop, seed=seed, labels=labels)
+    loader = make_loader(dataset, batch_size, workers)
+
+    history = []
+    for epoch in range(epochs):
+        n = 0
+        total_loss = 0.0
+        wait_s = compute_s = 0.0
+        t_epoch = t_wait = time.perf_counter()
+        for degraded, clean, label in loader:
+            t_batch = time.perf_counter()
+            wait_s += t_batch - t_wait
+
+            loss = _loss(kind, model, degraded, clean, label)
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+
+            n += len(clean)
+            total_loss += float(loss.detach()) * len(clean)
+            t_wait = time.perf_counter()
+            compute_s += t_wait - t_batch
+
+        epoch_s = time.perf_counter() - t_epoch
+        _save_checkpoint(model, out_path)
+        stats = {
+            "epoch": epoch + 1,
+            "loss": total_loss / max(n, 1),
+            "images": n,
+            "seconds": epoch_s,
+            "images_per_s": n / epoch_s if epoch_s > 0 else 0.0,
+            "compute_images_per_s": n / compute_s if compute_s > 0 else 0.0,
+            "loader_wait_frac": wait_s / epoch_s if epoch_s > 0 else 0.0,
+        }
+        history.append(stats)
+        print(f"[TRAIN] {kind} epoch {epoch + 1}/{epochs} loss {stats['loss']:.4f} "
+              f"{stats['images_per_s']:.1f} img/s (compute {stats['compute_images_per_s']:.1f}, "
+              f"loader wait {stats['loader_wait_frac']:.0%})")
+
+    metrics = {
+        "kind": kind,
+        "shard": shard_path,
+        "checkpoint": out_path,
+        "epochs": history,
+        "config": {"batch_size": batch_size, "workers": workers, "lr": lr, "crop": crop,
+                   "seed": seed, "torch_threads": torch.get_num_threads()},
+    }
+    with open(out_path + ".metrics.json", "w") as f:
+        json.dump(metrics, f, indent=2)
+    return metrics
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.training",
+                                     description="Train HDRNet-lite / AestheticNet weights.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("shard", help="decode an image folder into a uint8 shard")
+    p.add_argument("images")
+    p.add_argument("out")
+    p.add_argument("--target", type=int, default=TARGET_LONG_SIDE)
+    p.add_argument("--workers", type=int, default=4)
+
+    for kind in ("hdrnet", "aesthetic"):
+        p = sub.add_parser(kind, help=f"train {kind} weights on a shard")
+        p.add_argument("shard")
+        p.add_argument("out")
+        p.add_argument("--epochs", type=int, default=5)
+        p.add_argument("--batch-size", type=int, default=32)
+        p.add_argument("--workers", type=int, default=2)
+        p.add_argument("--lr", type=float, default=1e-3)
+        p.add_argument("--crop", type=int, default=CROP)
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+        p.add_argument("--init", default=None, help="resume from a checkpoint")
+        if kind == "aesthetic":
+            p.add_argument("--labels", default=None, help="JSON {image name: score}")
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "shard":
+        stats = build_shard(list_images(args.images), args.out, args.target, args.workers)
+        print(f"[TRAIN] shard {args.out}: {stats['images']} images, "
+              f"{stats['images_per_s']:.1f} img/s decode")
+        return
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    labels = None
+    if getattr(args, "labels", None):
+        with open(args.labels) as f:
+            labels = {k: float(v) for k, v in json.load(f).items()}
+    metrics = train(args.cmd, args.shard, args.out, epochs=args.epochs, batch_size=args.batch_size,
+                    workers=args.workers, lr=args.lr, crop=args.crop, seed=args.seed,
+                    labels=labels, init_weights=args.init)
+    env = "HDRNET_WEIGHTS" if args.cmd == "hdrnet" else "AESTHETIC_WEIGHTS"
+    print(f"[TRAIN] done: {env}={metrics['checkpoint']}")
+
+
+if __name__ == "__main__":
+    main()
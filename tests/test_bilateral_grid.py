@@ -0,0 +1,32 @@
+import numpy as np
+
+from src.apply_edits import apply_brightness, apply_contrast
+from src.bilateral_grid import (
+    fit_bilateral_grid, apply_bilateral_grid, encode_grid, decode_grid,
+)
+from src.intent import make_lowres
+
+
+def _tone(img):
+    return apply_contrast(apply_brightness(img, 0.05), 0.2) ** 1.2
+
+
+def test_grid_fitted_on_proxy_reproduces_full_res():
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:300, 0:400].astype(np.float32)
+    full = np.stack([xx / 400, yy / 300, 0.5 + 0.1 * np.sin(xx / 20)], axis=-1)
+    full = np.clip(full + rng.normal(0, 0.02, full.shape), 0, 1).astype(np.float32)
+
+    low = make_lowres(full, 64)
+    grid = fit_bilateral_grid(low, _tone(low))
+    out = apply_bilateral_grid(full, grid)
+
+    assert out.shape == full.shape
+    assert np.abs(out - _tone(full)).mean() < 0.01
+
+
+def test_grid_encode_roundtrip():
+    grid = np.random.rand(4, 4, 2, 3, 4).astype(np.float32)
+    back = decode_grid(encode_grid(grid))
+    assert back.shape == grid.shape
+    assert np.allclose(back, grid, atol=1e-3)
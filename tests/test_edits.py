@@ -7,3 +7,51 @@ def test_brightness():
     img = np.ones((2, 2, 3), dtype=np.float32) * 0.5
     out = apply_brightness(img, 0.2)
     assert np.allclose(out, 0.7)
+
+
+def test_vignette_darkens_corners_only():
+    from src.apply_edits import apply_vignette
+
+    img = np.ones((64, 96, 3), dtype=np.float32) * 0.5
+    out = apply_vignette(img, 0.5)
+    assert out[0, 0, 0] < 0.3
+    assert np.isclose(out[32, 48, 0], 0.5)
+
+
+def test_grain_tile_matches_full_frame():
+    from src.apply_edits import apply_edits_sequence
+    from src.edits import Edit, GRAIN, VIGNETTE
+
+    img = np.ones((120, 160, 3), dtype=np.float32) * 0.5
+    edits = [Edit(VIGNETTE, {"amount": 0.3}), Edit(GRAIN, {"amount": 0.5, "seed": 7})]
+
+    full = apply_edits_sequence(img, edits)
+    tile = apply_edits_sequence(img[40:80, 60:140], edits, frame=(120, 160, 40, 60))
+    assert np.allclose(full[40:80, 60:140], tile)
+    assert np.allclose(full, apply_edits_sequence(img, edits))  # same seed, same grain
+
+
+def test_array_lru_is_consistent_under_threads():
+    import threading
+    from src.spatial_kernels import _ArrayLRU
+
+    lru = _ArrayLRU(max_bytes=64 * 8)
+    errors = []
+
+    def worker(seed):
+        try:
+            for i in range(2000):
+                key = (seed + i) % 24
+                if lru.get(key) is None:
+                    lru.put(key, np.zeros(8))
+        except Exception as e:  # KeyError from an unlocked get/move_to_end
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(s,)) for s in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert lru.nbytes == sum(a.nbytes for a in lru._items.values()) <= lru.max_bytes
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from src.edits import Edit, BRIGHTNESS, CONTRAST, FILTER, GRAIN
+from src.history import EditHistory, MAX_EDITS
+from src.history_codec import (
+    apply_delta, decode_history, decode_history_with_hash, encode_delta, encode_history,
+)
+from src.render_cache import hash_image_file
+
+
+def _history():
+    h = EditHistory("example.jpg")
+    h.add_edit(Edit(BRIGHTNESS, {"value": 0.2}))
+    h.add_edit(Edit(CONTRAST, {"value": -0.25}, ai_improvable=False))
+    h.add_edit(Edit(FILTER, {"id": "arabica_12", "strength": 0.5}))
+    h.add_edit(Edit("custom", {"n": -3, "big": 1e300, "s": "x", "flag": True, "none": None}))
+    return h
+
+
+def test_roundtrip_matches_dict_format():
+    h = _history()
+    blob = encode_history(h)
+    assert len(blob) < len(json.dumps(h.to_dict())) / 2
+
+    out, base_hash = decode_history_with_hash(blob)
+    assert json.dumps(out.to_dict()) == json.dumps(h.to_dict())
+    assert base_hash.hex() == hash_image_file("example.jpg")
+
+
+def test_deltas_append_drop_and_truncate():
+    h = _history()
+    appended = EditHistory(h.base_image_path, list(h.edits))
+    appended.add_edit(Edit(GRAIN, {"amount": 0.3, "seed": 7}))
+    assert apply_delta(h, encode_delta(h, appended)).to_dict() == appended.to_dict()
+
+    full = EditHistory(h.base_image_path)
+    for i in range(MAX_EDITS + 1):
+        before = decode_history(encode_history(full))
+        full.add_edit(Edit(BRIGHTNESS, {"value": i / 10}))
+        delta = encode_delta(before, full)
+        assert apply_delta(before, delta).to_dict() == full.to_dict()
+    assert len(delta) < 32
+
+    branched = EditHistory(h.base_image_path, h.get_edits_up_to_index(0) + [Edit(CONTRAST, {"value": 0.1})])
+    assert apply_delta(h, encode_delta(h, branched)).to_dict() == branched.to_dict()
+
+    with pytest.raises(ValueError):
+        apply_delta(appended, encode_delta(h, branched))
@@ -0,0 +1,31 @@
+import numpy as np
+
+from src.apply_edits import load_image
+from src.history import EditHistory
+from src.edits import Edit, BRIGHTNESS, CONTRAST
+from src.intent import make_lowres, load_lowres, prepare_ai_inputs
+
+
+def test_load_lowres_matches_make_lowres():
+    full_low = make_lowres(load_image("example.jpg"))
+    draft_low = load_lowres("example.jpg")
+
+    assert draft_low.shape == full_low.shape
+    assert draft_low.dtype == np.float32
+    assert np.abs(draft_low - full_low).mean() < 0.02
+
+    # cached per path
+    assert load_lowres("example.jpg") is draft_low
+
+
+def test_prepare_ai_inputs_proxy_only():
+    hist = EditHistory(base_image_path="example.jpg")
+    hist.add_edit(Edit(BRIGHTNESS, {"value": 0.2}))
+    hist.add_edit(Edit(CONTRAST,   {"value": 0.3}))
+
+    full, low, intent, _, _, _ = prepare_ai_inputs(hist, 0, fullres=False)
+    _, ref_low, ref_intent, _, _, _ = prepare_ai_inputs(hist, 0)
+
+    assert full is None
+    assert low.shape == ref_low.shape
+    assert np.allclose(intent, ref_intent)
@@ -0,0 +1,63 @@
+import numpy as np
+
+from src.lut_library import LutLibrary, build_lut_library, parse_cube
+from src.lut_utils import apply_3d_lut
+
+
+def _write_identity_cube(path, size=5):
+    lines = ['TITLE "identity"', f"LUT_3D_SIZE {size}"]
+    for b in range(size):
+        for g in range(size):
+            for r in range(size):
+                lines.append(f"{r / (size - 1)} {g / (size - 1)} {b / (size - 1)}")
+    path.write_text("\n".join(lines) + "\n")
+
+
+def test_parse_cube_is_rgb_indexed(tmp_path):
+    _write_identity_cube(tmp_path / "Ident 1.cube")
+    lut = parse_cube(str(tmp_path / "Ident 1.cube"))
+
+    assert lut.shape == (5, 5, 5, 3)
+    assert np.allclose(lut[4, 0, 0], [1.0, 0.0, 0.0])
+
+    img = np.random.rand(8, 8, 3).astype(np.float32)
+    assert np.allclose(apply_3d_lut(img, lut), img, atol=1e-5)
+
+
+def test_packed_library_roundtrip(tmp_path):
+    _write_identity_cube(tmp_path / "Ident 1.cube")
+    _write_identity_cube(tmp_path / "Other 2.CUBE", size=3)
+    store = str(tmp_path / "looks.lutlib")
+    build_lut_library(str(tmp_path), store, dtype="float32")
+
+    lib = LutLibrary(store, cache_size=1)
+    assert lib.ids() == ["ident_1", "other_2"]
+    assert "Ident 1" in lib
+    assert lib.get("missing") is None
+
+    lut = lib.get("Ident 1")
+    assert np.array_equal(lut, parse_cube(str(tmp_path / "Ident 1.cube")))
+    assert lib.get("ident_1") is lut  # LRU hit
+    assert lib.get("Other 2").shape == (3, 3, 3, 3)
+
+
+def test_lookup_never_builds_the_store(tmp_path, monkeypatch, capsys):
+    from src import config, lut_library
+
+    cubes = tmp_path / "cubes"
+    cubes.mkdir()
+    _write_identity_cube(cubes / "Ident 1.cube")
+    store = tmp_path / "cache" / "looks.lutlib"
+    monkeypatch.setattr(config, "LUT_CUBE_DIR", str(cubes))
+    monkeypatch.setattr(config, "LUT_LIBRARY_PATH", str(store))
+    monkeypatch.setattr(lut_library, "_lut_library", None)
+
+    assert lut_library.get_lut_library() is None
+    assert not store.exists()
+    assert "python -m src.lut_library" in capsys.readouterr().out
+
+    assert lut_library.prepare_lut_library()
+    assert "[LUT] building" in capsys.readouterr().out
+    assert not lut_library.prepare_lut_library()  # up to date
+
+    assert lut_library.get_lut_library().ids() == ["ident_1"]
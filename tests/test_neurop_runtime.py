@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+
+from src import neurop_runtime
+from src.intent import load_lowres
+from src.neurop_runtime import apply_neurop, load_neurop_model, run_neurop_batch
+
+
+def test_batch_matches_single_and_keeps_shapes():
+    assert load_neurop_model()
+    a = load_lowres("example.jpg")
+    b = load_lowres("my_test.jpg")
+
+    graded, strengths = run_neurop_batch([a, b, a])
+    assert [g.shape for g in graded] == [a.shape, b.shape, a.shape]
+    assert strengths.shape == (3, 3) and np.all(np.abs(strengths) <= 1.0)
+    assert np.allclose(graded[0], graded[2])
+    assert np.allclose(graded[1], apply_neurop(b), atol=1e-6)
+
+
+def test_identity_without_model(monkeypatch, tmp_path):
+    monkeypatch.setattr(neurop_runtime, "_session", None)
+    monkeypatch.setattr(neurop_runtime, "_load_attempted", False)
+    assert not load_neurop_model(str(tmp_path / "missing.onnx"))
+    img = np.random.default_rng(0).random((8, 12, 3)).astype(np.float32)
+    assert np.array_equal(apply_neurop(img), img)
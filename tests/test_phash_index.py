@@ -0,0 +1,80 @@
+import numpy as np
+
+from src.intent import load_lowres
+from src.phash_index import PHashIndex, dct_hash
+
+
+def test_near_duplicates_hash_close():
+    a = load_lowres("example.jpg")
+    brighter = np.clip(a * 1.05 + 0.01, 0.0, 1.0)
+    other = load_lowres("my_test.jpg")
+
+    def dist(x, y):
+        return bin(dct_hash(x) ^ dct_hash(y)).count("1")
+
+    assert dist(a, brighter) <= 4
+    assert dist(a, other) > 12
+
+
+def test_lookup_reuse_warm_start_and_persist(tmp_path):
+    path = str(tmp_path / "phash.npz")
+    idx = PHashIndex(path, max_distance=4, intent_tol=0.05)
+    params = {"brightness": 0.2, "contrast": 0.1, "lut_strength": 0.0}
+    idx.add(0b1011, [0.1, 0.1, 0.0], params)
+
+    kind, got = idx.lookup(0b1001, np.array([0.1, 0.1, 0.0]))
+    assert kind == "reuse" and np.isclose(got["brightness"], 0.2)
+    assert idx.lookup(0b1001, np.array([0.4, 0.1, 0.0]))[0] == "warm_start"
+    assert idx.lookup(0b1011 ^ 0xFF, np.array([0.1, 0.1, 0.0])) == (None, None)
+
+    idx.save()
+    again = PHashIndex(path, max_distance=4)
+    assert len(again) == 1
+    assert again.lookup(0b1011, np.array([0.1, 0.1, 0.0]))[0] == "reuse"
+
+
+def test_few_adds_survive_process_exit(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    path = str(tmp_path / "phash.npz")
+    script = (
+        "from src.phash_index import get_phash_index\n"
+        "idx = get_phash_index()\n"
+        "for i in range(3):\n"
+        "    idx.add(i, [0.1, 0.0, 0.0], {'brightness': 0.1 * i})\n"
+    )
+    env = dict(os.environ, PHASH_INDEX_PATH=path)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", script], check=True, env=env, cwd=root)
+
+    assert len(PHashIndex(path)) == 3
+
+
+def test_time_based_autosave(tmp_path, monkeypatch):
+    from src import phash_index
+
+    path = str(tmp_path / "phash.npz")
+    idx = PHashIndex(path)
+    idx.add(1, [0.0, 0.0, 0.0], {"brightness": 0.1})
+    assert len(PHashIndex(path)) == 0
+
+    monkeypatch.setattr(phash_index, "AUTOSAVE_INTERVAL_S", 0.0)
+    idx.add(2, [0.0, 0.0, 0.0], {"brightness": 0.2})
+    assert len(PHashIndex(path)) == 2
+
+
+def test_processes_sharing_a_file_merge_on_save(tmp_path):
+    path = str(tmp_path / "phash.npz")
+    a, b = PHashIndex(path), PHashIndex(path)
+    a.add(1, [0.0, 0.0, 0.0], {"brightness": 0.1})
+    b.add(2, [0.0, 0.0, 0.0], {"brightness": 0.2})
+    a.save()
+    b.save()  # last writer keeps the first one's entry
+    a.add(3, [0.0, 0.0, 0.0], {"brightness": 0.3})
+    a.save()
+
+    merged = PHashIndex(path)
+    assert sorted(int(h) for h in merged._hashes[:len(merged)]) == [1, 2, 3]
+    assert len(a) == 3  # a picked up b's entry when it merged
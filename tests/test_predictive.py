@@ -9,7 +9,8 @@ def test_predictive_basic():
     hist.add_edit(Edit(CONTRAST,   {"value": 0.3}))
     hist.add_edit(Edit(BRIGHTNESS, {"value": 0.1}))
 
-    ai_img, ai_params, fut = run_predictive_branch(hist, 1)
+    # interactive call: a budget, so no server just means the local fallback
+    ai_img, ai_params, fut = run_predictive_branch(hist, 1, latency_budget=1.0)
 
     assert isinstance(ai_params, dict)
     assert "brightness" in ai_params
@@ -33,3 +34,25 @@ def test_accept_ai_new_history():
     assert len(new_hist.edits) >= 2
     assert new_hist.edits[0].type == BRIGHTNESS
     assert new_hist.edits[1].type == CONTRAST
+
+def test_optimise_falls_back_when_server_unreachable(monkeypatch):
+    from src.ai_client import optimise_tone_colour
+
+    monkeypatch.setenv("AI_API_URL", "http://127.0.0.1:9/optimise")
+    low = np.full((16, 16, 3), 0.4, dtype=np.float32)
+    intent = np.array([0.1, 0.2, 0.0], dtype=np.float32)
+
+    ai_params = optimise_tone_colour(low, intent, latency_budget=0.5)
+    assert ai_params["source"] == "fallback"
+    assert "brightness" in ai_params
+
+
+def test_optimise_blocks_and_raises_without_a_budget(monkeypatch):
+    import pytest
+    import requests
+    from src.ai_client import optimise_tone_colour
+
+    monkeypatch.setenv("AI_API_URL", "http://127.0.0.1:9/optimise")
+    low = np.full((16, 16, 3), 0.4, dtype=np.float32)
+    with pytest.raises(requests.RequestException):
+        optimise_tone_colour(low, np.array([0.1, 0.2, 0.0], dtype=np.float32))
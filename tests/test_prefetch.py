@@ -0,0 +1,77 @@
+from src import ai_client
+from src.edits import Edit, BRIGHTNESS, CONTRAST
+from src.history import EditHistory
+from src.prefetch import BranchPrefetcher
+from src.predictive_branch import run_predictive_branch
+
+
+def _history():
+    hist = EditHistory(base_image_path="example.jpg")
+    hist.add_edit(Edit(BRIGHTNESS, {"value": 0.2}))
+    hist.add_edit(Edit(CONTRAST,   {"value": 0.3}))
+    hist.add_edit(Edit(BRIGHTNESS, {"value": 0.1}))
+    return hist
+
+
+def test_prefetch_serves_foreground(monkeypatch):
+    monkeypatch.setattr(ai_client, "USE_SERVER", False)
+    hist = _history()
+    pf = BranchPrefetcher(max_workers=1)
+    try:
+        pf.attach(hist)
+        pf.schedule(hist, 1)
+
+        res = pf.get(hist, 1)
+        assert res is not None
+        assert res.ai_params["source"] == "local"
+        assert pf.get(hist, 0) is not None  # neighbour
+
+        _, ai_params, fut = run_predictive_branch(hist, 1, prefetcher=pf)
+        assert ai_params is res.ai_params
+        assert len(fut) == 1
+    finally:
+        pf.shutdown()
+
+
+def test_add_edit_cancels_stale_jobs(monkeypatch):
+    monkeypatch.setattr(ai_client, "USE_SERVER", False)
+    hist = _history()
+    pf = BranchPrefetcher(max_workers=1)
+    try:
+        pf.attach(hist)
+        pf.schedule(hist, 1)
+        hist.add_edit(Edit(CONTRAST, {"value": 0.1}))
+
+        assert pf.get(hist, 1) is None
+        assert not pf._jobs
+    finally:
+        pf.shutdown()
+
+
+def test_dropped_branches_release_their_sessions(monkeypatch):
+    from src import prefetch
+
+    monkeypatch.setattr(ai_client, "USE_SERVER", False)
+    released = []
+    monkeypatch.setattr(prefetch, "release_session", released.append)
+    hist = _history()
+    pf = BranchPrefetcher(max_workers=1)
+    try:
+        pf.schedule(hist, 1)  # slides 0, 1, 2
+        results = {k: pf.get(hist, k) for k in (0, 1, 2)}
+
+        # a new edit keeps every branch: nothing to release
+        hist.add_edit(Edit(CONTRAST, {"value": 0.1}))
+        pf.cancel_stale(hist)
+        assert released == []
+
+        # replacing edit 2 drops the slide-2 branch only
+        pf.schedule(hist, 1)
+        for k in (0, 1, 2):
+            pf.get(hist, k)
+        other = EditHistory("example.jpg", hist.edits[:2] + [Edit(CONTRAST, {"value": 0.5})])
+        pf.cancel_stale(other)
+        assert len(released) == 1
+        assert (released[0] == results[2].lowres).all()
+    finally:
+        pf.shutdown()
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+
+from src import config
+from src.edits import Edit, BRIGHTNESS, CONTRAST
+from src.history import EditHistory
+from src.render_cache import RenderCache
+from src.branching import render_slide_image
+
+
+def test_key_depends_on_edit_chain(tmp_path):
+    cache = RenderCache(str(tmp_path), max_bytes=1 << 30)
+    k1 = cache.key("example.jpg", [Edit(BRIGHTNESS, {"value": 0.2})])
+    k2 = cache.key("example.jpg", [Edit(BRIGHTNESS, {"value": 0.3})])
+    k3 = cache.key("example.jpg", [Edit(BRIGHTNESS, {"value": 0.2})], kind="lowres256")
+
+    assert len({k1, k2, k3}) == 3
+    assert k1 == cache.key("example.jpg", [Edit(BRIGHTNESS, {"value": 0.2})])
+
+
+def test_roundtrip_and_lru_eviction(tmp_path):
+    img = np.random.rand(32, 32, 3).astype(np.float32)
+    entry_bytes = img[..., 0].size * 3 * 2  # uint16
+    cache = RenderCache(str(tmp_path), max_bytes=3 * entry_bytes)
+
+    cache.put("a" * 64, img)
+    out = cache.get("a" * 64)
+    assert out.dtype == np.float32
+    assert np.abs(out - img).max() < 1e-4
+    assert cache.get("b" * 64) is None
+
+    for i in range(5):
+        cache.put(f"{i:064d}", img)
+    assert cache.size_bytes() <= 3 * entry_bytes + 512  # + .npy headers
+    assert cache.get(f"{4:064d}") is not None
+
+
+def test_render_slide_image_uses_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "RENDER_CACHE_DIR", str(tmp_path))
+
+    hist = EditHistory(base_image_path="example.jpg")
+    hist.add_edit(Edit(BRIGHTNESS, {"value": 0.2}))
+    hist.add_edit(Edit(CONTRAST,   {"value": 0.3}))
+
+    first = render_slide_image(hist, 1)
+    n_files = sum(len(f) for _, _, f in os.walk(tmp_path))
+    second = render_slide_image(hist, 1)
+
+    assert n_files == 1
+    assert np.abs(first - second).max() < 1e-4
+
+
+def test_float32_entries_are_mapped_not_copied(tmp_path):
+    img = np.random.rand(32, 32, 3).astype(np.float32)
+    cache = RenderCache(str(tmp_path), max_bytes=1 << 30, store_dtype="float32")
+    cache.put("a" * 64, img)
+
+    out = cache.get("a" * 64)
+    assert isinstance(out, np.memmap) and not out.flags.writeable
+    assert np.array_equal(out, img)
+
+    # an entry written by a uint16 worker sharing the directory is rescaled
+    RenderCache(str(tmp_path), max_bytes=1 << 30).put("b" * 64, img)
+    assert np.abs(cache.get("b" * 64) - img).max() < 1e-4
+
+
+def test_image_hash_memo_is_bounded(tmp_path, monkeypatch):
+    from src import render_cache
+
+    monkeypatch.setattr(render_cache, "HASH_MEMO_SIZE", 2)
+    monkeypatch.setattr(render_cache, "_image_hash_memo", render_cache.OrderedDict())
+    for i in range(4):
+        p = tmp_path / f"{i}.bin"
+        p.write_bytes(bytes([i]))
+        render_cache.hash_image_file(str(p))
+    assert [os.path.basename(k[0]) for k in render_cache._image_hash_memo] == ["2.bin", "3.bin"]
@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+
+from src import ai_client, config
+from src.branching import render_original_future_branch, render_slide_image
+from src.edits import Edit, BRIGHTNESS, CONTRAST
+from src.history import EditHistory
+from src.predictive_branch import (
+    apply_ai_params_fullres, resolve_ai_suggestion, run_predictive_branch_with_baseline,
+)
+from src.render_graph import RenderGraph
+
+
+def _history():
+    hist = EditHistory(base_image_path="example.jpg")
+    hist.add_edit(Edit(BRIGHTNESS, {"value": 0.2}))
+    hist.add_edit(Edit(CONTRAST, {"value": 0.3}))
+    hist.add_edit(Edit(BRIGHTNESS, {"value": 0.1}))
+    return hist
+
+
+def test_shared_nodes_are_built_and_run_once():
+    hist = _history()
+    g = RenderGraph()
+    branch = g.render(hist.base_image_path, hist.get_edits_up_to_index(0))
+    full = g.render(hist.base_image_path, hist.edits)
+    assert g.render(hist.base_image_path, list(hist.edits)) is full
+    assert full.deps == (branch,)
+
+    out_branch, out_full = g.evaluate(branch, full)
+    g.evaluate(full)
+    assert [p["op"] for p in g.plan()].count("decode") == 1
+    assert len(g.plan()) == 3
+    assert np.allclose(out_full, render_original_future_branch(hist, 0)[0])
+    assert np.allclose(out_branch, render_slide_image(hist, 0))
+
+
+def test_baseline_and_resolve_reuse_the_request_graph(monkeypatch, tmp_path):
+    monkeypatch.setattr(ai_client, "USE_SERVER", False)
+    monkeypatch.setattr(config, "RENDER_PLAN_DIR", str(tmp_path))
+    hist = _history()
+    g = RenderGraph()
+
+    ai_img, user_img, params, future = run_predictive_branch_with_baseline(hist, 1, graph=g)
+    assert np.allclose(user_img, render_original_future_branch(hist, 1)[0])
+    assert np.allclose(ai_img, apply_ai_params_fullres(render_slide_image(hist, 1), params))
+    assert len(future) == 1
+
+    executed = len(g.plan())
+    same_hist, img = resolve_ai_suggestion(hist, 1, params, accept=False, graph=g)
+    assert same_hist is hist and img is user_img
+    assert len(g.plan()) == executed
+
+    new_hist, img = resolve_ai_suggestion(hist, 1, params, accept=True, graph=g)
+    assert len(new_hist.edits) > 2
+    last = g.plan()[-1]
+    assert last["op"] == "edit" and len(last["deps"]) == 1  # chained from the branch render
+
+    assert len(list(tmp_path.glob("*.json"))) == 3
+    (dump,) = tmp_path.glob("predictive_branch_with_baseline-*.json")
+    plan = json.loads(dump.read_text())
+    assert {p["op"] for p in plan["executed"]} >= {"decode", "edit", "proxy", "optimise", "ai_apply"}
+
+
+def test_accepted_render_matches_the_preview(monkeypatch):
+    from src.apply_edits import apply_edits_sequence
+    from src.bilateral_grid import decode_grid, encode_grid, fit_bilateral_grid
+    from src.intent import make_lowres
+
+    hist = _history()
+    branch = render_slide_image(hist, 1)
+    low = make_lowres(branch)
+    scored = np.clip((low - 0.5) * 1.3 + 0.55, 0.0, 1.0) ** 1.2
+    grid = decode_grid(encode_grid(fit_bilateral_grid(low, scored)))  # as the client gets it
+    params = {"brightness": 0.05, "contrast": 0.3, "lut_strength": 0.4, "tone_grid": grid}
+
+    from src import render_graph
+    monkeypatch.setattr(render_graph, "optimise_tone_colour", lambda *a, **k: params)
+    g = RenderGraph()
+    ai_img, _, _, _ = run_predictive_branch_with_baseline(hist, 1, graph=g)
+    new_hist, img = resolve_ai_suggestion(hist, 1, params, accept=True, graph=g)
+
+    assert new_hist.edits[-1].type == "tone_grid"
+    assert np.allclose(img, ai_img, atol=1e-6)
+    # a tile of the accepted history renders like the same region of the whole
+    tile = apply_edits_sequence(branch[40:100, 30:90], new_hist.edits[-1:],
+                                frame=branch.shape[:2] + (40, 30))
+    assert np.allclose(tile, img[40:100, 30:90], atol=1e-5)
+
+
+def test_concurrent_renders_with_cached_kernels_match_serial():
+    from src.apply_edits import apply_edits_sequence, load_image
+    from src.edits import FILTER, GRAIN, VIGNETTE
+    from src.spatial_kernels import _grain_field_cache, _vignette_cache
+
+    _vignette_cache.clear()
+    _grain_field_cache.clear()
+    base = [Edit(VIGNETTE, {"amount": 0.4}), Edit(FILTER, {"id": "WarmFilm03", "strength": 0.5})]
+    chains = [base + [Edit(GRAIN, {"amount": 0.3, "seed": s}), Edit(BRIGHTNESS, {"value": s / 10})]
+              for s in range(6)]
+
+    g = RenderGraph(max_workers=6)
+    nodes = [g.render("example.jpg", edits) for edits in chains]
+    outs = g.evaluate(*nodes)
+
+    img = load_image("example.jpg")
+    for edits, out in zip(chains, outs):
+        assert np.allclose(out, apply_edits_sequence(img, edits))
@@ -0,0 +1,67 @@
+import time
+
+from src.ai_client import EndpointRouter
+
+
+def _wait_for_probe(router, endpoint, timeout=5.0):
+    end = time.monotonic() + timeout
+    while endpoint in router._probing and time.monotonic() < end:
+        time.sleep(0.01)
+
+URLS = [f"http://127.0.0.1:{8000 + i}/optimise" for i in range(4)]
+
+
+def test_consistent_hash_only_remaps_removed_node():
+    full = EndpointRouter(URLS)
+    reduced = EndpointRouter(URLS[:3])
+    keys = [f"img{i}" for i in range(400)]
+
+    owners = {k: full.route(k)[0] for k in keys}
+    assert len(set(owners.values())) == 4
+
+    for k in keys:
+        if owners[k] != URLS[3]:
+            assert reduced.route(k)[0] == owners[k]
+
+
+def test_failing_node_is_ejected_and_readmitted(monkeypatch):
+    router = EndpointRouter(URLS, max_failures=2, eject_s=0.0)
+    owner = router.route("key")[0]
+
+    router.mark_failure(owner)
+    assert not router.is_ejected(owner)
+    router.mark_failure(owner)
+    assert router.is_ejected(owner)
+
+    monkeypatch.setattr(router, "check_health", lambda ep: False)
+    assert owner not in router.route("key")
+    _wait_for_probe(router, owner)
+    assert len(router.route("key")) == 3
+    _wait_for_probe(router, owner)
+
+    monkeypatch.setattr(router, "check_health", lambda ep: True)
+    assert owner not in router.route("key")  # probed off the request path
+    _wait_for_probe(router, owner)
+    assert not router.is_ejected(owner)
+    assert router.route("key")[0] == owner
+
+
+def test_dead_node_is_probed_once_per_window():
+    dead = "http://127.0.0.1:9/optimise"
+    router = EndpointRouter([dead] + URLS[:2], max_failures=1, eject_s=30.0, health_timeout=0.2)
+    probes = []
+    real_check = router.check_health
+    router.check_health = lambda ep: probes.append(ep) or real_check(ep)
+
+    router.mark_failure(dead)
+    router._ejected_until[dead] = time.monotonic() - 1.0  # window just ended
+
+    start = time.monotonic()
+    assert dead not in router.route("key")
+    assert time.monotonic() - start < 0.1  # the request does not wait on the probe
+    _wait_for_probe(router, dead)
+    assert probes == [dead]
+    assert router._ejected_until[dead] > time.monotonic() + 20.0  # re-ejected
+
+    assert dead not in router.route("key")
+    assert probes == [dead]
@@ -0,0 +1,273 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("torch")
+
+import server_dummy
+
+
+def test_grouped_scores_match_per_candidate():
+    rng = np.random.default_rng(0)
+    low = rng.random((48, 64, 3), dtype=np.float32)
+    cands = [
+        {"brightness": b, "contrast": c, "lut_strength": s}
+        for b in (0.0, 0.1) for c in (0.0, 0.2) for s in (0.0, 0.5, 1.0)
+    ]
+
+    grouped = server_dummy._score_candidates(low, cands)
+    single = [server_dummy._score_candidate(low, c) for c in cands]
+    assert np.allclose(grouped, single, atol=1e-5)
+
+
+def test_deadline_returns_best_so_far():
+    low = np.full((32, 32, 3), 0.5, dtype=np.float32)
+    cands = [{"brightness": b, "contrast": 0.0, "lut_strength": 0.0} for b in (0.0, 0.1, 0.2)]
+
+    best, evaluated = server_dummy._select_best(low, cands, deadline=time.monotonic())
+    assert evaluated == 1 and best == 0
+
+    _, evaluated = server_dummy._select_best(low, cands)
+    assert evaluated == 3
+
+
+def test_gradient_mode_improves_on_intent():
+    from src.differentiable import optimise_params_gradient
+
+    rng = np.random.default_rng(1)
+    low = rng.random((32, 48, 3), dtype=np.float32) * 0.5
+    intent = np.array([0.1, 0.1, 0.2], dtype=np.float32)
+
+    start = server_dummy._score_candidate(
+        low, {"brightness": 0.1, "contrast": 0.1, "lut_strength": 0.2})
+    from src import hdrnet_wrapper
+    model = hdrnet_wrapper._hdr_model
+    flags = [p.requires_grad for p in model.parameters()]
+    found = optimise_params_gradient(low, intent, steps=4)
+
+    # the shared models are left alone
+    assert [p.requires_grad for p in model.parameters()] == flags
+    assert all(p.grad is None for p in model.parameters())
+
+    assert found["steps"] == 4
+    assert found["score"] >= start - 1e-5
+    assert -0.5 <= found["brightness"] <= 0.5 and 0.0 <= found["lut_strength"] <= 1.0
+
+    # the reported score is what the numpy pipeline gives for those params
+    assert np.isclose(found["score"], server_dummy._score_candidate(low, found), atol=1e-4)
+
+
+def test_optimise_endpoint_gradient_mode():
+    from src.ai_client import _encode_image_to_base64
+
+    low = np.full((16, 16, 3), 0.3, dtype=np.float32)
+    client = server_dummy.app.test_client()
+    resp = client.post("/optimise", json={
+        "image_base64": _encode_image_to_base64(low),
+        "candidates": [{"brightness": 0.0, "contrast": 0.0, "lut_strength": 0.0}],
+        "intent_vector": [0.1, 0.0, 0.0],
+        "mode": "gradient",
+        "steps": 2,
+    })
+    data = resp.get_json()
+    assert resp.status_code == 200
+    assert data["steps"] == 2 and data["best_index"] is None
+
+
+def test_gradient_mode_is_refused_with_the_neurop_backend(monkeypatch):
+    from src.ai_client import _encode_image_to_base64
+
+    monkeypatch.setattr(server_dummy, "TONE_BACKEND", "neurop")
+    resp = server_dummy.app.test_client().post("/optimise", json={
+        "image_base64": _encode_image_to_base64(np.full((16, 16, 3), 0.3, dtype=np.float32)),
+        "candidates": [{"brightness": 0.0, "contrast": 0.0, "lut_strength": 0.0}],
+        "intent_vector": [0.1, 0.0, 0.0],
+        "mode": "gradient",
+    })
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "gradient_unsupported"
+
+
+def test_session_reuses_uploaded_image():
+    from src.ai_client import _encode_image_to_base64
+
+    low = np.full((16, 16, 3), 0.3, dtype=np.float32)
+    client = server_dummy.app.test_client()
+    cands = [{"brightness": 0.1, "contrast": 0.0, "lut_strength": 0.5}]
+
+    first = client.post("/optimise", json={
+        "image_base64": _encode_image_to_base64(low),
+        "candidates": cands, "intent_vector": [0.1, 0.0, 0.5],
+        "open_session": True,
+    }).get_json()
+    sid = first["session_id"]
+    assert server_dummy.sessions.get(sid).features  # prefix cached
+
+    again = client.post("/optimise", json={
+        "session_id": sid, "candidates": cands, "intent_vector": [0.1, 0.0, 0.5],
+    })
+    assert again.status_code == 200
+    assert again.get_json()["brightness"] == first["brightness"]
+
+    assert client.delete(f"/session/{sid}").get_json()["released"]
+    gone = client.post("/optimise", json={"session_id": sid, "candidates": cands})
+    assert gone.status_code == 404
+
+
+class _FlaskResponse:
+    """
+    requests.Response stand-in over a Flask test-client response.
+    """
+
+    def __init__(self, resp):
+        self.status_code = resp.status_code
+        self._data = resp.get_json()
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+def _route_to_test_client(monkeypatch, sent):
+    from src import ai_client
+
+    client = server_dummy.app.test_client()
+
+    def post(url, headers=None, data=None, timeout=None):
+        sent.append(json.loads(data))
+        return _FlaskResponse(client.post("/optimise", data=data, headers=headers))
+
+    monkeypatch.setattr(ai_client.requests, "post", post)
+    # client and server share a process here, so the server must not drop
+    # the client's resource-tracker registration
+    monkeypatch.setattr(server_dummy.resource_tracker, "unregister", lambda *a: None)
+    monkeypatch.setattr(ai_client, "_shm_unavailable", {})
+    monkeypatch.setenv("AI_TRANSPORT", "shm")
+    return ai_client
+
+
+SHM_URL = "http://127.0.0.1:5000/optimise"
+
+
+def _shm_payload():
+    return {
+        "candidates": [{"brightness": 0.1, "contrast": 0.0, "lut_strength": 0.5}],
+        "intent_vector": [0.1, 0.0, 0.5],
+    }
+
+
+def test_shared_memory_transport_round_trip(monkeypatch):
+    sent = []
+    ai_client = _route_to_test_client(monkeypatch, sent)
+    low = np.full((16, 16, 3), 0.3, dtype=np.float32)
+
+    data = ai_client._post_with_image(SHM_URL, _shm_payload(), low)
+
+    assert len(sent) == 1 and "shm_name" in sent[0] and "image_base64" not in sent[0]
+    assert data["brightness"] == 0.1
+    assert SHM_URL not in ai_client._shm_unavailable
+
+
+def test_shared_memory_rejection_falls_back_to_base64(monkeypatch):
+    sent = []
+    ai_client = _route_to_test_client(monkeypatch, sent)
+    low = np.full((16, 16, 3), 0.3, dtype=np.float32)
+
+    open_shared_image = server_dummy._open_shared_image
+
+    def cannot_attach(name):
+        raise FileNotFoundError(name)
+
+    monkeypatch.setattr(server_dummy, "_open_shared_image", cannot_attach)
+    data = ai_client._post_with_image(SHM_URL, _shm_payload(), low)
+
+    assert ["shm_name" in p for p in sent] == [True, False]
+    assert "image_base64" in sent[1]
+    assert data["brightness"] == 0.1
+
+    # base64 for the rest of the window, shared memory again after it
+    sent.clear()
+    ai_client._post_with_image(SHM_URL, _shm_payload(), low)
+    assert len(sent) == 1 and "image_base64" in sent[0]
+
+    monkeypatch.setattr(server_dummy, "_open_shared_image", open_shared_image)
+    ai_client._shm_unavailable[SHM_URL] = time.monotonic() - 1.0
+    sent.clear()
+    ai_client._post_with_image(SHM_URL, _shm_payload(), low)
+    assert len(sent) == 1 and "shm_name" in sent[0]
+
+
+def test_scoring_errors_are_not_reported_as_shm_unavailable(monkeypatch):
+    sent = []
+    ai_client = _route_to_test_client(monkeypatch, sent)
+    low = np.full((16, 16, 3), 0.3, dtype=np.float32)
+
+    def broken(*args, **kwargs):
+        raise ValueError("bad candidate")
+
+    monkeypatch.setattr(server_dummy, "_optimise_image", broken)
+    with pytest.raises(RuntimeError, match="HTTP 500"):
+        ai_client._post_with_image(SHM_URL, _shm_payload(), low)
+
+    assert len(sent) == 1  # no base64 retry
+    assert SHM_URL not in ai_client._shm_unavailable
+
+
+def test_reused_params_still_come_with_a_tone_grid(monkeypatch, tmp_path):
+    from src import config, phash_index
+
+    sent = []
+    ai_client = _route_to_test_client(monkeypatch, sent)
+    monkeypatch.setattr(ai_client, "USE_SERVER", True)
+    monkeypatch.setattr(config, "PHASH_INDEX_PATH", str(tmp_path / "phash.npz"))
+    monkeypatch.setattr(phash_index, "_phash_index", None)
+    low = np.full((16, 16, 3), 0.3, dtype=np.float32)
+    intent = np.array([0.1, 0.0, 0.5], dtype=np.float32)
+
+    first = ai_client.optimise_tone_colour(low, intent, latency_budget=0)
+    second = ai_client.optimise_tone_colour(low, intent, latency_budget=0)
+    phash_index.get_phash_index().flush()
+
+    assert first["source"] == "server" and second["source"] == "reused"
+    assert len(sent[-1]["candidates"]) == 1  # only the reused params are scored
+    assert np.allclose(second["tone_grid"], first["tone_grid"])
+
+
+def test_sessions_are_opt_in_and_released(monkeypatch):
+    from collections import OrderedDict
+    from urllib.parse import urlparse
+
+    sent = []
+    ai_client = _route_to_test_client(monkeypatch, sent)
+    monkeypatch.setenv("AI_TRANSPORT", "http")
+    monkeypatch.setattr(ai_client, "_sessions", OrderedDict())
+    client = server_dummy.app.test_client()
+    deleted = []
+
+    def delete(url, timeout=None):
+        deleted.append(client.delete(urlparse(url).path).get_json())
+
+    monkeypatch.setattr(ai_client.requests, "delete", delete)
+    low = np.full((16, 16, 3), 0.3, dtype=np.float32)
+
+    ai_client._post_optimise(SHM_URL, _shm_payload(), low)
+    assert "open_session" not in sent[-1] and not ai_client._sessions  # one-shot
+
+    ai_client._post_optimise(SHM_URL, _shm_payload(), low, keep_session=True)
+    assert sent[-1]["open_session"]
+    (sid,) = ai_client._sessions.values()
+    ai_client._post_optimise(SHM_URL, _shm_payload(), low, keep_session=True)
+    assert sent[-1]["session_id"] == sid and "image_base64" not in sent[-1]
+
+    ai_client.release_session(low)
+    end = time.monotonic() + 5.0
+    while not deleted and time.monotonic() < end:
+        time.sleep(0.01)
+    assert deleted == [{"released": True}]
+    assert not ai_client._sessions and server_dummy.sessions.get(sid) is None
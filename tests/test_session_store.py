@@ -0,0 +1,22 @@
+import numpy as np
+
+from src.session_store import SessionStore
+
+
+def test_lru_eviction_by_bytes():
+    img = np.zeros((8, 8, 3), dtype=np.float32)
+    store = SessionStore(max_bytes=2 * img.nbytes, ttl_s=60)
+
+    a = store.create(img)
+    b = store.create(img)
+    store.get(a)  # a is now most recent
+    c = store.create(img)
+
+    assert store.get(b) is None
+    assert store.get(a) is not None and store.get(c) is not None
+
+
+def test_ttl_expiry():
+    store = SessionStore(max_bytes=1 << 20, ttl_s=0.0)
+    sid = store.create(np.zeros((4, 4, 3), dtype=np.float32))
+    assert store.get(sid) is None
@@ -0,0 +1,45 @@
+import numpy as np
+
+from src import config
+from src.ai_client import _generate_candidates, _local_search, _score_candidate
+from src.intent import load_lowres
+from src.surrogate import SurrogateScorer, build_features, fit_surrogate, get_surrogate
+
+
+def _dataset(rng, n_proxies):
+    base = load_lowres("example.jpg")
+    xs, ys, proxies = [], [], []
+    for _ in range(n_proxies):
+        lowres = np.clip(base * rng.uniform(0.4, 1.6), 0.0, 1.0) ** rng.uniform(0.5, 2.0)
+        cands = [{"brightness": b, "contrast": c, "lut_strength": 0.0}
+                 for b, c in rng.uniform(-0.5, 0.5, size=(12, 2))]
+        xs.append(build_features(lowres, cands))
+        ys.append([_score_candidate(lowres, c) for c in cands])
+        proxies.append((lowres, cands))
+    return np.concatenate(xs), np.concatenate(ys), proxies
+
+
+def test_fit_save_load_and_local_search(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    x, y, _ = _dataset(rng, 30)
+    model = fit_surrogate(x, y, epochs=800)
+
+    xt, yt, proxies = _dataset(rng, 5)
+    assert np.corrcoef(model.predict_features(xt), yt)[0, 1] > 0.95
+
+    path = str(tmp_path / "surrogate.npz")
+    model.save(path)
+    lowres, cands = proxies[0]
+    assert np.allclose(SurrogateScorer.load(path).score(lowres, cands), model.score(lowres, cands))
+
+    monkeypatch.setattr(config, "SURROGATE_PATH", path)
+    assert get_surrogate() is not None
+    result = _local_search(lowres, _generate_candidates(np.array([0.2, 0.1, 0.0])))
+    assert {"brightness", "contrast", "lut_strength"} <= set(result)
+
+    monkeypatch.setattr(config, "SURROGATE_PATH", str(tmp_path / "missing.npz"))
+    assert get_surrogate() is None
+    monkeypatch.setattr(config, "SURROGATE_PATH", "")
+    assert get_surrogate() is None
+    result = _local_search(lowres, _generate_candidates(np.array([0.2, 0.1, 0.0])))
+    assert {"brightness", "contrast", "lut_strength"} <= set(result)
@@ -0,0 +1,69 @@
+import shutil
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from src import aesthetic_net, hdrnet_wrapper
+from src.intent import load_lowres
+from src.training import ImageShard, build_shard, list_images, train
+
+
+def _shard(tmp_path):
+    img_dir = tmp_path / "images"
+    img_dir.mkdir()
+    for name in ("example.jpg", "my_test.jpg"):
+        shutil.copy(name, img_dir / name)
+    (img_dir / "notes.txt").write_text("not an image")
+
+    path = str(tmp_path / "shard.npy")
+    stats = build_shard(list_images(str(img_dir)), path, workers=2)
+    assert stats["images"] == 2 and stats["images_per_s"] > 0
+    return path
+
+
+def test_shard_matches_lowres_geometry(tmp_path):
+    shard = ImageShard(_shard(tmp_path))
+    assert shard.names == ["example.jpg", "my_test.jpg"]
+    for i, name in enumerate(shard.names):
+        expected = load_lowres(name)
+        got = shard.image(i).astype(np.float32) / 255.0
+        assert got.shape == expected.shape
+        assert np.abs(got - expected).max() <= 1.0 / 255.0 + 1e-6
+
+
+def test_shard_skips_unreadable_images(tmp_path):
+    paths = [str(tmp_path / n) for n in ("a.jpg", "broken.jpg", "b.jpg")]
+    shutil.copy("example.jpg", paths[0])
+    (tmp_path / "broken.jpg").write_bytes(b"not a jpeg")
+    shutil.copy("my_test.jpg", paths[2])
+
+    out = str(tmp_path / "shard.npy")
+    assert build_shard(paths, out, workers=2)["images"] == 2
+
+    shard = ImageShard(out)
+    assert shard.names == ["a.jpg", "b.jpg"]
+    assert np.load(out, mmap_mode="r").shape[0] == 2  # no empty slot left behind
+    expected = load_lowres("my_test.jpg")
+    assert np.abs(shard.image(1).astype(np.float32) / 255.0 - expected).max() <= 1.0 / 255.0 + 1e-6
+
+
+def test_checkpoints_load_through_model_loaders(tmp_path, monkeypatch):
+    shard = _shard(tmp_path)
+    monkeypatch.setattr(hdrnet_wrapper, "_hdr_model", None)
+    monkeypatch.setattr(aesthetic_net, "_aesthetic_model", None)
+
+    hdr_path = str(tmp_path / "hdrnet.pt")
+    metrics = train("hdrnet", shard, hdr_path, epochs=1, batch_size=2, workers=1, crop=64)
+    assert metrics["epochs"][0]["images"] == 2 and metrics["epochs"][0]["images_per_s"] > 0
+    hdrnet_wrapper.load_hdrnet_model(hdr_path)
+    trained = hdrnet_wrapper._hdr_model.state_dict()
+    saved = torch.load(hdr_path)
+    assert all(torch.equal(trained[k], saved[k]) for k in saved)
+
+    aest_path = str(tmp_path / "aesthetic.pt")
+    train("aesthetic", shard, aest_path, epochs=1, batch_size=2, workers=0, crop=64,
+          labels={"example.jpg": 1.0})
+    aesthetic_net.load_aesthetic_model(aest_path)
+    assert np.isfinite(aesthetic_net.score_aesthetic(load_lowres("example.jpg")))